@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import Malzeme, SayimEmri, SayimDetay # Tüm modelleri import edin
+from .katalog import malzeme_kodlarini_yaz
+from .models import KatalogVersiyon, Malzeme, SayimEmri, SayimDetay, SayimToplam, StokYuklemeIsi # Tüm modelleri import edin
+from .toplamlar import toplamlari_yeniden_kur
 
 # Malzeme modelini daha detaylı ayarlar ile kaydet
 @admin.register(Malzeme)
@@ -11,11 +13,57 @@ class MalzemeAdmin(admin.ModelAdmin):
     search_fields = ('malzeme_kodu', 'barkod', 'parti_no', 'benzersiz_id')
     
     # Filtreleme yapabileceğiniz alanlar
-    list_filter = ('lokasyon_kodu', 'stok_grup')
+    list_filter = ('versiyon__durum', 'lokasyon_kodu', 'stok_grup', 'kaynakta_yok')
     
     # Benzersiz ID'nin otomatik oluştuğunu gösteren salt okunur alanlar
     readonly_fields = ('benzersiz_id',)
 
-# Sayım Emirleri ve Sayım Detaylarını basitçe kaydet
+    # Elle yapılan değişiklikler de arama indekslerini geçersiz kılar
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        malzeme_kodlarini_yaz(Malzeme.objects.filter(pk=obj.pk))
+        obj.versiyon.revizyonu_artir()
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        obj.versiyon.revizyonu_artir()
+
+    def delete_queryset(self, request, queryset):
+        versiyonlar = list(KatalogVersiyon.objects.filter(pk__in=queryset.values('versiyon')))
+        super().delete_queryset(request, queryset)
+        for versiyon in versiyonlar: versiyon.revizyonu_artir()
+
+# Sayım Emirlerini basitçe kaydet
 admin.site.register(SayimEmri)
-admin.site.register(SayimDetay)
\ No newline at end of file
+
+@admin.register(SayimDetay)
+class SayimDetayAdmin(admin.ModelAdmin):
+    # Elle değiştirilen/silinen detaylardan sonra emrin toplamları yeniden hesaplanır
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        toplamlari_yeniden_kur([obj.sayim_emri_id] + ([form.initial['sayim_emri']] if change and form.initial.get('sayim_emri') else []))
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        toplamlari_yeniden_kur([obj.sayim_emri_id])
+
+    def delete_queryset(self, request, queryset):
+        emirler = list(queryset.values_list('sayim_emri_id', flat=True).distinct())
+        super().delete_queryset(request, queryset)
+        toplamlari_yeniden_kur(emirler)
+
+@admin.register(SayimToplam)
+class SayimToplamAdmin(admin.ModelAdmin):
+    list_display = ('sayim_emri', 'benzersiz_id', 'toplam_miktar', 'kayit_sayisi', 'son_sayim_tarihi', 'son_personel')
+    list_filter = ('sayim_emri',)
+    search_fields = ('benzersiz_id',)
+
+@admin.register(StokYuklemeIsi)
+class StokYuklemeIsiAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'dosya_adi', 'durum', 'asama', 'toplam_satir', 'yazilan_satir', 'hata_sayisi', 'olusturma_tarihi')
+    list_filter = ('durum',)
+
+@admin.register(KatalogVersiyon)
+class KatalogVersiyonAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'durum', 'aciklama', 'temel_versiyon', 'olusturma_tarihi', 'aktiflesme_tarihi')
+    list_filter = ('durum',)
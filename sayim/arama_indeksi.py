@@ -0,0 +1,260 @@
+# -*- coding: utf-8 -*-
+"""
+ajax_akilli_stok_ara için süreç içi (worker başına) depo indeksi.
+
+Her depo için aktif katalogdaki malzemeler bir kez okunur ve standartlaştırılmış
+kodlara göre sözlüklere (hash map) yerleştirilir; sonraki okutmalar veritabanına
+gitmeden aynı öncelik sırasıyla çözülür:
+  1. okutulan kod: MalzemeKod tablosundaki tüm kodlar (benzersiz_id, seri no,
+     barkod, alternatif kodlar, stok kodu); en güçlü türde birden çok malzeme
+     eşleşirse adaylar sıralı olarak döner
+  2. parti (stok kodu varsa onunla birlikte)
+  3. stok kodu varyantları (tek varyant seçilir, birden çoksa liste döner)
+
+Geçersiz kılma: indeks, kurulduğu anki (aktif sürüm, revizyon) anahtarını
+taşır. Her aramada bu anahtar tek bir küçük sorguyla okunur; yeni bir sürüm
+aktif olduğunda veya onay/yazma sürümün revizyonunu artırdığında indeks atılır
+ve depolar ilk kullanımda yeniden kurulur.
+
+Bellek sınırı: en fazla ARAMA_INDEKSI_AZAMI_DEPO depo tutulur (en eski
+kullanılan atılır); ARAMA_INDEKSI_AZAMI_SATIR satırdan büyük depolar
+indekslenmez ve veritabanından aranır. istatistik() ölçülen boyutu verir.
+"""
+
+import sys
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from django.conf import settings
+
+from .models import KatalogVersiyon, Malzeme, MalzemeKod
+
+ARAMA_INDEKSI_AKTIF = getattr(settings, 'ARAMA_INDEKSI_AKTIF', True)
+ARAMA_INDEKSI_AZAMI_DEPO = getattr(settings, 'ARAMA_INDEKSI_AZAMI_DEPO', 16)
+ARAMA_INDEKSI_AZAMI_SATIR = getattr(settings, 'ARAMA_INDEKSI_AZAMI_SATIR', 200000)
+
+# Arama sonucunda kullanılan malzeme alanları (indekste satır başına bir tuple)
+MalzemeOzeti = namedtuple('MalzemeOzeti', [
+    'pk', 'benzersiz_id', 'malzeme_kodu', 'parti_no', 'renk', 'seri_no', 'lokasyon_kodu', 'stok_grup', 'malzeme_adi', 'sistem_stogu',
+])
+# Arama sonucu: malzeme bulunduysa 'malzeme'; kod birden çok malzemeye uyuyorsa
+# varyant bilgileri ve öncelik sırasıyla 'adaylar'
+Cozum = namedtuple('Cozum', ['malzeme', 'varyant_sayisi', 'partiler', 'renkler', 'adaylar'])
+BULUNAMADI = Cozum(None, 0, [], [], [])
+
+
+def _secim(adaylar):
+    """Tek aday bulunan malzemedir; birden çok aday varyant/aday listesi olarak döner."""
+    if len(adaylar) == 1: return Cozum(adaylar[0], 0, [], [], [])
+    partiler = sorted({m.parti_no for m in adaylar if m.parti_no is not None})
+    renkler = sorted({m.renk for m in adaylar if m.renk is not None})
+    return Cozum(None, len(adaylar), partiler, renkler, adaylar)
+
+
+class DepoIndeksi:
+    """Tek bir deponun malzemeleri ve kod -> satır sözlükleri."""
+    __slots__ = ('satirlar', 'kodlar', 'partiler', 'stok_partiler', 'stoklar')
+
+    def __init__(self, satirlar, kodlar):
+        # satirlar pk sırasındadır; setdefault ile her anahtar için ORM'deki .first()
+        # ile aynı (en küçük pk'lı) satır tutulur. kodlar (kod, oncelik, malzeme_id)
+        # üçlüleri (oncelik, malzeme_id) sırasındadır; her kod için sadece en güçlü
+        # öncelikteki malzemeler saklanır.
+        self.satirlar = satirlar
+        self.kodlar, self.partiler, self.stok_partiler, self.stoklar = {}, {}, {}, {}
+        sira = {m.pk: i for i, m in enumerate(satirlar)}
+        en_iyi = {}
+        for kod, oncelik, malzeme_id in kodlar:
+            if malzeme_id not in sira or en_iyi.setdefault(kod, oncelik) != oncelik: continue
+            self.kodlar.setdefault(kod, []).append(sira[malzeme_id])
+        for i, m in enumerate(satirlar):
+            self.partiler.setdefault(m.parti_no, i)
+            self.stok_partiler.setdefault((m.malzeme_kodu, m.parti_no), i)
+            self.stoklar.setdefault(m.malzeme_kodu, []).append(i)
+
+    def coz(self, seri_no, stok_kod, parti_no, renk):
+        """Standartlaştırılmış arama değerlerini ajax_akilli_stok_ara sırasıyla çözer."""
+        if seri_no != 'YOK':
+            adaylar = self.kodlar.get(seri_no)
+            if adaylar: return _secim([self.satirlar[i] for i in adaylar])
+        if parti_no != 'YOK':
+            i = self.stok_partiler.get((stok_kod, parti_no)) if stok_kod != 'YOK' else self.partiler.get(parti_no)
+            if i is not None: return _secim([self.satirlar[i]])
+        # Stok + parti + renk tam eşleşmesi bir önceki adımın alt kümesi olduğu için ayrıca aranmaz
+        if stok_kod != 'YOK':
+            varyantlar = [self.satirlar[i] for i in self.stoklar.get(stok_kod, ())]
+            if varyantlar: return _secim(varyantlar)
+        return BULUNAMADI
+
+
+def _derin_boyut(nesne):
+    """Nesnenin ve içerdiği (tekrarsız) alt nesnelerin yaklaşık bellek boyutu (bayt)."""
+    gorulen, yigin, toplam = set(), [nesne], 0
+    while yigin:
+        n = yigin.pop()
+        if id(n) in gorulen: continue
+        gorulen.add(id(n))
+        toplam += sys.getsizeof(n)
+        if isinstance(n, dict): yigin.extend(n.keys()); yigin.extend(n.values())
+        elif isinstance(n, (list, tuple, set, frozenset)): yigin.extend(n)
+        elif isinstance(n, DepoIndeksi): yigin.extend(getattr(n, a) for a in DepoIndeksi.__slots__)
+    return toplam
+
+
+class AramaIndeksi:
+    """
+    Depo indekslerinin (sürüm, revizyon) anahtarlı, sınırlı boyutlu önbelleği.
+
+    Ortak kilit (_kilit) sadece önbellekten okuma / önbelleğe yazma sırasında tutulur.
+    Kurulum (veritabanı okuması) kilit dışında yapılır; aynı depoyu aynı anda isteyen
+    thread'ler o deponun kurulum kilidinde bekler ve tek kurulumu paylaşır, diğer
+    depolardaki aramalar beklemez.
+    """
+
+    def __init__(self, azami_depo=ARAMA_INDEKSI_AZAMI_DEPO, azami_satir=ARAMA_INDEKSI_AZAMI_SATIR):
+        self.azami_depo, self.azami_satir = azami_depo, azami_satir
+        self._kilit = threading.Lock()
+        self._anahtar = None
+        self._depolar = OrderedDict()   # depo -> DepoIndeksi veya None (çok büyük)
+        self._kod_depolari = None       # stok kodu -> depolar ('Başka depolarda' uyarısı için)
+        self._kurulumlar = {}           # (anahtar, depo veya None) -> kurulum kilidi
+
+    def _guncelle(self, anahtar):
+        if anahtar != self._anahtar:
+            self._anahtar, self._depolar, self._kod_depolari = anahtar, OrderedDict(), None
+
+    def _onbellekten(self, anahtar, depo_kod):
+        """(bulundu mu, indeks); _kilit tutulurken çağrılır."""
+        if self._anahtar != anahtar or depo_kod not in self._depolar: return False, None
+        self._depolar.move_to_end(depo_kod)
+        return True, self._depolar[depo_kod]
+
+    def depo(self, anahtar, depo_kod):
+        """Deponun indeksini döndürür (gerekirse kurar); depo çok büyükse None."""
+        with self._kilit:
+            self._guncelle(anahtar)
+            bulundu, indeks = self._onbellekten(anahtar, depo_kod)
+            if bulundu: return indeks
+            kurulum = self._kurulumlar.setdefault((anahtar, depo_kod), threading.Lock())
+
+        with kurulum:
+            with self._kilit:  # Beklerken başka thread kurmuş olabilir
+                bulundu, indeks = self._onbellekten(anahtar, depo_kod)
+                if bulundu: return indeks
+            indeks = self._depo_kur(anahtar, depo_kod)
+            with self._kilit:
+                self._kurulumlar.pop((anahtar, depo_kod), None)
+                if self._anahtar == anahtar:  # Kurulum sırasında katalog değiştiyse saklanmaz
+                    self._depolar[depo_kod] = indeks
+                    while len(self._depolar) > self.azami_depo:
+                        self._depolar.popitem(last=False)
+        return indeks
+
+    def _depo_kur(self, anahtar, depo_kod):
+        baslangic = time.perf_counter()
+        satirlar = Malzeme.objects.filter(versiyon_id=anahtar[0], lokasyon_kodu=depo_kod).order_by('pk')
+        if satirlar.count() > self.azami_satir:
+            print(f"Arama indeksi: {depo_kod} deposu {self.azami_satir} satırdan büyük, veritabanından aranacak.")
+            return None
+        intern = lambda d: sys.intern(d) if isinstance(d, str) else d
+        kodlar = MalzemeKod.objects.filter(versiyon_id=anahtar[0], lokasyon_kodu=depo_kod)\
+            .order_by('oncelik', 'malzeme_id').values_list('kod', 'oncelik', 'malzeme_id')
+        indeks = DepoIndeksi([
+            MalzemeOzeti(pk, bid, *map(intern, degerler), ad, stok)
+            for pk, bid, *degerler, ad, stok in satirlar.values_list(*MalzemeOzeti._fields).iterator(chunk_size=5000)
+        ], kodlar.iterator(chunk_size=5000))
+        print(f"Arama indeksi: {depo_kod} deposu {len(indeks.satirlar)} satır, {(time.perf_counter() - baslangic) * 1000:.0f} ms")
+        return indeks
+
+    def diger_depolar(self, anahtar, malzeme_kodu, depo_kod):
+        """Aynı stok kodunun bulunduğu diğer depolar (standartlaştırılmış, sıralı)."""
+        with self._kilit:
+            self._guncelle(anahtar)
+            kod_depolari = self._kod_depolari
+            if kod_depolari is None: kurulum = self._kurulumlar.setdefault((anahtar, None), threading.Lock())
+
+        if kod_depolari is None:
+            with kurulum:
+                with self._kilit:
+                    kod_depolari = self._kod_depolari if self._anahtar == anahtar else None
+                if kod_depolari is None:
+                    kod_depolari = self._kod_depolari_kur(anahtar)
+                    with self._kilit:
+                        self._kurulumlar.pop((anahtar, None), None)
+                        if self._anahtar == anahtar: self._kod_depolari = kod_depolari
+        depolar = kod_depolari.get(malzeme_kodu, ())
+        return sorted(d for d in depolar if d != depo_kod)
+
+    def _kod_depolari_kur(self, anahtar):
+        kod_depolari = {}
+        for kod, lokasyon in Malzeme.objects.filter(versiyon_id=anahtar[0]).values_list('malzeme_kodu', 'lokasyon_kodu').distinct().iterator(chunk_size=5000):
+            kod_depolari.setdefault(sys.intern(kod), []).append(sys.intern(lokasyon))
+        return {kod: tuple(depolar) for kod, depolar in kod_depolari.items()}
+
+    def istatistik(self):
+        """Önbellekteki depo/satır sayısı ve ölçülen yaklaşık bellek kullanımı."""
+        with self._kilit:
+            depolar = {d: len(i.satirlar) if i else None for d, i in self._depolar.items()}
+            bayt = _derin_boyut(list(self._depolar.values())) + _derin_boyut(self._kod_depolari or {})
+            return {'anahtar': self._anahtar, 'depolar': depolar, 'satir': sum(n or 0 for n in depolar.values()), 'bayt': bayt}
+
+    def temizle(self):
+        with self._kilit:
+            self._guncelle(None)
+            self._kurulumlar = {}
+
+
+arama_indeksi = AramaIndeksi()
+
+
+def aktif_katalog_anahtari():
+    """(aktif sürüm id, revizyon); katalog boşsa None."""
+    return KatalogVersiyon.objects.filter(durum='Aktif').values_list('pk', 'revizyon').first()
+
+
+# --- VERİTABANI İLE ARAMA (indeks kapalıysa veya depo çok büyükse) ---
+
+def _ozet(malzeme):
+    return MalzemeOzeti(*(getattr(malzeme, alan) for alan in MalzemeOzeti._fields)) if malzeme else None
+
+
+def _db_ile_coz(versiyon_id, depo_kod, seri_no, stok_kod, parti_no, renk):
+    aktif = Malzeme.objects.filter(versiyon_id=versiyon_id, lokasyon_kodu=depo_kod).order_by('pk')
+    if seri_no != 'YOK':
+        # Tek eşitlik sorgusu: (sürüm, depo, kod) indeksinden öncelik sırasıyla adaylar
+        eslesmeler = list(MalzemeKod.objects.filter(versiyon_id=versiyon_id, lokasyon_kodu=depo_kod, kod=seri_no)
+                          .order_by('oncelik', 'malzeme_id').values_list('oncelik', *(f'malzeme__{alan}' for alan in MalzemeOzeti._fields)))
+        adaylar = [MalzemeOzeti(*satir[1:]) for satir in eslesmeler if satir[0] == eslesmeler[0][0]] if eslesmeler else []
+        if adaylar: return _secim(adaylar)
+    if parti_no != 'YOK':
+        q = {'parti_no': parti_no}
+        if stok_kod != 'YOK': q['malzeme_kodu'] = stok_kod
+        malzeme = aktif.filter(**q).first()
+        if malzeme: return _secim([_ozet(malzeme)])
+    if stok_kod != 'YOK':
+        varyantlar = [_ozet(m) for m in aktif.filter(malzeme_kodu=stok_kod)]
+        if varyantlar: return _secim(varyantlar)
+    return BULUNAMADI
+
+
+def malzeme_coz(depo_kod, seri_no='YOK', stok_kod='YOK', parti_no='YOK', renk='YOK', anahtar=None):
+    """
+    Standartlaştırılmış okutma değerlerini aktif katalogda çözer (Cozum döner).
+    İndeks açıksa ve depo indekslenebiliyorsa veritabanına sadece anahtar için gidilir;
+    aynı istekte daha önce okunduysa anahtar parametre olarak verilebilir.
+    """
+    anahtar = anahtar or aktif_katalog_anahtari()
+    if anahtar is None: return BULUNAMADI
+    indeks = arama_indeksi.depo(anahtar, depo_kod) if ARAMA_INDEKSI_AKTIF else None
+    if indeks is None: return _db_ile_coz(anahtar[0], depo_kod, seri_no, stok_kod, parti_no, renk)
+    return indeks.coz(seri_no, stok_kod, parti_no, renk)
+
+
+def diger_depolar(malzeme, anahtar=None):
+    """Malzemenin stok kodunun bulunduğu diğer depolar."""
+    anahtar = anahtar or aktif_katalog_anahtari()
+    if ARAMA_INDEKSI_AKTIF and anahtar is not None:
+        return arama_indeksi.diger_depolar(anahtar, malzeme.malzeme_kodu, malzeme.lokasyon_kodu)
+    return sorted(Malzeme.objects.aktif().filter(malzeme_kodu=malzeme.malzeme_kodu).exclude(lokasyon_kodu=malzeme.lokasyon_kodu)
+                  .values_list('lokasyon_kodu', flat=True).distinct())
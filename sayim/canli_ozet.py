@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""
+Canlı fark özeti ve sayım ilerlemesi için olay akışı (Server-Sent Events).
+
+Bağlanan ekrana önce tam durum ('durum': grup özeti, sayılan kalem / kayıt sayısı,
+son kayıtlar) gönderilir; ardından emrin olay kanalındaki (bkz. olay_yolu.py) sayım
+olayları her beklemede toplu olarak 'fark' olayına çevrilir: grup başına miktar ve
+tutar farkı artışı, yeni kalem / kayıt sayısı ve gelen kayıtlar. Olaylardaki
+malzemelerin grup ve fiyatı emrin açılış stoğundan tek sorguyla okunur; özet yeniden hesaplanmaz.
+
+Olay numarası (id) kanal sırasıdır. Tarayıcı yeniden bağlanınca Last-Event-ID ile
+kaldığı yerden devam eder; aradaki olaylar tampondan düşmüşse, toplamlar yeniden
+kurulmuşsa ('yenile' olayı) veya süreç değişmişse tam durum yeniden gönderilir.
+Bağlantı SAYIM_OLAY_AKISI_SURESI sonunda kapatılır (worker'ı sonsuza kadar
+tutmamak için); EventSource kendiliğinden yeniden bağlanır.
+
+Her açık akış bir istek thread'ini bağlantı boyunca meşgul eder; bu yüzden uygulama
+thread'li worker ile (gunicorn --worker-class gthread --threads N) ve akış süresinden
+uzun --timeout ile çalıştırılır (bkz. Procfile, render.yaml). Süreçteki açık akış sayısı
+SAYIM_OLAY_AKISI_AZAMI_BAGLANTI ile sınırlıdır (thread sayısının epey altında tutulur ki
+ekranlar sayım isteklerini bekletmesin); sınır doluysa bağlantı 'dolu' olayıyla hemen
+kapatılır ve tarayıcı uzun bir 'retry' süresi sonra yeniden dener. Varsayılan olay yolu
+(SAYIM_OLAY_YOLU = 'surec_ici') tek süreçlidir: olaylar yalnızca aynı worker sürecindeki
+akışlara ulaşır. Birden çok worker çalıştırılacaksa paylaşımlı bir olay yolu ayarlanmalıdır.
+"""
+
+import json
+import threading
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import Count, Sum
+
+from .models import AcilisStogu, SayimDetay, SayimToplam, ondalik_yuvarla
+from .olay_yolu import emir_kanali, olay_yolu
+from .rapor import grup_ozeti
+
+OLAY_AKISI_SURESI = getattr(settings, 'SAYIM_OLAY_AKISI_SURESI', 300)
+OLAY_AKISI_NABZI = getattr(settings, 'SAYIM_OLAY_AKISI_NABZI', 15)
+OLAY_AKISI_AZAMI_BAGLANTI = getattr(settings, 'SAYIM_OLAY_AKISI_AZAMI_BAGLANTI', 4)
+OLAY_AKISI_DOLU_BEKLEME_MS = 30000
+SON_KAYIT_SAYISI = 10
+
+_acik_akis_sayisi = 0
+_akis_kilidi = threading.Lock()
+
+
+def _akis_yeri_ayir():
+    """Sınır dolmadıysa açık akış sayısını artırır."""
+    global _acik_akis_sayisi
+    with _akis_kilidi:
+        if _acik_akis_sayisi >= OLAY_AKISI_AZAMI_BAGLANTI: return False
+        _acik_akis_sayisi += 1
+        return True
+
+
+def _akis_yerini_birak():
+    global _acik_akis_sayisi
+    with _akis_kilidi: _acik_akis_sayisi -= 1
+
+
+def sse_olayi(tip, veri, olay_id=None):
+    """Tek SSE mesajı metni."""
+    satirlar = ([f"id: {olay_id}"] if olay_id is not None else []) + [f"event: {tip}", f"data: {json.dumps(veri, ensure_ascii=False)}"]
+    return "\n".join(satirlar) + "\n\n"
+
+
+def durum_verisi(sayim_emri):
+    """Ekranın baştan çizilmesi için tam durum."""
+    sayac = SayimToplam.objects.filter(sayim_emri=sayim_emri).aggregate(kalem=Count('pk'), kayit=Sum('kayit_sayisi'))
+    son_kayitlar = SayimDetay.objects.filter(sayim_emri=sayim_emri).order_by('-kayit_tarihi', '-pk').values_list(
+        'personel_adi', 'benzersiz_malzeme__malzeme_kodu', 'benzersiz_malzeme__malzeme_adi', 'sayilan_stok', 'kayit_tarihi')[:SON_KAYIT_SAYISI]
+    return {
+        'gruplar': grup_ozeti(sayim_emri), 'kalem': sayac['kalem'], 'kayit': sayac['kayit'] or 0,
+        'son_kayitlar': [
+            {'personel': p, 'kod': kod, 'ad': ad, 'miktar': f"{m:.2f}", 'tarih': t.isoformat()}
+            for p, kod, ad, m, t in son_kayitlar
+        ],
+    }
+
+
+def fark_verisi(sayim_emri, olaylar):
+    """Sayım olaylarını tek artış mesajına çevirir (grup ve fiyatlar tek sorguyla)."""
+    sayimlar = [o for o in olaylar if o.get('tip') == 'sayim']
+    satirlar = {}
+    # Grup ve fiyat rapordaki gibi emrin açılış stoğundan
+    for bid, kod, ad, grup, fiyat in AcilisStogu.objects.filter(sayim_emri=sayim_emri, benzersiz_id__in={o['benzersiz_id'] for o in sayimlar})\
+            .values_list('benzersiz_id', 'malzeme_kodu', 'malzeme_adi', 'stok_grup', 'birim_fiyat'):
+        satirlar.setdefault(bid, []).append((kod, ad, grup or 'TANIMSIZ', fiyat or Decimal('0.0')))
+
+    gruplar, son_kayitlar = {}, []
+    for o in sayimlar:
+        miktar = Decimal(o['miktar'])
+        for kod, ad, grup, fiyat in satirlar.get(o['benzersiz_id'], ()):
+            mik, tutar = gruplar.get(grup, (Decimal('0.0'), Decimal('0.0')))
+            gruplar[grup] = (mik + miktar, tutar + miktar * fiyat)
+        kod, ad = satirlar[o['benzersiz_id']][0][:2] if o['benzersiz_id'] in satirlar else (o['benzersiz_id'], '')
+        son_kayitlar.append({'personel': o['personel'], 'kod': kod, 'ad': ad, 'miktar': f"{miktar:.2f}", 'tarih': o['tarih']})
+    return {
+        'gruplar': {g: {'mik_fark': str(ondalik_yuvarla(m)), 'tutar_fark': str(ondalik_yuvarla(t))} for g, (m, t) in gruplar.items()},
+        'yeni_kalem': sum(1 for o in sayimlar if o['yeni']), 'yeni_kayit': sum(o['adet'] for o in sayimlar),
+        'son_kayitlar': son_kayitlar[::-1][:SON_KAYIT_SAYISI],
+    }
+
+
+def olay_akisi(sayim_emri, son_olay_id=None, sure=OLAY_AKISI_SURESI):
+    """Emrin SSE akışı (StreamingHttpResponse gövdesi). Açık akış sınırı doluysa hemen biter."""
+    if not _akis_yeri_ayir():
+        print(f"Olay akışı sınırı dolu ({OLAY_AKISI_AZAMI_BAGLANTI}), emir {sayim_emri.pk} bağlantısı kapatıldı.")
+        yield f"retry: {OLAY_AKISI_DOLU_BEKLEME_MS}\n\n"
+        yield sse_olayi('dolu', {'message': "Canlı güncelleme şu an dolu, biraz sonra yeniden bağlanılacak."})
+        return
+    try:
+        yield from _olaylar(sayim_emri, son_olay_id, sure)
+    finally:
+        # Akış bitince veya istemci kopunca (yanıt kapatılırken) yer bırakılır
+        _akis_yerini_birak()
+
+
+def _olaylar(sayim_emri, son_olay_id, sure):
+    yol, kanal = olay_yolu(), emir_kanali(sayim_emri.pk)
+    bitis = time.monotonic() + sure
+    yield "retry: 3000\n\n"
+
+    sira = yol.son_sira(kanal)
+    if son_olay_id is None or son_olay_id > sira:
+        yield sse_olayi('durum', durum_verisi(sayim_emri), sira)
+    else:
+        sira = son_olay_id
+
+    while time.monotonic() < bitis:
+        olaylar, kacirildi = yol.bekle(kanal, sira, min(OLAY_AKISI_NABZI, max(bitis - time.monotonic(), 0)))
+        if kacirildi or any(o.get('tip') == 'yenile' for _, o in olaylar):
+            sira = yol.son_sira(kanal)
+            yield sse_olayi('durum', durum_verisi(sayim_emri), sira)
+        elif olaylar:
+            sira = olaylar[-1][0]
+            yield sse_olayi('fark', fark_verisi(sayim_emri, [o for _, o in olaylar]), sira)
+        else:
+            yield ": nabiz\n\n"  # Vekil sunucuların boşta bağlantıyı kapatmaması için
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+Sayım ekranının okutmaları tarayıcıda çözebilmesi için depo kataloğu anlık görüntüsü.
+
+Bir deponun aktif katalogdaki satırları (ID, kodlar, parti/renk, sistem stoğu) ve
+okutulabilir kodları (MalzemeKod) sütun adları bir kez yazılan sıkıştırılmış bir
+JSON olarak verilir. Sürüm etiketi "aktif sürüm.revizyon"dur; arama indeksiyle
+(bkz. arama_indeksi.py) aynı anahtar kullanıldığı için yükleme, onay veya elle
+düzeltme sonrası etiket değişir.
+
+- Etiket istemcidekiyle aynıysa (If-None-Match) gövde gönderilmez (304).
+- İstemci elindeki etiketi 'since' ile bildirirse ve o görüntünün satır özetleri
+  önbellekte duruyorsa sadece değişen/silinen satırlar ('fark') gönderilir. Satır
+  anahtarı pk olduğundan fark aynı katalog sürümü içinde (onay, elle düzeltme)
+  küçüktür; yeni bir yükleme aktif olunca tam görüntü gönderilir.
+- Hazırlanan görüntü ve sıkıştırılmış hali Django önbelleğinde etiket başına tutulur.
+"""
+
+import gzip
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .arama_indeksi import arama_indeksi
+from .models import Malzeme, MalzemeKod
+
+DEPO_KATALOGU_ONBELLEK_SURESI = getattr(settings, 'DEPO_KATALOGU_ONBELLEK_SURESI', 6 * 3600)
+
+# Satır dizisindeki alanların sırası (istemci 'alanlar' ile okur)
+SATIR_ALANLARI = ['pk', 'benzersiz_id', 'malzeme_kodu', 'parti_no', 'renk', 'seri_no', 'malzeme_adi', 'sistem_stogu', 'kodlar']
+
+
+def surum_etiketi(anahtar):
+    return f"{anahtar[0]}.{anahtar[1]}"
+
+
+def depo_satirlari(anahtar, depo_kod):
+    """
+    Deponun satırları (pk sırasında). 'kodlar' satırın [kod, öncelik] çiftleridir; her
+    satırda bulunan benzersiz_id (öncelik 0) ve stok kodu (öncelik 4) yer kazanmak için
+    yazılmaz, istemci bunları satırdan ekler.
+    """
+    kodlar = {}
+    for malzeme_id, kod, oncelik in MalzemeKod.objects.filter(versiyon_id=anahtar[0], lokasyon_kodu=depo_kod)\
+            .order_by('malzeme_id', 'oncelik').values_list('malzeme_id', 'kod', 'oncelik').iterator(chunk_size=5000):
+        kodlar.setdefault(malzeme_id, []).append([kod, oncelik])
+    satirlar = []
+    for pk, bid, kodu, parti, renk, seri, ad, stok in Malzeme.objects.filter(versiyon_id=anahtar[0], lokasyon_kodu=depo_kod)\
+            .order_by('pk').values_list(*SATIR_ALANLARI[:-1]).iterator(chunk_size=5000):
+        ek = [k for k in kodlar.get(pk, ()) if not (k[1] == 0 or (k[1] == 4 and k[0] == kodu))]
+        satirlar.append([pk, bid, kodu, parti, renk, seri, ad, f"{stok:.2f}", ek])
+    return satirlar
+
+
+def _satir_ozeti(satir):
+    return hashlib.blake2b(json.dumps(satir, ensure_ascii=False).encode(), digest_size=8).hexdigest()
+
+
+def _sikistir(veri):
+    return gzip.compress(json.dumps(veri, ensure_ascii=False, separators=(',', ':')).encode(), compresslevel=6)
+
+
+def _goruntu(anahtar, depo_kod):
+    """Etiketin önbellekteki görüntüsü (yoksa hazırlanır): satır özetleri ve sıkıştırılmış tam gövde."""
+    onbellek_anahtari = f"depo_katalogu:{depo_kod}:{surum_etiketi(anahtar)}"
+    goruntu = cache.get(onbellek_anahtari)
+    if goruntu is None:
+        satirlar = depo_satirlari(anahtar, depo_kod)
+        diger = {}
+        for kod in {s[2] for s in satirlar}:
+            depolar = arama_indeksi.diger_depolar(anahtar, kod, depo_kod)
+            if depolar: diger[kod] = depolar
+        ortak = {'surum': surum_etiketi(anahtar), 'depo': depo_kod, 'alanlar': SATIR_ALANLARI, 'diger_depolar': diger}
+        goruntu = {
+            'ortak': ortak, 'ozetler': {s[0]: _satir_ozeti(s) for s in satirlar},
+            'tam': _sikistir({'tip': 'tam', **ortak, 'satirlar': satirlar}),
+        }
+        cache.set(onbellek_anahtari, goruntu, DEPO_KATALOGU_ONBELLEK_SURESI)
+    return goruntu
+
+
+def depo_katalogu_govdesi(anahtar, depo_kod, taban=None):
+    """
+    Sıkıştırılmış (gzip) JSON gövde. taban etiketinin özetleri önbellekteyse ve fark
+    tam görüntüden küçükse 'fark' gövdesi ({guncel: [...], silinen: [pk, ...]}) döner.
+    """
+    goruntu = _goruntu(anahtar, depo_kod)
+    taban_ozetleri = cache.get(f"depo_katalogu:{depo_kod}:{taban}", {}).get('ozetler') if taban else None
+    if taban_ozetleri is None: return goruntu['tam']
+
+    ozetler = goruntu['ozetler']
+    degisen = {pk for pk, ozet in ozetler.items() if taban_ozetleri.get(pk) != ozet}
+    if len(degisen) * 2 > len(ozetler): return goruntu['tam']
+    guncel = [s for s in json.loads(gzip.decompress(goruntu['tam']))['satirlar'] if s[0] in degisen] if degisen else []
+    silinen = [pk for pk in taban_ozetleri if pk not in ozetler]
+    return _sikistir({'tip': 'fark', **goruntu['ortak'], 'taban': taban, 'guncel': guncel, 'silinen': silinen})
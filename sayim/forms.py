@@ -1,5 +1,7 @@
 from django import forms
 
+from .models import Malzeme, SayimEmri, standardize_id_part
+
 class SayimGirisForm(forms.Form):
     # Stok Kodu standard kalır
     stok_kod = forms.CharField(label='1. Stok Kodu (ENTER)', max_length=100, required=False, widget=forms.TextInput(attrs={'autofocus': 'autofocus'}))
@@ -12,4 +14,41 @@ class SayimGirisForm(forms.Form):
     renk = forms.CharField(label='3. Renk / Varyant (Seçim / Opsiyonel)', max_length=100, required=False, 
                            widget=forms.TextInput(attrs={'list': 'renk-datalist'}))
                            
-    miktar = forms.CharField(label='4. Sayım Miktarı', max_length=50)
\ No newline at end of file
+    miktar = forms.CharField(label='4. Sayım Miktarı', max_length=50)
+
+
+class SayimEmriForm(forms.ModelForm):
+    """Sayım emri ve kapsamı: seçilen depolar / lokasyon aralıkları ve stok grupları (boş bırakılan hepsi demektir)."""
+    depolar = forms.MultipleChoiceField(label='Depolar (boş: tümü)', required=False, widget=forms.SelectMultiple(attrs={'size': 8}))
+    lokasyon_araliklari = forms.CharField(
+        label='Lokasyon Aralıkları (her satıra BAŞLANGIÇ:BİTİŞ, opsiyonel)', required=False, widget=forms.Textarea(attrs={'rows': 3}),
+    )
+    gruplar = forms.MultipleChoiceField(label='Stok Grupları (boş: tümü)', required=False, widget=forms.SelectMultiple(attrs={'size': 8}))
+
+    class Meta:
+        model = SayimEmri
+        fields = ['ad', 'atanan_personel']
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        aktif = Malzeme.objects.aktif().order_by()
+        self.fields['depolar'].choices = [(d, d) for d in aktif.values_list('lokasyon_kodu', flat=True).distinct().order_by('lokasyon_kodu')]
+        self.fields['gruplar'].choices = [(g, g) for g in aktif.exclude(stok_grup__isnull=True).values_list('stok_grup', flat=True).distinct().order_by('stok_grup')]
+
+    def clean_lokasyon_araliklari(self):
+        araliklar = []
+        for satir in self.cleaned_data['lokasyon_araliklari'].splitlines():
+            if not satir.strip(): continue
+            if satir.count(':') != 1: raise forms.ValidationError(f"Geçersiz aralık: '{satir.strip()}' (BAŞLANGIÇ:BİTİŞ yazın).")
+            baslangic, bitis = (standardize_id_part(p) for p in satir.split(':'))
+            if baslangic > bitis: raise forms.ValidationError(f"Aralığın başlangıcı bitişinden büyük: '{satir.strip()}'.")
+            araliklar.append([baslangic, bitis])
+        return araliklar
+
+    def save(self, commit=True):
+        veri = self.cleaned_data
+        self.instance.kapsam = {
+            anahtar: deger for anahtar, deger in
+            (('depolar', veri['depolar']), ('gruplar', veri['gruplar']), ('lokasyon_araliklari', veri['lokasyon_araliklari'])) if deger
+        }
+        return super().save(commit)
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+"""
+Geohash kodlama (harici bağımlılık yok).
+
+Geohash, enlem/boylam düzlemini dönüşümlü olarak ikiye bölen bitleri base32 ile
+yazar; ortak öneki olan kodlar aynı hücrededir. Her karakter hücreyi 32'ye böler
+(yaklaşık: 5 karakter ~4.9 km, 7 karakter ~150 m, 9 karakter ~5 m). Konum
+analizinde kayıtlar önekine göre gruplanarak kümelenir (bkz. konum.py).
+"""
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+AZAMI_HASSASIYET = 9
+
+
+def geohash_kodla(enlem, boylam, hassasiyet=AZAMI_HASSASIYET):
+    """(enlem, boylam) noktasının hassasiyet karakterlik geohash kodu."""
+    enlem_aralik, boylam_aralik = [-90.0, 90.0], [-180.0, 180.0]
+    kod, bitler, bit_sayisi, boylam_sirasi = [], 0, 0, True
+    while len(kod) < hassasiyet:
+        aralik, deger = (boylam_aralik, boylam) if boylam_sirasi else (enlem_aralik, enlem)
+        orta = (aralik[0] + aralik[1]) / 2
+        bitler <<= 1
+        if deger >= orta:
+            bitler |= 1
+            aralik[0] = orta
+        else:
+            aralik[1] = orta
+        boylam_sirasi = not boylam_sirasi
+        bit_sayisi += 1
+        if bit_sayisi == 5:
+            kod.append(BASE32[bitler])
+            bitler, bit_sayisi = 0, 0
+    return ''.join(kod)
+
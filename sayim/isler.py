@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""
+Arka plan işleri için yerel (broker gerektirmeyen) yürütücü.
+
+İşler süreç içindeki sınırlı boyutlu ThreadPoolExecutor havuzlarında çalışır.
+Her havuzun bir adı vardır (örn. 'stok_yukleme'); aynı ad için aynı havuz
+tekrar kullanılır. İş durumu veritabanındaki kayıtlarda tutulduğu için ilerleme
+sorgusu hangi gunicorn worker'ına düşerse düşsün cevaplanabilir.
+
+settings.SAYIM_IS_YURUTUCU = 'senkron' ise işler çağıran thread'de hemen
+çalıştırılır (testler ve tek süreçli hata ayıklama için).
+"""
+
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections
+
+_havuzlar = {}
+_havuz_kilidi = threading.Lock()
+
+
+class SenkronYurutucu:
+    """ThreadPoolExecutor ile aynı arayüzde, işi hemen çalıştıran yürütücü."""
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+def is_havuzu(ad, isci_sayisi=1):
+    """Adı verilen havuzu döndürür; yoksa isci_sayisi thread ile oluşturur."""
+    if getattr(settings, 'SAYIM_IS_YURUTUCU', 'thread') == 'senkron':
+        return SenkronYurutucu()
+    with _havuz_kilidi:
+        if ad not in _havuzlar:
+            _havuzlar[ad] = ThreadPoolExecutor(max_workers=isci_sayisi, thread_name_prefix=ad)
+        return _havuzlar[ad]
+
+
+def _baglantilari_kapatarak(fn):
+    """Worker thread'inde açılan veritabanı bağlantılarını iş bitince kapatır."""
+    def sarmalayici(*args, **kwargs):
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            if getattr(settings, 'SAYIM_IS_YURUTUCU', 'thread') != 'senkron':
+                connections.close_all()
+    return sarmalayici
+
+
+def is_gonder(ad, fn, *args, isci_sayisi=1, **kwargs):
+    """fn'i adı verilen havuzda çalıştırmak üzere gönderir ve Future döndürür."""
+    return is_havuzu(ad, isci_sayisi).submit(_baglantilari_kapatarak(fn), *args, **kwargs)
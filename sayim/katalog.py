@@ -0,0 +1,301 @@
+# -*- coding: utf-8 -*-
+"""
+Malzeme kataloğu sürümleri (mavi/yeşil yükleme).
+
+Stok yüklemesi canlı kataloğun üzerine yazmaz:
+  1. yeni_versiyon_hazirla: aktif sürümün satırları INSERT ... SELECT ile kısa
+     parçalar halinde yeni bir 'Yükleniyor' sürümüne kopyalanır.
+  2. Yükleme (stok_import.parcalari_yukle) sadece bu yeni sürüme yazar; arama,
+     sayım ve raporlar bu sırada aktif sürümü okumaya devam eder.
+  3. versiyonu_aktiflestir: tek bir kısa transaction ile yeni sürüm 'Aktif',
+     eskisi 'Arşiv' olur.
+
+Her sürümün okutulabilir kodları (MalzemeKod) satırlarla birlikte kopyalanır
+ve yazılan her parça için malzeme_kodlarini_yaz ile yenilenir.
+
+Sayım emri oluşturulurken aktif sürümün emrin kapsamındaki (depo, stok grubu,
+lokasyon aralığı) satırlarının stok, fiyat ve grupları emrin açılış stoğu
+(AcilisStogu) olarak acilis_stogunu_al ile kopyalanır; raporlar farkı buna
+göre hesapladığından sonraki yüklemeler açık sayımları etkilemez.
+
+Sayım onayında sayılan toplamlar (SayimToplam) stoklara sayilan_stoklari_yaz ile
+parça başına bir okuma ve bir toplu güncellemeyle yazılır (satır başına save() çağrılmaz).
+
+Hatalı bir yükleme onceki_versiyona_don ile anında geri alınabilir. Sayım
+detayları malzemeye satır (pk) ile bağlı olduğu için eski sürümlerin sadece
+hiçbir sayımda kullanılmayan satırları silinir; raporlar malzemeleri
+benzersiz_id ile eşleştirir.
+"""
+
+import re
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import DecimalField, IntegerField, OuterRef, Subquery, Value
+from django.utils import timezone
+
+from .models import AcilisStogu, KatalogVersiyon, Malzeme, MalzemeKod, SayimEmri, SayimToplam, ondalik_yuvarla, standardize_id_part
+
+# Kopyalamada bir transaction'da taşınan satır aralığı (yazma kilidi kısa tutulur)
+KOPYA_PARCA_BOYUTU = 20000
+# Eski sürüm temizliğinde bir seferde silinen satır (SQLite değişken limiti için)
+SILME_PARCA_BOYUTU = 1000
+# Sayım onayında bir parçada okunup yazılan benzersiz_id sayısı (SQLite değişken limiti için)
+ONAY_PARCA_BOYUTU = 1000
+# Aktif sürüm dışında geri dönüş için tam olarak saklanan arşiv sürümü sayısı
+KATALOG_ARSIV_SAYISI = getattr(settings, 'KATALOG_ARSIV_SAYISI', 1)
+
+
+class KatalogVersiyonHatasi(Exception):
+    """Sürüm değiştirme / geri alma işleminin yapılamadığı durumlar."""
+
+
+# --- OKUTULABİLİR KODLAR ---
+
+ALTERNATIF_KOD_AYRACI = re.compile(r'[|,;]')
+# Kod tablosunun üretildiği Malzeme alanları (malzeme_kodlari parametre sırası)
+KOD_ALANLARI = ('pk', 'versiyon_id', 'lokasyon_kodu', 'benzersiz_id', 'seri_no', 'barkod', 'alternatif_kodlar', 'malzeme_kodu')
+
+
+def malzeme_kodlari(pk, versiyon_id, lokasyon_kodu, benzersiz_id, seri_no, barkod, alternatif_kodlar, malzeme_kodu):
+    """
+    Bir malzemenin kaydedilmemiş MalzemeKod nesneleri. Kodlar standardize_id_part
+    ile normalleştirilir; aynı kod birden çok alanda geçiyorsa en güçlü tür kalır.
+    """
+    adaylar = [(benzersiz_id, 'benzersiz_id'), (seri_no, 'seri_no'), (barkod, 'barkod')]
+    adaylar += [(a, 'alternatif') for a in ALTERNATIF_KOD_AYRACI.split(alternatif_kodlar or '')]
+    adaylar.append((malzeme_kodu, 'stok_kodu'))
+
+    lokasyon, kodlar = standardize_id_part(lokasyon_kodu), {}
+    for ham, tur in adaylar:
+        kod = standardize_id_part('' if ham is None else ham)
+        if kod != 'YOK' and kod not in kodlar: kodlar[kod] = tur
+    return [
+        MalzemeKod(versiyon_id=versiyon_id, malzeme_id=pk, lokasyon_kodu=lokasyon, kod=kod[:255], tur=tur, oncelik=MalzemeKod.ONCELIKLER[tur])
+        for kod, tur in kodlar.items()
+    ]
+
+
+def malzeme_kodlarini_yaz(malzemeler):
+    """
+    Verilen Malzeme queryset'indeki satırların kodlarını siler ve yeniden yazar.
+    Queryset SQLite değişken limiti için parça boyutunda (<= SILME_PARCA_BOYUTU) olmalıdır.
+    """
+    pkler, kodlar = [], []
+    for satir in malzemeler.values_list(*KOD_ALANLARI):
+        pkler.append(satir[0]); kodlar += malzeme_kodlari(*satir)
+    MalzemeKod.objects.filter(malzeme_id__in=pkler).delete()
+    MalzemeKod.objects.bulk_create(kodlar, batch_size=SILME_PARCA_BOYUTU)
+    return len(kodlar)
+
+
+def kod_tablosunu_kur(versiyon):
+    """Sürümün tüm kod tablosunu Malzeme satırlarından yeniden kurar. Dönüş: yazılan kod sayısı."""
+    pkler = list(Malzeme.objects.filter(versiyon=versiyon).order_by('pk').values_list('pk', flat=True))
+    yazilan = 0
+    for i in range(0, len(pkler), SILME_PARCA_BOYUTU):
+        with transaction.atomic():
+            yazilan += malzeme_kodlarini_yaz(Malzeme.objects.filter(pk__in=pkler[i:i + SILME_PARCA_BOYUTU]))
+    return yazilan
+
+
+def _kodlari_kopyala(kaynak, hedef, parca_boyutu):
+    """Kaynak sürümün kodlarını, hedef sürümdeki aynı benzersiz_id'li satırlara bağlayarak kopyalar."""
+    q = connection.ops.quote_name
+    kod_tablosu, malzeme_tablosu = q(MalzemeKod._meta.db_table), q(Malzeme._meta.db_table)
+    sql = (
+        f"INSERT INTO {kod_tablosu} (versiyon_id, malzeme_id, lokasyon_kodu, kod, tur, oncelik) "
+        f"SELECT %s, yeni.id, k.lokasyon_kodu, k.kod, k.tur, k.oncelik FROM {kod_tablosu} k "
+        f"JOIN {malzeme_tablosu} eski ON eski.id = k.malzeme_id "
+        f"JOIN {malzeme_tablosu} yeni ON yeni.versiyon_id = %s AND yeni.benzersiz_id = eski.benzersiz_id "
+        f"WHERE k.versiyon_id = %s AND k.id > %s AND k.id <= %s"
+    )
+    kodlar = MalzemeKod.objects.filter(versiyon=kaynak).order_by('pk').values_list('pk', flat=True)
+    en_kucuk, en_buyuk = kodlar.first(), kodlar.last()
+    if en_kucuk is None: return
+    for baslangic in range(en_kucuk - 1, en_buyuk, parca_boyutu):
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(sql, [hedef.pk, hedef.pk, kaynak.pk, baslangic, baslangic + parca_boyutu])
+
+
+def katalogu_kopyala(kaynak, hedef, parca_boyutu=KOPYA_PARCA_BOYUTU):
+    """kaynak sürümün tüm Malzeme satırlarını hedef sürüme kopyalar. Dönüş: kopyalanan satır sayısı."""
+    sutunlar = [f.column for f in Malzeme._meta.concrete_fields if f.name not in ('id', 'versiyon')]
+    q = connection.ops.quote_name
+    sutun_listesi = ', '.join(q(s) for s in sutunlar)
+    tablo, versiyon_sutunu = q(Malzeme._meta.db_table), q(Malzeme._meta.get_field('versiyon').column)
+    sql = (
+        f"INSERT INTO {tablo} ({sutun_listesi}, {versiyon_sutunu}) "
+        f"SELECT {sutun_listesi}, %s FROM {tablo} WHERE {versiyon_sutunu} = %s AND {q('id')} > %s AND {q('id')} <= %s"
+    )
+
+    kaynak_satirlar = Malzeme.objects.filter(versiyon=kaynak)
+    en_kucuk = kaynak_satirlar.order_by('pk').values_list('pk', flat=True).first()
+    if en_kucuk is None: return 0
+    en_buyuk = kaynak_satirlar.order_by('-pk').values_list('pk', flat=True).first()
+
+    kopyalanan = 0
+    for baslangic in range(en_kucuk - 1, en_buyuk, parca_boyutu):
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(sql, [hedef.pk, kaynak.pk, baslangic, baslangic + parca_boyutu])
+            kopyalanan += cursor.rowcount
+    _kodlari_kopyala(kaynak, hedef, parca_boyutu)
+    return kopyalanan
+
+
+def yeni_versiyon_hazirla(aciklama='', yukleme_isi=None):
+    """Aktif sürümün kopyası olan yeni bir 'Yükleniyor' sürümü oluşturur."""
+    temel = KatalogVersiyon.aktif_versiyon()
+    yeni = KatalogVersiyon.objects.create(temel_versiyon=temel, aciklama=aciklama[:255], yukleme_isi=yukleme_isi)
+    kopyalanan = katalogu_kopyala(temel, yeni)
+    print(f"Katalog v{yeni.pk}: v{temel.pk} sürümünden {kopyalanan} satır kopyalandı.")
+    return yeni
+
+
+def versiyonu_aktiflestir(versiyon):
+    """
+    Yüklenen sürümü tek transaction'da aktif yapar, önceki aktif sürümü arşivler.
+    Yükleme sırasında başka bir sürüm aktifleştirildiyse (yeni sürüm o
+    değişiklikleri içermediği için) KatalogVersiyonHatasi yükseltir.
+    """
+    with transaction.atomic():
+        versiyon = KatalogVersiyon.objects.select_for_update().get(pk=versiyon.pk)
+        if versiyon.durum != 'Yükleniyor':
+            raise KatalogVersiyonHatasi(f"Katalog v{versiyon.pk} aktifleştirilemez (durum: {versiyon.durum}).")
+        aktif = KatalogVersiyon.objects.select_for_update().filter(durum='Aktif').first()
+        if aktif and versiyon.temel_versiyon_id and aktif.pk != versiyon.temel_versiyon_id:
+            raise KatalogVersiyonHatasi(f"Yükleme sırasında başka bir katalog (v{aktif.pk}) aktifleştirildi. Lütfen dosyayı tekrar yükleyin.")
+        if aktif:
+            aktif.durum = 'Arşiv'; aktif.save(update_fields=['durum'])
+        versiyon.durum = 'Aktif'
+        versiyon.aktiflesme_tarihi = timezone.now()
+        versiyon.save(update_fields=['durum', 'aktiflesme_tarihi'])
+    eski_versiyonlari_temizle()
+    return versiyon
+
+
+def versiyonu_iptal_et(versiyon):
+    """Başarısız yüklemenin sürümünü iptal eder ve satırlarını siler."""
+    KatalogVersiyon.objects.filter(pk=versiyon.pk, durum='Yükleniyor').update(durum='İptal')
+    eski_versiyonlari_temizle()
+
+
+def onceki_versiyona_don():
+    """
+    Aktif sürümü iptal edip en son arşivlenen sürümü tekrar aktif yapar.
+    Dönüş: yeniden aktif olan sürüm.
+    """
+    with transaction.atomic():
+        aktif = KatalogVersiyon.objects.select_for_update().filter(durum='Aktif').first()
+        onceki = KatalogVersiyon.objects.select_for_update().filter(durum='Arşiv').order_by('-aktiflesme_tarihi', '-pk').first()
+        if onceki is None:
+            raise KatalogVersiyonHatasi('Geri dönülecek önceki katalog sürümü yok.')
+        if aktif:
+            aktif.durum = 'İptal'; aktif.save(update_fields=['durum'])
+        onceki.durum = 'Aktif'
+        onceki.aktiflesme_tarihi = timezone.now()
+        onceki.save(update_fields=['durum', 'aktiflesme_tarihi'])
+    eski_versiyonlari_temizle()
+    return onceki
+
+
+def eski_versiyonlari_temizle(arsiv_sayisi=None):
+    """
+    Son arsiv_sayisi arşiv dışındaki eski ve iptal edilmiş sürümlerin, hiçbir
+    sayım detayında kullanılmayan satırlarını siler; sürüm 'Temizlendi' olur.
+    Dönüş: silinen Malzeme satırı sayısı.
+    """
+    arsiv_sayisi = KATALOG_ARSIV_SAYISI if arsiv_sayisi is None else arsiv_sayisi
+    saklanan = list(KatalogVersiyon.objects.filter(durum='Arşiv').order_by('-aktiflesme_tarihi', '-pk').values_list('pk', flat=True)[:arsiv_sayisi])
+    silinecekler = KatalogVersiyon.objects.filter(durum__in=['Arşiv', 'İptal']).exclude(pk__in=saklanan)
+
+    silinen = 0
+    for versiyon in silinecekler:
+        MalzemeKod.objects.filter(versiyon=versiyon).delete()
+        while True:
+            pkler = list(Malzeme.objects.filter(versiyon=versiyon, sayim_detaylari__isnull=True).values_list('pk', flat=True)[:SILME_PARCA_BOYUTU])
+            if not pkler: break
+            with transaction.atomic():
+                silinen += Malzeme.objects.filter(pk__in=pkler).delete()[1].get(Malzeme._meta.label, 0)
+        KatalogVersiyon.objects.filter(pk=versiyon.pk).update(durum='Temizlendi')
+    if silinen: print(f"Katalog temizliği: eski sürümlerden {silinen} satır silindi.")
+    return silinen
+
+
+# --- AÇILIŞ STOĞU ---
+
+# Açılış stoğuna kopyalanan Malzeme alanları (AcilisStogu alan adlarıyla aynı)
+ACILIS_ALANLARI = (
+    'benzersiz_id', 'malzeme_kodu', 'malzeme_adi', 'parti_no', 'renk', 'olcu_birimi', 'lokasyon_kodu', 'stok_grup',
+    'sistem_stogu', 'birim_fiyat',
+)
+
+
+def _acilisa_kopyala(sayim_emri_id, malzemeler, sistem_sifir=False):
+    """Malzeme sorgusunun satırlarını INSERT ... SELECT ile emrin açılış stoğuna yazar. Dönüş: yazılan satır sayısı."""
+    q = connection.ops.quote_name
+    sutunlar = ', '.join(q(AcilisStogu._meta.get_field(a).column) for a in ('sayim_emri', *ACILIS_ALANLARI))
+    ifadeler = {'emir': Value(sayim_emri_id, output_field=IntegerField())}
+    if sistem_sifir: ifadeler['sistem'] = Value(Decimal('0.0'), output_field=DecimalField(max_digits=19, decimal_places=5))
+    alanlar = ['emir', *(('sistem' if a == 'sistem_stogu' and sistem_sifir else a) for a in ACILIS_ALANLARI)]
+    secim, parametreler = malzemeler.annotate(**ifadeler).order_by('pk').values_list(*alanlar).query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {q(AcilisStogu._meta.db_table)} ({sutunlar}) {secim}", parametreler)
+        return cursor.rowcount
+
+
+def acilis_stogunu_al(sayim_emri):
+    """Aktif katalogda emrin kapsamındaki satırların stok, fiyat ve gruplarını açılış stoğu olarak kopyalar (tek INSERT ... SELECT)."""
+    with transaction.atomic():
+        AcilisStogu.objects.filter(sayim_emri=sayim_emri).delete()
+        return _acilisa_kopyala(sayim_emri.pk, Malzeme.objects.aktif().filter(sayim_emri.kapsam_kosulu()))
+
+
+def acilisa_ekle(sayim_emri_id, benzersiz_id):
+    """
+    Emir açıldıktan sonra katalogda ilk kez sayılan malzemeyi açılış stoğuna sistem stoğu 0
+    olarak ekler (açılışta sistemde yoktu). Malzeme zaten varsa veya emrin kapsamı dışındaysa
+    bir şey yapmaz.
+    """
+    if AcilisStogu.objects.filter(sayim_emri_id=sayim_emri_id, benzersiz_id=benzersiz_id).exists(): return 0
+    malzemeler = Malzeme.objects.aktif().filter(SayimEmri.objects.get(pk=sayim_emri_id).kapsam_kosulu(), benzersiz_id=benzersiz_id)
+    try:
+        with transaction.atomic():
+            return _acilisa_kopyala(sayim_emri_id, malzemeler, sistem_sifir=True)
+    except IntegrityError:
+        return 0  # Aynı anda başka bir istek ekledi
+
+
+# --- SAYIM ONAYI ---
+
+def sayilan_stoklari_yaz(sayim_emri, parca_boyutu=ONAY_PARCA_BOYUTU):
+    """
+    Emrin sayılan toplamlarını sistem stoğu olarak yazar. Aktif sürümle birlikte o an
+    yüklenmekte olan sürüm de güncellenir; aksi halde yükleme bitip aktif olduğunda
+    onaylanan stoklar kaybolurdu. Parça başına satırlar sayılan miktarla (alt sorgu) tek
+    sorguda okunur, sadece stoğu değişenler tek bulk_update ile yazılır; sistem_tutari
+    Malzeme.save ile aynı şekilde Decimal'de hesaplanıp yuvarlanır, icerik_hash sıfırlanır
+    (sonraki fark yüklemesi satırı tekrar yazsın). Emrin kapsamı dışındaki malzemelere
+    yazılmaz. Parçalar SQLite değişken sınırı içindir: yazma çağıranın işleminde yapılır
+    (onayda rapor dondurma ve emir durumuyla birlikte tek işlem), kilit onay boyunca tutulur.
+    Dönüş: (güncellenen, aynı kalan) — aktif sürümdeki satır sayıları.
+    """
+    versiyonlar = dict(KatalogVersiyon.objects.filter(durum__in=['Aktif', 'Yükleniyor']).values_list('pk', 'durum'))
+    sayilan = Subquery(SayimToplam.objects.filter(sayim_emri=sayim_emri, benzersiz_id=OuterRef('benzersiz_id')).values('toplam_miktar')[:1],
+                       output_field=DecimalField(max_digits=19, decimal_places=5))
+    bidler = list(SayimToplam.objects.filter(sayim_emri=sayim_emri).order_by('benzersiz_id').values_list('benzersiz_id', flat=True))
+
+    guncellenen = ayni = 0
+    for i in range(0, len(bidler), parca_boyutu):
+        satirlar = Malzeme.objects.filter(sayim_emri.kapsam_kosulu(), versiyon_id__in=list(versiyonlar), benzersiz_id__in=bidler[i:i + parca_boyutu])\
+            .annotate(sayilan=sayilan).values_list('pk', 'versiyon_id', 'sistem_stogu', 'birim_fiyat', 'sayilan')
+        degisenler = []
+        for pk, versiyon_id, sistem, fiyat, miktar in satirlar:
+            aktif = versiyonlar[versiyon_id] == 'Aktif'
+            if sistem == miktar:
+                ayni += aktif; continue
+            guncellenen += aktif
+            degisenler.append(Malzeme(pk=pk, sistem_stogu=miktar, sistem_tutari=ondalik_yuvarla(miktar * (fiyat or Decimal('0.0'))), icerik_hash=None))
+        if degisenler: Malzeme.objects.bulk_update(degisenler, ['sistem_stogu', 'sistem_tutari', 'icerik_hash'])
+    return guncellenen, ayni
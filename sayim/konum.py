@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+Konum analizi: sayım kayıtlarının haritada veritabanında kümelenmesi.
+
+Kayıtların koordinatları yazılırken sayıya çevrilir ve geohash hücresi hesaplanır
+(SayimDetay.enlem / boylam / konum_hucresi). Harita her yakınlaştırma seviyesinde
+ve görüş alanında, kayıtları geohash önekine göre GROUP BY ile gruplayıp küme
+başına tek işaretçi alır: kayıt sayısı, ortalama konum, toplam sayılan miktar.
+Önek uzunluğu yakınlaştırmayla artar (hücre ekranda birkaç on piksel kalır); küme
+sayısı yine de KONUM_AZAMI_KUME'yi aşarsa daha kısa önekle gruplanır. Böylece
+cevap boyutu kayıt sayısından bağımsızdır.
+
+Haritada sadece Türkiye sınırları içindeki koordinatlar gösterilir (KONUM_SINIRLARI);
+sınır dışı ve okunamayan koordinatlar 'geçersiz' sayılır.
+"""
+
+from django.conf import settings
+from django.db.models import Avg, Count, Max, Min, Q, Sum
+from django.db.models.functions import Substr
+from django.utils import timezone
+
+from .geohash import AZAMI_HASSASIYET
+from .models import SayimDetay
+
+KONUM_SINIRLARI = getattr(settings, 'KONUM_SINIRLARI', (35.0, 25.0, 43.0, 45.0))  # güney, batı, kuzey, doğu
+KONUM_AZAMI_KUME = getattr(settings, 'KONUM_AZAMI_KUME', 1000)
+
+# Yakınlaştırma seviyesi (Leaflet zoom) -> geohash önek uzunluğu: seviye bu değere kadar ise o uzunluk
+_YAKINLASTIRMA_HASSASIYETI = ((3, 2), (5, 3), (8, 4), (10, 5), (13, 6), (16, 7), (18, 8))
+
+
+class KonumParametreHatasi(ValueError):
+    """Geçersiz yakınlaştırma seviyesi veya görüş alanı."""
+
+
+def hassasiyet(yakinlastirma):
+    """Yakınlaştırma seviyesine karşılık gelen geohash önek uzunluğu."""
+    for seviye, uzunluk in _YAKINLASTIRMA_HASSASIYETI:
+        if yakinlastirma <= seviye: return uzunluk
+    return AZAMI_HASSASIYET
+
+
+def gorus_alani_oku(metin):
+    """'güney,batı,kuzey,doğu' metnini sayılara çevirir (boşsa None)."""
+    if not metin: return None
+    try:
+        guney, bati, kuzey, dogu = (float(p) for p in metin.split(','))
+    except ValueError:
+        raise KonumParametreHatasi(f"Geçersiz görüş alanı: '{metin}'.")
+    if not (guney <= kuzey and bati <= dogu): raise KonumParametreHatasi(f"Geçersiz görüş alanı: '{metin}'.")
+    return guney, bati, kuzey, dogu
+
+
+def _sinir_ici():
+    guney, bati, kuzey, dogu = KONUM_SINIRLARI
+    return Q(enlem__gt=guney, enlem__lt=kuzey, boylam__gt=bati, boylam__lt=dogu)
+
+
+def konum_ozeti(sayim_emri):
+    """Tek sorguda: haritadaki kayıt sayısı, konumsuz ve geçersiz kayıt sayısı, kayıtların sınırları."""
+    konumsuz = Q(latitude__isnull=True) | Q(longitude__isnull=True) | Q(latitude__in=['YOK', '']) | Q(longitude__in=['YOK', ''])
+    ozet = SayimDetay.objects.filter(sayim_emri=sayim_emri).aggregate(
+        toplam=Count('pk'), gecerli=Count('pk', filter=_sinir_ici()), konumsuz=Count('pk', filter=konumsuz),
+        guney=Min('enlem', filter=_sinir_ici()), bati=Min('boylam', filter=_sinir_ici()),
+        kuzey=Max('enlem', filter=_sinir_ici()), dogu=Max('boylam', filter=_sinir_ici()),
+    )
+    return {
+        'gecerli': ozet['gecerli'], 'konumsuz': ozet['konumsuz'], 'gecersiz': ozet['toplam'] - ozet['gecerli'] - ozet['konumsuz'],
+        'sinirlar': [ozet['guney'], ozet['bati'], ozet['kuzey'], ozet['dogu']] if ozet['gecerli'] else None,
+    }
+
+
+def konum_kumeleri(sayim_emri, yakinlastirma, gorus_alani=None):
+    """
+    Görüş alanındaki kayıtların kümeleri ve kullanılan önek uzunluğu. Tek kayıtlı kümede
+    personel ve zaman da döner (haritada normal işaretçi olarak gösterilir).
+    """
+    kayitlar = SayimDetay.objects.filter(_sinir_ici(), sayim_emri=sayim_emri)
+    if gorus_alani:
+        guney, bati, kuzey, dogu = gorus_alani
+        kayitlar = kayitlar.filter(enlem__gte=guney, enlem__lte=kuzey, boylam__gte=bati, boylam__lte=dogu)
+
+    uzunluk = hassasiyet(yakinlastirma)
+    while True:
+        kumeler = list(kayitlar.values(hucre=Substr('konum_hucresi', 1, uzunluk)).annotate(
+            adet=Count('pk'), orta_enlem=Avg('enlem'), orta_boylam=Avg('boylam'), stok=Sum('sayilan_stok'),
+            ilk_personel=Min('personel_adi'), son_personel=Max('personel_adi'), son_tarih=Max('kayit_tarihi'),
+        ).order_by()[:KONUM_AZAMI_KUME + 1])
+        if len(kumeler) <= KONUM_AZAMI_KUME or uzunluk == 1: break
+        uzunluk -= 1
+    return uzunluk, [{
+        'hucre': k['hucre'], 'lat': k['orta_enlem'], 'lng': k['orta_boylam'], 'adet': k['adet'], 'stok': f"{k['stok'] or 0:.2f}",
+        'personel': k['ilk_personel'] if k['ilk_personel'] == k['son_personel'] else None,
+        'tarih': timezone.localtime(k['son_tarih']).strftime("%Y-%m-%d %H:%M:%S") if k['son_tarih'] else None,
+    } for k in kumeler[:KONUM_AZAMI_KUME]]
@@ -1,124 +1,86 @@
-import pandas as pd
 from django.core.management.base import BaseCommand, CommandError
-from sayim.models import Malzeme, standardize_id_part, generate_unique_id
-from django.db import transaction # Toplu işlem için eklendi
+from django.db import transaction
+from sayim.katalog import versiyonu_aktiflestir, yeni_versiyon_hazirla
+from sayim.stok_import import parcalari_yukle
+from sayim.stok_okuyucu import DESTEKLENEN_UZANTILAR, dosya_uzantisi, stok_parcalari_oku
+
+# Bu komutun eski davranışı: boş depo kodu 'YOK' kalır (satır yüklenir), boş grup / ad / birim
+# boş yazılır; yalnızca stok kodu boş satırlar atlanır. Web yüklemesinin MERKEZ / GENEL
+# varsayılanları (stok_import.VARSAYILANLAR) burada kullanılmaz.
+VARSAYILANLAR = {'sistem_stogu': '0.0', 'birim_fiyat': '0.0'}
+ZORUNLU_ALANLAR = {'malzeme_kodu': 'Stok Kodu boş.'}
+
+
+def sutunlari_eslestir(df):
+    """Dosyanın sütunlarını, 0'dan 13'e kadar olan indekse göre Malzeme alanlarına eşler."""
+    import pandas as pd
+    try:
+        return pd.DataFrame({
+            'seri_no': df.iloc[:, 0],                # 0: seri_no (Yeni Alan)
+            'parti_no': df.iloc[:, 1],               # 1: Parti
+            'lokasyon_kodu': df.iloc[:, 2],          # 2: Depo Kodu
+            'depo_adi': df.iloc[:, 3],               # 3: Depo Adı
+            'malzeme_kodu': df.iloc[:, 4],           # 4: Stok Kodu
+            'malzeme_adi': df.iloc[:, 5],            # 5: Stok Adı
+            'renk': df.iloc[:, 6],                   # 6: Renk 
+            
+            'sistem_stogu': df.iloc[:, 7],           # 7: Miktar (SAYISAL)
+            # 8: Tutar (EXCEL'den okunmuyor, sistem_tutari yazma sırasında hesaplanıyor)
+
+            'birim_fiyat': df.iloc[:, 9],            # 9: Maliyet birim (SAYISAL)
+            'olcu_birimi': df.iloc[:, 10],           # 10: Birim (Kg., Adet vb. METİN)
+
+            'stok_grup': df.iloc[:, 11],             # 11: Grup
+            'depo_sinif': df.iloc[:, 12],            # 12: Depo Sınıfı
+            'barkod': df.iloc[:, 13],                # 13: barkod (Modelinizde barkod alanı varsa)
+        })
+    except IndexError as e:
+        raise CommandError(f"Excel sütun indeksi hatası. Dosyanızdaki sütun sayısının en az 14 (0'dan 13'e) olduğundan emin olun. Hata: {e}")
+
 
 class Command(BaseCommand):
     help = 'Belirtilen Excel dosyasından stok verilerini Malzemeler tablosuna yükler.'
 
     def add_arguments(self, parser):
         parser.add_argument('file_path', type=str, help='Yüklenecek Excel veya CSV dosyasının yolu')
+        parser.add_argument('--fark', action='store_true', help='Sadece yeni veya içeriği değişen satırları yaz (fark yükleme)')
+        parser.add_argument('--eksikleri-isaretle', action='store_true', help='Dosyada bulunmayan malzemeleri "kaynakta yok" olarak işaretle')
 
     def handle(self, *args, **options):
         file_path = options['file_path']
         self.stdout.write(f"Dosya yolu: {file_path}")
 
+        if dosya_uzantisi(file_path) not in DESTEKLENEN_UZANTILAR:
+            raise CommandError("Desteklenmeyen dosya formatı. Lütfen .xlsx, .xls veya .csv kullanın.")
+
+        # Dosya, web yüklemesiyle aynı okuyucu ile parça parça okunur ve toplu yazılır.
+        # Sayıya çevrilemeyen (Kg. gibi metin içeren) miktar/fiyatlar 0 kabul edilir, hatalı satırlar atlanır.
+        # Satırlar aktif kataloğun yeni bir sürümüne yazılır ve bitince o sürüm aktif yapılır.
         try:
-            if file_path.lower().endswith(('.xlsx', '.xls')):
-                df = pd.read_excel(file_path, header=0, sheet_name=0, na_filter=False, keep_default_na=True)
-            elif file_path.lower().endswith('.csv'):
-                df = pd.read_csv(file_path, header=0, encoding='iso-8859-9', na_filter=False, keep_default_na=True)
-            else:
-                raise CommandError("Desteklenmeyen dosya formatı. Lütfen .xlsx, .xls veya .csv kullanın.")
-        
+            with transaction.atomic():
+                versiyon = yeni_versiyon_hazirla(aciklama=f"load_stok: {file_path}")
+                ozet = parcalari_yukle(
+                    stok_parcalari_oku(file_path), sutun_hazirla=sutunlari_eslestir,
+                    kritik_hatada_dur=False, sayisal_hata='sifir',
+                    sadece_degisenler=options['fark'], eksikleri_isaretle=options['eksikleri_isaretle'],
+                    versiyon=versiyon, varsayilanlar=VARSAYILANLAR, zorunlu_alanlar=ZORUNLU_ALANLAR,
+                )
+                versiyonu_aktiflestir(versiyon)
         except FileNotFoundError:
             raise CommandError(f"HATA: Dosya bulunamadı: {file_path}")
+        except CommandError:
+            raise
         except Exception as e:
             raise CommandError(f"Dosya okunurken problem oluştu: {e}")
 
-        # 🚀 KRİTİK DÜZELTME: Sütunları, kullanıcının gönderdiği 0'dan 13'e kadar olan indekse göre EŞLEŞTİRME
-        try:
-            df_selected = pd.DataFrame({
-                'seri_no': df.iloc[:, 0],                # 0: seri_no (Yeni Alan)
-                'parti_no': df.iloc[:, 1],               # 1: Parti
-                'lokasyon_kodu': df.iloc[:, 2],          # 2: Depo Kodu
-                'depo_adi': df.iloc[:, 3],               # 3: Depo Adı
-                'malzeme_kodu': df.iloc[:, 4],           # 4: Stok Kodu
-                'malzeme_adi': df.iloc[:, 5],            # 5: Stok Adı
-                'renk': df.iloc[:, 6],                   # 6: Renk 
-                
-                'sistem_stogu': df.iloc[:, 7],           # 7: Miktar (SAYISAL)
-                'sistem_tutari_excel': df.iloc[:, 8],    # 8: Tutar (EXCEL'den okunacak, ancak kullanılmayacak)
-
-                'birim_fiyat': df.iloc[:, 9],            # 9: Maliyet birim (SAYISAL)
-                'olcu_birimi': df.iloc[:, 10],           # 10: Birim (Kg., Adet vb. METİN)
-
-                'stok_grup': df.iloc[:, 11],             # 11: Grup
-                'depo_sinif': df.iloc[:, 12],            # 12: Depo Sınıfı
-                'barkod': df.iloc[:, 13],                # 13: barkod (Modelinizde barkod alanı varsa)
-            })
-            
-        except IndexError as e:
-            raise CommandError(f"Excel sütun indeksi hatası. Dosyanızdaki sütun sayısının en az 14 (0'dan 13'e) olduğundan emin olun. Hata: {e}")
-        except Exception as e:
-            raise CommandError(f"Veri dönüşüm hatası (İndeksleme sonrası): {e}")
-
-        # Veriyi Django modeline yükleme (update_or_create kullanarak)
-        success_count = 0
-        
-        # Sütunlarda boşluk olmaması için strip metodu
-        def safe_float(value):
-            if pd.isna(value) or value is None or str(value).strip() == '':
-                return 0.0
-            # Virgül yerine nokta kullanmak ve metinsel kirleticileri temizlemek için
-            cleaned = str(value).strip().replace(',', '.')
-            
-            # Eğer değer Kg. gibi bir metin ise 0.0 döndür
-            if any(char.isalpha() for char in cleaned):
-                return 0.0 
-                
-            return float(cleaned)
-
-        
-        for index, row in df_selected.iterrows():
-            try:
-                malzeme_kodu_clean = standardize_id_part(row.get('malzeme_kodu'))
-                
-                if malzeme_kodu_clean == 'YOK':
-                    continue 
-
-                benzersiz_id_val = generate_unique_id(
-                    malzeme_kodu_clean,
-                    standardize_id_part(row.get('parti_no')),
-                    standardize_id_part(row.get('lokasyon_kodu', 'MERKEZ')),
-                    standardize_id_part(row.get('renk'))
-                )
-                
-                seri_no_val = standardize_id_part(row.get('seri_no', 'YOK')) 
-
-                # Sayısal alanlar artık özel temizleme fonksiyonu ile dönüştürülüyor
-                sistem_stogu_val = safe_float(row.get('sistem_stogu'))
-                birim_fiyat_val = safe_float(row.get('birim_fiyat'))
-                
-                # sistem_tutari Python'da hesaplanıyor
-                sistem_tutari_val = sistem_stogu_val * birim_fiyat_val
-                
-                Malzeme.objects.update_or_create(
-                    benzersiz_id=benzersiz_id_val,
-                    defaults={
-                        'malzeme_kodu': malzeme_kodu_clean,
-                        'parti_no': standardize_id_part(row.get('parti_no')),
-                        'lokasyon_kodu': standardize_id_part(row.get('lokasyon_kodu', 'MERKEZ')),
-                        'depo_adi': str(row.get('depo_adi', '')).strip(),
-                        'stok_grup': str(row.get('stok_grup', '')).strip(), 
-                        'depo_sinif': str(row.get('depo_sinif', '')).strip(),
-                        'malzeme_adi': str(row.get('malzeme_adi', 'BİLİNMEYEN')).strip(),
-                        'barkod': str(row.get('barkod', '')).strip(),
-                        'olcu_birimi': str(row.get('olcu_birimi', 'ADET')).strip(),
-                        'renk': standardize_id_part(row.get('renk')),
-                        
-                        'seri_no': seri_no_val, 
-                        
-                        'sistem_stogu': sistem_stogu_val,
-                        'sistem_tutari': sistem_tutari_val,
-                        'birim_fiyat': birim_fiyat_val
-                    }
-                )
-                success_count += 1
+        for hata in ozet['hatalar']:
+            self.stderr.write(self.style.WARNING(f"Satır {hata['satir']} atlandı ({hata['sutun']}='{hata['deger']}'): {hata['hata']}"))
 
-            except Exception as e:
-                # Hata, hangi satırın hangi veriyi float'a çeviremediğini gösterir
-                self.stderr.write(self.style.WARNING(f"Satır {index+2} yüklenemedi (Kodu: {row.get('malzeme_kodu', 'Bilinmiyor')}). Hata: {e}"))
-                continue
-        
-        self.stdout.write(self.style.SUCCESS(f'Yükleme Tamamlandı: {success_count} adet benzersiz stok kaydı yüklendi/güncellendi.'))
+        success_count = ozet['yeni'] + ozet['guncellenen']
+        self.stdout.write(self.style.SUCCESS(
+            f"Yükleme Tamamlandı: {success_count} adet benzersiz stok kaydı yüklendi/güncellendi "
+            f"({ozet['yeni']} yeni, {ozet['guncellenen']} güncellenen, {ozet['hatali']} hatalı, {ozet['tekrar']} tekrarlanan)."
+        ))
+        if options['fark']: self.stdout.write(f"Değişmeyen (yazılmayan): {ozet['degismeyen']}")
+        if ozet['eksik'] is not None: self.stdout.write(f"Dosyada olmayan (işaretlenen): {ozet['eksik']}")
+        self.stdout.write(f"Aktif katalog sürümü: v{versiyon.pk}")
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from sayim.toplamlar import toplam_farklari, toplamlari_yeniden_kur
+
+
+class Command(BaseCommand):
+    help = 'Sayım toplamlarını (SayimToplam) sayım detaylarından yeniden hesaplar; --kontrol ile sadece farkları raporlar.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--emir', type=int, action='append', dest='emirler', help='Sadece bu sayım emri (birden çok verilebilir)')
+        parser.add_argument('--kontrol', action='store_true', help='Yazmadan, tablodaki toplamları detaylarla karşılaştır')
+
+    def handle(self, *args, **options):
+        emirler = options['emirler']
+        farklar = toplam_farklari(emirler)
+        for emir_id, benzersiz_id in farklar[:50]:
+            self.stdout.write(f"Tutarsız toplam: emir {emir_id}, {benzersiz_id}")
+        if len(farklar) > 50: self.stdout.write(f"... ve {len(farklar) - 50} tutarsızlık daha")
+
+        if options['kontrol']:
+            if farklar: self.stderr.write(self.style.WARNING(f"{len(farklar)} tutarsız toplam bulundu."))
+            else: self.stdout.write(self.style.SUCCESS("Toplamlar detaylarla tutarlı."))
+            return
+
+        yazilan = toplamlari_yeniden_kur(emirler)
+        self.stdout.write(self.style.SUCCESS(f"Toplamlar yeniden kuruldu: {yazilan} satır ({len(farklar)} tutarsızlık düzeltildi)."))
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-17 20:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sayim', '0002_alter_sayimdetay_unique_together_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='malzeme',
+            name='icerik_hash',
+            field=models.BigIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='malzeme',
+            name='kaynakta_yok',
+            field=models.BooleanField(db_index=True, default=False),
+        ),
+    ]
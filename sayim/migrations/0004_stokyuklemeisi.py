@@ -0,0 +1,40 @@
+# Generated by Django 5.2.7 on 2026-10-17 20:57
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sayim', '0003_malzeme_icerik_hash_kaynakta_yok'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StokYuklemeIsi',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dosya_adi', models.CharField(max_length=255)),
+                ('dosya_yolu', models.CharField(max_length=500)),
+                ('durum', models.CharField(choices=[('Bekliyor', 'Bekliyor'), ('Çalışıyor', 'Çalışıyor'), ('Tamamlandı', 'Tamamlandı'), ('Hata', 'Hata')], db_index=True, default='Bekliyor', max_length=20)),
+                ('asama', models.CharField(blank=True, choices=[('Doğrulama', 'Doğrulama'), ('Yazma', 'Yazma')], default='', max_length=20)),
+                ('sadece_degisenler', models.BooleanField(default=False)),
+                ('eksikleri_isaretle', models.BooleanField(default=False)),
+                ('toplam_satir', models.IntegerField(blank=True, null=True)),
+                ('okunan_satir', models.IntegerField(default=0)),
+                ('yazilan_satir', models.IntegerField(default=0)),
+                ('hata_sayisi', models.IntegerField(default=0)),
+                ('mesaj', models.TextField(blank=True, default='')),
+                ('ozet', models.JSONField(blank=True, null=True)),
+                ('olusturma_tarihi', models.DateTimeField(default=django.utils.timezone.now)),
+                ('baslama_tarihi', models.DateTimeField(blank=True, null=True)),
+                ('asama_baslama_tarihi', models.DateTimeField(blank=True, null=True)),
+                ('bitis_tarihi', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Stok Yükleme İşi',
+                'verbose_name_plural': 'Stok Yükleme İşleri',
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.7 on 2026-10-17 21:00
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sayim', '0004_stokyuklemeisi'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KatalogVersiyon',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('durum', models.CharField(choices=[('Yükleniyor', 'Yükleniyor'), ('Aktif', 'Aktif'), ('Arşiv', 'Arşiv'), ('İptal', 'İptal'), ('Temizlendi', 'Temizlendi')], db_index=True, default='Yükleniyor', max_length=20)),
+                ('aciklama', models.CharField(blank=True, default='', max_length=255)),
+                ('olusturma_tarihi', models.DateTimeField(default=django.utils.timezone.now)),
+                ('aktiflesme_tarihi', models.DateTimeField(blank=True, null=True)),
+                ('temel_versiyon', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='sayim.katalogversiyon')),
+                ('yukleme_isi', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='versiyonlar', to='sayim.stokyuklemeisi')),
+            ],
+            options={
+                'verbose_name': 'Katalog Versiyonu',
+                'verbose_name_plural': 'Katalog Versiyonları',
+            },
+        ),
+        migrations.AddField(
+            model_name='malzeme',
+            name='versiyon',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='malzemeler', to='sayim.katalogversiyon'),
+        ),
+        migrations.AddConstraint(
+            model_name='katalogversiyon',
+            constraint=models.UniqueConstraint(condition=models.Q(('durum', 'Aktif')), fields=('durum',), name='tek_aktif_katalog_versiyonu'),
+        ),
+    ]
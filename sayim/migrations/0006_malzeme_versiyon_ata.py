@@ -0,0 +1,25 @@
+from django.db import migrations
+from django.utils import timezone
+
+
+def mevcut_malzemeleri_ilk_versiyona_ata(apps, schema_editor):
+    """Sürümlerden önce yüklenmiş malzemeleri aktif ilk sürüme bağlar."""
+    KatalogVersiyon = apps.get_model('sayim', 'KatalogVersiyon')
+    Malzeme = apps.get_model('sayim', 'Malzeme')
+    if not Malzeme.objects.filter(versiyon__isnull=True).exists():
+        return
+    versiyon = KatalogVersiyon.objects.filter(durum='Aktif').first() or KatalogVersiyon.objects.create(
+        durum='Aktif', aktiflesme_tarihi=timezone.now(), aciklama='İlk katalog',
+    )
+    Malzeme.objects.filter(versiyon__isnull=True).update(versiyon=versiyon)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sayim', '0005_katalogversiyon'),
+    ]
+
+    operations = [
+        migrations.RunPython(mevcut_malzemeleri_ilk_versiyona_ata, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sayim', '0006_malzeme_versiyon_ata'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='malzeme',
+            name='versiyon',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='malzemeler', to='sayim.katalogversiyon'),
+        ),
+        migrations.AlterField(
+            model_name='malzeme',
+            name='benzersiz_id',
+            field=models.CharField(db_index=True, editable=False, max_length=255),
+        ),
+        migrations.AddConstraint(
+            model_name='malzeme',
+            constraint=models.UniqueConstraint(fields=('versiyon', 'benzersiz_id'), name='malzeme_versiyon_benzersiz_id'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-17 21:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sayim', '0007_malzeme_versiyon_zorunlu'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='katalogversiyon',
+            name='revizyon',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
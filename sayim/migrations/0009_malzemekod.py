@@ -0,0 +1,36 @@
+# Generated by Django 5.2.7 on 2026-10-17 21:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sayim', '0008_katalogversiyon_revizyon'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='malzeme',
+            name='alternatif_kodlar',
+            field=models.CharField(blank=True, default='', max_length=500),
+        ),
+        migrations.CreateModel(
+            name='MalzemeKod',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('lokasyon_kodu', models.CharField(max_length=100)),
+                ('kod', models.CharField(max_length=255)),
+                ('tur', models.CharField(choices=[('benzersiz_id', 'Benzersiz ID'), ('seri_no', 'Seri No'), ('barkod', 'Barkod'), ('alternatif', 'Alternatif Kod'), ('stok_kodu', 'Stok Kodu')], max_length=20)),
+                ('oncelik', models.PositiveSmallIntegerField()),
+                ('malzeme', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='kodlar', to='sayim.malzeme')),
+                ('versiyon', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='sayim.katalogversiyon')),
+            ],
+            options={
+                'verbose_name': 'Malzeme Kodu',
+                'verbose_name_plural': 'Malzeme Kodları',
+                'indexes': [models.Index(fields=['versiyon', 'lokasyon_kodu', 'kod', 'oncelik', 'malzeme'], name='malzemekod_arama')],
+            },
+        ),
+    ]
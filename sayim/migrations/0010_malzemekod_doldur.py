@@ -0,0 +1,46 @@
+from django.db import migrations
+
+ONCELIKLER = {'benzersiz_id': 0, 'seri_no': 1, 'barkod': 2, 'stok_kodu': 4}
+PARCA_BOYUTU = 1000
+
+
+def standardize_id_part(value):
+    """sayim.models.standardize_id_part'ın bu migration yazıldığı andaki kopyası (sonraki değişiklikler geçmişi değiştirmesin)."""
+    cleaned = str(value).strip().upper()
+    if not cleaned or cleaned in ('NAN', 'NONE', 'NULL', 'NA'):
+        return 'YOK'
+    return cleaned
+
+
+def kod_tablosunu_doldur(apps, schema_editor):
+    """Mevcut (aktif ve arşiv) sürümlerin malzemeleri için okutulabilir kodları üretir."""
+    Malzeme = apps.get_model('sayim', 'Malzeme')
+    MalzemeKod = apps.get_model('sayim', 'MalzemeKod')
+    satirlar = Malzeme.objects.filter(versiyon__durum__in=['Aktif', 'Arşiv']).order_by('pk').values_list(
+        'pk', 'versiyon_id', 'lokasyon_kodu', 'benzersiz_id', 'seri_no', 'barkod', 'malzeme_kodu',
+    )
+    kodlar = []
+    for pk, versiyon_id, lokasyon, benzersiz_id, seri_no, barkod, malzeme_kodu in satirlar.iterator(chunk_size=PARCA_BOYUTU):
+        gorulen = set()
+        for ham, tur in ((benzersiz_id, 'benzersiz_id'), (seri_no, 'seri_no'), (barkod, 'barkod'), (malzeme_kodu, 'stok_kodu')):
+            kod = standardize_id_part('' if ham is None else ham)
+            if kod == 'YOK' or kod in gorulen: continue
+            gorulen.add(kod)
+            kodlar.append(MalzemeKod(
+                versiyon_id=versiyon_id, malzeme_id=pk, lokasyon_kodu=standardize_id_part(lokasyon),
+                kod=kod[:255], tur=tur, oncelik=ONCELIKLER[tur],
+            ))
+        if len(kodlar) >= PARCA_BOYUTU:
+            MalzemeKod.objects.bulk_create(kodlar); kodlar = []
+    MalzemeKod.objects.bulk_create(kodlar)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sayim', '0009_malzemekod'),
+    ]
+
+    operations = [
+        migrations.RunPython(kod_tablosunu_doldur, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,89 @@
+# Generated by Django 5.2.7 on 2026-10-17 21:11
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+PARCA_BOYUTU = 1000
+
+# sayim.models'teki STANDART_ALANLAR ve standardize_id_part'ın bu migration yazıldığı
+# andaki kopyaları (sonraki değişiklikler geçmiş migration'ın yaptığını değiştirmesin)
+STANDART_ALANLAR = ('malzeme_kodu', 'parti_no', 'lokasyon_kodu', 'renk', 'seri_no')
+
+
+def standardize_id_part(value):
+    cleaned = str(value).strip().upper()
+    if not cleaned or cleaned in ('NAN', 'NONE', 'NULL', 'NA'):
+        return 'YOK'
+    return cleaned
+
+
+def alanlari_standartlastir(apps, schema_editor):
+    """Elle/admin ile yazılmış standart dışı (küçük harfli, boşluklu, boş) arama alanlarını düzeltir."""
+    Malzeme = apps.get_model('sayim', 'Malzeme')
+    degisenler = []
+    for malzeme in Malzeme.objects.order_by('pk').only('pk', *STANDART_ALANLAR).iterator(chunk_size=PARCA_BOYUTU):
+        yeni = {alan: standardize_id_part(getattr(malzeme, alan)) for alan in STANDART_ALANLAR}
+        if any(getattr(malzeme, alan) != deger for alan, deger in yeni.items()):
+            for alan, deger in yeni.items(): setattr(malzeme, alan, deger)
+            degisenler.append(malzeme)
+        if len(degisenler) >= PARCA_BOYUTU:
+            Malzeme.objects.bulk_update(degisenler, STANDART_ALANLAR); degisenler = []
+    Malzeme.objects.bulk_update(degisenler, STANDART_ALANLAR)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sayim', '0010_malzemekod_doldur'),
+    ]
+
+    operations = [
+        migrations.RunPython(alanlari_standartlastir, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='malzeme',
+            name='lokasyon_kodu',
+            field=models.CharField(default='YOK', max_length=100),
+        ),
+        migrations.AlterField(
+            model_name='malzeme',
+            name='malzeme_kodu',
+            field=models.CharField(max_length=100),
+        ),
+        migrations.AlterField(
+            model_name='malzeme',
+            name='parti_no',
+            field=models.CharField(blank=True, default='YOK', max_length=100, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='malzeme',
+            index=models.Index(fields=['versiyon', 'lokasyon_kodu', 'malzeme_kodu', 'parti_no', 'renk'], name='malzeme_depo_stok'),
+        ),
+        migrations.AddIndex(
+            model_name='malzeme',
+            index=models.Index(fields=['versiyon', 'lokasyon_kodu', 'parti_no'], name='malzeme_depo_parti'),
+        ),
+        migrations.AddIndex(
+            model_name='malzeme',
+            index=models.Index(fields=['versiyon', 'malzeme_kodu', 'lokasyon_kodu'], name='malzeme_stok_depo'),
+        ),
+        migrations.AddConstraint(
+            model_name='malzeme',
+            constraint=models.CheckConstraint(condition=models.Q(('malzeme_kodu', django.db.models.functions.text.Upper(django.db.models.functions.text.Trim('malzeme_kodu')))), name='malzeme_malzeme_kodu_standart'),
+        ),
+        migrations.AddConstraint(
+            model_name='malzeme',
+            constraint=models.CheckConstraint(condition=models.Q(('parti_no', django.db.models.functions.text.Upper(django.db.models.functions.text.Trim('parti_no')))), name='malzeme_parti_no_standart'),
+        ),
+        migrations.AddConstraint(
+            model_name='malzeme',
+            constraint=models.CheckConstraint(condition=models.Q(('lokasyon_kodu', django.db.models.functions.text.Upper(django.db.models.functions.text.Trim('lokasyon_kodu')))), name='malzeme_lokasyon_kodu_standart'),
+        ),
+        migrations.AddConstraint(
+            model_name='malzeme',
+            constraint=models.CheckConstraint(condition=models.Q(('renk', django.db.models.functions.text.Upper(django.db.models.functions.text.Trim('renk')))), name='malzeme_renk_standart'),
+        ),
+        migrations.AddConstraint(
+            model_name='malzeme',
+            constraint=models.CheckConstraint(condition=models.Q(('seri_no', django.db.models.functions.text.Upper(django.db.models.functions.text.Trim('seri_no')))), name='malzeme_seri_no_standart'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-17 21:14
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sayim', '0011_malzeme_standart_alanlar'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SayimToplam',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('benzersiz_id', models.CharField(max_length=255)),
+                ('toplam_miktar', models.DecimalField(decimal_places=5, default=Decimal('0.0'), max_digits=19)),
+                ('kayit_sayisi', models.PositiveIntegerField(default=0)),
+                ('son_sayim_tarihi', models.DateTimeField()),
+                ('son_personel', models.CharField(max_length=100)),
+                ('sayim_emri', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='toplamlar', to='sayim.sayimemri')),
+            ],
+            options={
+                'verbose_name': 'Sayım Toplamı',
+                'verbose_name_plural': 'Sayım Toplamları',
+                'indexes': [models.Index(fields=['benzersiz_id', 'son_sayim_tarihi'], name='sayim_toplam_son_sayim')],
+                'constraints': [models.UniqueConstraint(fields=('sayim_emri', 'benzersiz_id'), name='sayim_toplam_emir_malzeme')],
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+from django.db import migrations
+from django.db.models import Count, Max, OuterRef, Subquery, Sum
+
+
+def toplamlari_doldur(apps, schema_editor):
+    """Mevcut sayım detaylarından emir + malzeme toplamlarını üretir."""
+    SayimDetay = apps.get_model('sayim', 'SayimDetay')
+    SayimToplam = apps.get_model('sayim', 'SayimToplam')
+    son_personel = SayimDetay.objects.filter(
+        sayim_emri_id=OuterRef('sayim_emri_id'), benzersiz_malzeme__benzersiz_id=OuterRef('benzersiz_malzeme__benzersiz_id'),
+    ).order_by('-kayit_tarihi', '-pk').values('personel_adi')[:1]
+    satirlar = SayimDetay.objects.values('sayim_emri_id', 'benzersiz_malzeme__benzersiz_id').annotate(
+        toplam=Sum('sayilan_stok'), sayi=Count('pk'), son_tarih=Max('kayit_tarihi'), son_personel=Subquery(son_personel),
+    ).order_by()
+    SayimToplam.objects.bulk_create([
+        SayimToplam(sayim_emri_id=s['sayim_emri_id'], benzersiz_id=s['benzersiz_malzeme__benzersiz_id'], toplam_miktar=s['toplam'],
+                    kayit_sayisi=s['sayi'], son_sayim_tarihi=s['son_tarih'], son_personel=s['son_personel'] or '')
+        for s in satirlar
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sayim', '0012_sayimtoplam'),
+    ]
+
+    operations = [
+        migrations.RunPython(toplamlari_doldur, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-17 21:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sayim', '0013_sayimtoplam_doldur'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sayimdetay',
+            name='istemci_id',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, unique=True),
+        ),
+    ]
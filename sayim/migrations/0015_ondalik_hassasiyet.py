@@ -0,0 +1,61 @@
+from decimal import ROUND_HALF_EVEN, Decimal
+
+from django.db import migrations
+from django.db.models import Sum
+
+HASSASIYET = Decimal('0.00001')
+PARCA = 1000
+
+
+def _fazla_basamakli(model, alan, schema_editor):
+    # SQLite beşten fazla ondalığı saklayabilir; bu satırlar ham değerle bulunur
+    tablo = schema_editor.quote_name(model._meta.db_table)
+    sutun = schema_editor.quote_name(model._meta.get_field(alan).column)
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f"SELECT id FROM {tablo} WHERE ROUND({sutun}, 5) != {sutun}")
+        return {satir[0] for satir in cursor.fetchall()}
+
+
+def ondaliklari_yuvarla(apps, schema_editor):
+    """Miktar/fiyat alanlarını 5 ondalığa (Django'nun okurken yaptığı gibi yarımda çifte) yuvarlar."""
+    if schema_editor.connection.vendor != 'sqlite':
+        return  # Diğer veritabanları numeric(19, 5) sütununda zaten yuvarlar
+    yuvarla = lambda d: Decimal(d).quantize(HASSASIYET, rounding=ROUND_HALF_EVEN)
+
+    Malzeme = apps.get_model('sayim', 'Malzeme')
+    idler = set()
+    for alan in ('sistem_stogu', 'birim_fiyat', 'sistem_tutari'):
+        idler |= _fazla_basamakli(Malzeme, alan, schema_editor)
+    idler = sorted(idler)
+    for i in range(0, len(idler), PARCA):
+        malzemeler = list(Malzeme.objects.filter(pk__in=idler[i:i + PARCA]))
+        for m in malzemeler:
+            m.sistem_stogu, m.birim_fiyat = yuvarla(m.sistem_stogu), yuvarla(m.birim_fiyat)
+            m.sistem_tutari = yuvarla(m.sistem_stogu * m.birim_fiyat)
+        Malzeme.objects.bulk_update(malzemeler, ['sistem_stogu', 'birim_fiyat', 'sistem_tutari'])
+
+    SayimDetay = apps.get_model('sayim', 'SayimDetay')
+    SayimToplam = apps.get_model('sayim', 'SayimToplam')
+    idler = sorted(_fazla_basamakli(SayimDetay, 'sayilan_stok', schema_editor))
+    anahtarlar = set()
+    for i in range(0, len(idler), PARCA):
+        detaylar = list(SayimDetay.objects.filter(pk__in=idler[i:i + PARCA]).select_related('benzersiz_malzeme'))
+        for d in detaylar:
+            d.sayilan_stok = yuvarla(d.sayilan_stok)
+            anahtarlar.add((d.sayim_emri_id, d.benzersiz_malzeme.benzersiz_id))
+        SayimDetay.objects.bulk_update(detaylar, ['sayilan_stok'])
+    # Yuvarlanan detayların toplamları yeniden hesaplanır
+    for emir_id, bid in anahtarlar:
+        toplam = SayimDetay.objects.filter(sayim_emri_id=emir_id, benzersiz_malzeme__benzersiz_id=bid).aggregate(t=Sum('sayilan_stok'))['t']
+        SayimToplam.objects.filter(sayim_emri_id=emir_id, benzersiz_id=bid).update(toplam_miktar=toplam or Decimal('0.0'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sayim', '0014_sayimdetay_istemci_id'),
+    ]
+
+    operations = [
+        migrations.RunPython(ondaliklari_yuvarla, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-17 21:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sayim', '0015_ondalik_hassasiyet'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sayimdetay',
+            index=models.Index(fields=['sayim_emri', 'personel_adi', 'guncellenme_tarihi'], name='sayimdetay_performans'),
+        ),
+    ]
@@ -0,0 +1,83 @@
+# Generated by Django 5.2.7 on 2026-10-17 21:51
+
+from django.db import migrations, models
+
+PARCA = 2000
+
+# sayim.models.koordinat_donustur ve sayim.geohash.geohash_kodla'nın bu migration
+# yazıldığı andaki kopyaları (sonraki değişiklikler geçmiş migration'ın yaptığını değiştirmesin)
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def koordinat_donustur(deger, sinir):
+    try:
+        sayi = float(str(deger).replace(',', '.').strip())
+    except (TypeError, ValueError):
+        return None
+    return sayi if -sinir <= sayi <= sinir else None
+
+
+def geohash_kodla(enlem, boylam, hassasiyet=9):
+    enlem_aralik, boylam_aralik = [-90.0, 90.0], [-180.0, 180.0]
+    kod, bitler, bit_sayisi, boylam_sirasi = [], 0, 0, True
+    while len(kod) < hassasiyet:
+        aralik, deger = (boylam_aralik, boylam) if boylam_sirasi else (enlem_aralik, enlem)
+        orta = (aralik[0] + aralik[1]) / 2
+        bitler <<= 1
+        if deger >= orta:
+            bitler |= 1
+            aralik[0] = orta
+        else:
+            aralik[1] = orta
+        boylam_sirasi = not boylam_sirasi
+        bit_sayisi += 1
+        if bit_sayisi == 5:
+            kod.append(BASE32[bitler])
+            bitler, bit_sayisi = 0, 0
+    return ''.join(kod)
+
+
+def konumlari_doldur(apps, schema_editor):
+    """Mevcut kayıtların metin koordinatlarından enlem/boylam ve geohash hücresini doldurur."""
+    SayimDetay = apps.get_model('sayim', 'SayimDetay')
+    adaylar = SayimDetay.objects.exclude(latitude__isnull=True).exclude(longitude__isnull=True)\
+        .exclude(latitude__in=['YOK', '']).exclude(longitude__in=['YOK', ''])
+    idler = list(adaylar.order_by('pk').values_list('pk', flat=True))
+    for i in range(0, len(idler), PARCA):
+        detaylar = []
+        for d in SayimDetay.objects.filter(pk__in=idler[i:i + PARCA]).only('pk', 'latitude', 'longitude'):
+            d.enlem, d.boylam = koordinat_donustur(d.latitude, 90), koordinat_donustur(d.longitude, 180)
+            if d.enlem is None or d.boylam is None: continue
+            d.konum_hucresi = geohash_kodla(d.enlem, d.boylam)
+            detaylar.append(d)
+        SayimDetay.objects.bulk_update(detaylar, ['enlem', 'boylam', 'konum_hucresi'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sayim', '0016_sayimdetay_performans_indeksi'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sayimdetay',
+            name='boylam',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='sayimdetay',
+            name='enlem',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='sayimdetay',
+            name='konum_hucresi',
+            field=models.CharField(blank=True, editable=False, max_length=9, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='sayimdetay',
+            index=models.Index(fields=['sayim_emri', 'konum_hucresi'], name='sayimdetay_konum'),
+        ),
+        migrations.RunPython(konumlari_doldur, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.7 on 2026-10-17 21:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sayim', '0017_sayimdetay_sayisal_konum'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sayimemri',
+            name='kapanis_ozeti',
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+        migrations.CreateModel(
+            name='SayimRaporSatiri',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('benzersiz_id', models.CharField(max_length=255)),
+                ('malzeme_kodu', models.CharField(max_length=100)),
+                ('malzeme_adi', models.CharField(max_length=255)),
+                ('parti_no', models.CharField(blank=True, max_length=100, null=True)),
+                ('renk', models.CharField(blank=True, max_length=50, null=True)),
+                ('olcu_birimi', models.CharField(max_length=20)),
+                ('lokasyon_kodu', models.CharField(max_length=100)),
+                ('stok_grup', models.CharField(blank=True, max_length=100, null=True)),
+                ('sistem', models.DecimalField(decimal_places=5, max_digits=19)),
+                ('sayilan', models.DecimalField(decimal_places=5, max_digits=19)),
+                ('fiyat', models.DecimalField(decimal_places=5, max_digits=19)),
+                ('mik_fark', models.DecimalField(decimal_places=5, max_digits=19)),
+                ('sistem_tutar', models.DecimalField(decimal_places=5, max_digits=19)),
+                ('tutar_fark', models.DecimalField(decimal_places=5, max_digits=19)),
+                ('mik_fark_mutlak', models.DecimalField(decimal_places=5, max_digits=19)),
+                ('tutar_fark_mutlak', models.DecimalField(decimal_places=5, max_digits=19)),
+                ('etiket', models.CharField(max_length=20)),
+                ('etiket_sira', models.PositiveSmallIntegerField()),
+                ('sayim_emri', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rapor_satirlari', to='sayim.sayimemri')),
+            ],
+            options={
+                'verbose_name': 'Sayım Rapor Satırı',
+                'verbose_name_plural': 'Sayım Rapor Satırları',
+                'indexes': [models.Index(fields=['sayim_emri', 'etiket_sira', 'lokasyon_kodu', 'malzeme_kodu', 'parti_no', 'renk', 'id'], name='raporsatiri_oncelik'), models.Index(fields=['sayim_emri', 'malzeme_kodu', 'parti_no', 'renk', 'lokasyon_kodu', 'id'], name='raporsatiri_kod'), models.Index(fields=['sayim_emri', 'lokasyon_kodu', 'malzeme_kodu', 'parti_no', 'renk', 'id'], name='raporsatiri_depo'), models.Index(fields=['sayim_emri', 'tutar_fark_mutlak', 'id'], name='raporsatiri_tutar_fark'), models.Index(fields=['sayim_emri', 'mik_fark_mutlak', 'id'], name='raporsatiri_mik_fark')],
+            },
+        ),
+    ]
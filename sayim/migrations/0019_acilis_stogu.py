@@ -0,0 +1,58 @@
+# Generated by Django 5.2.7 on 2026-10-17 21:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+PARCA = 2000
+ALANLAR = ('benzersiz_id', 'malzeme_kodu', 'malzeme_adi', 'parti_no', 'renk', 'olcu_birimi', 'lokasyon_kodu', 'stok_grup', 'sistem_stogu', 'birim_fiyat')
+
+
+def acilis_stoklarini_doldur(apps, schema_editor):
+    """
+    Raporu dondurulmamış mevcut emirlere aktif katalogdan açılış stoğu yazar. Açılış anındaki
+    stoklar bilinmediğinden bugünkü stoklar alınır; bu, emirlerin raporlarının şimdiye kadarki
+    (canlı katalogdan hesaplanan) değerleriyle aynıdır.
+    """
+    SayimEmri = apps.get_model('sayim', 'SayimEmri')
+    Malzeme = apps.get_model('sayim', 'Malzeme')
+    AcilisStogu = apps.get_model('sayim', 'AcilisStogu')
+    idler = list(Malzeme.objects.filter(versiyon__durum='Aktif').order_by('pk').values_list('pk', flat=True))
+    for emir_id in SayimEmri.objects.filter(kapanis_ozeti__isnull=True).values_list('pk', flat=True):
+        for i in range(0, len(idler), PARCA):
+            AcilisStogu.objects.bulk_create([
+                AcilisStogu(sayim_emri_id=emir_id, **dict(zip(ALANLAR, satir)))
+                for satir in Malzeme.objects.filter(pk__in=idler[i:i + PARCA]).order_by('pk').values_list(*ALANLAR)
+            ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sayim', '0018_sayim_rapor_satiri'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AcilisStogu',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('benzersiz_id', models.CharField(max_length=255)),
+                ('malzeme_kodu', models.CharField(max_length=100)),
+                ('malzeme_adi', models.CharField(max_length=255)),
+                ('parti_no', models.CharField(blank=True, max_length=100, null=True)),
+                ('renk', models.CharField(blank=True, max_length=50, null=True)),
+                ('olcu_birimi', models.CharField(max_length=20)),
+                ('lokasyon_kodu', models.CharField(max_length=100)),
+                ('stok_grup', models.CharField(blank=True, max_length=100, null=True)),
+                ('sistem_stogu', models.DecimalField(decimal_places=5, max_digits=19)),
+                ('birim_fiyat', models.DecimalField(decimal_places=5, max_digits=19)),
+                ('sayim_emri', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='acilis_stoklari', to='sayim.sayimemri')),
+            ],
+            options={
+                'verbose_name': 'Açılış Stoğu',
+                'verbose_name_plural': 'Açılış Stokları',
+                'constraints': [models.UniqueConstraint(fields=('sayim_emri', 'benzersiz_id'), name='acilis_stogu_emir_malzeme')],
+            },
+        ),
+        migrations.RunPython(acilis_stoklarini_doldur, migrations.RunPython.noop),
+    ]
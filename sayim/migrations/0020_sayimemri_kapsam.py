@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-17 21:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sayim', '0019_acilis_stogu'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sayimemri',
+            name='kapsam',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-17 22:01
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sayim', '0020_sayimemri_kapsam'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OcrIsi',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('durum', models.CharField(choices=[('Bekliyor', 'Bekliyor'), ('Çalışıyor', 'Çalışıyor'), ('Tamamlandı', 'Tamamlandı'), ('Hata', 'Hata')], db_index=True, default='Bekliyor', max_length=20)),
+                ('arka_uc', models.CharField(blank=True, default='', max_length=100)),
+                ('mesaj', models.TextField(blank=True, default='')),
+                ('sonuclar', models.JSONField(blank=True, null=True)),
+                ('olusturma_tarihi', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('baslama_tarihi', models.DateTimeField(blank=True, null=True)),
+                ('bitis_tarihi', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'OCR İşi',
+                'verbose_name_plural': 'OCR İşleri',
+            },
+        ),
+    ]
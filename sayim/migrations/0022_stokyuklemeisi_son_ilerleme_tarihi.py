@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-17 22:07
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sayim', '0021_ocrisi'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stokyuklemeisi',
+            name='son_ilerleme_tarihi',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
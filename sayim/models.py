@@ -1,6 +1,9 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models.functions import Trim, Upper
 from django.utils import timezone
-from decimal import Decimal # DecimalField için eklendi
+from decimal import ROUND_HALF_EVEN, Decimal # DecimalField için eklendi
+
+from .geohash import geohash_kodla
 
 # --- MERKEZİ ID TEMİZLEME VE OLUŞTURMA FONKSİYONLARI ---
 
@@ -13,6 +16,25 @@ def standardize_id_part(value):
         return 'YOK'
     return cleaned
 
+# Miktar/fiyat alanlarının hassasiyeti (decimal_places=5). SQLite fazla basamağı olduğu gibi saklar,
+# Django okurken yuvarlar; SQL'de yapılan hesaplar okunan değerle aynı olsun diye yazmadan önce yuvarlanır.
+ONDALIK_HASSASIYET = Decimal('0.00001')
+
+def ondalik_yuvarla(deger):
+    return Decimal(deger).quantize(ONDALIK_HASSASIYET, rounding=ROUND_HALF_EVEN)
+
+def koordinat_donustur(deger, sinir):
+    """Cihazdan gelen koordinat metnini ('41,0082', 'YOK', ...) sayıya çevirir; geçersizse None."""
+    try:
+        sayi = float(str(deger).replace(',', '.').strip())
+    except (TypeError, ValueError):
+        return None
+    return sayi if -sinir <= sayi <= sinir else None  # nan/inf de burada elenir
+
+# Yazılırken standardize_id_part ile temizlenen arama alanları; okumalar bu sayede
+# __iexact (UPPER/LIKE) yerine indeksli eşitlik ile yapılır
+STANDART_ALANLAR = ('malzeme_kodu', 'parti_no', 'lokasyon_kodu', 'renk', 'seri_no')
+
 def generate_unique_id(stok_kod, parti_no, lokasyon_kod, renk):
     """
     Standartlaştırılmış parçalardan ana benzersiz ID'yi oluşturur.
@@ -26,17 +48,81 @@ def generate_unique_id(stok_kod, parti_no, lokasyon_kod, renk):
 
 # --------------------------------------------------------
 
+# --- KATALOG VERSİYONLARI ---
+
+class KatalogVersiyon(models.Model):
+    """
+    Malzeme kataloğunun bir sürümü. Stok yüklemeleri aktif sürümün kopyası olan
+    yeni bir sürüme yazılır ve bitince tek bir transaction ile aktif yapılır;
+    arama, sayım ve raporlar sadece 'Aktif' sürümü okur. Önceki sürüm geri
+    dönüş için 'Arşiv' olarak saklanır (bkz. katalog.py).
+    """
+    DURUM_SECENEKLERI = [
+        ('Yükleniyor', 'Yükleniyor'),
+        ('Aktif', 'Aktif'),
+        ('Arşiv', 'Arşiv'),
+        ('İptal', 'İptal'),            # Başarısız veya geri alınmış yükleme
+        ('Temizlendi', 'Temizlendi'),  # Sayımlarda kullanılmayan satırları silinmiş eski sürüm
+    ]
+
+    durum = models.CharField(max_length=20, choices=DURUM_SECENEKLERI, default='Yükleniyor', db_index=True)
+    temel_versiyon = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    yukleme_isi = models.ForeignKey('StokYuklemeIsi', on_delete=models.SET_NULL, null=True, blank=True, related_name='versiyonlar')
+    aciklama = models.CharField(max_length=255, blank=True, default='')
+    olusturma_tarihi = models.DateTimeField(default=timezone.now)
+    aktiflesme_tarihi = models.DateTimeField(null=True, blank=True)
+    # Sürümdeki malzemeler yerinde değiştikçe (onay, doğrudan yazma) artar;
+    # süreç içi arama indeksleri (sürüm, revizyon) değişince yeniden kurulur.
+    revizyon = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Katalog Versiyonu"
+        verbose_name_plural = "Katalog Versiyonları"
+        constraints = [
+            # Aynı anda sadece bir aktif sürüm olabilir
+            models.UniqueConstraint(fields=['durum'], condition=models.Q(durum='Aktif'), name='tek_aktif_katalog_versiyonu'),
+        ]
+
+    def __str__(self):
+        return f"Katalog v{self.pk} ({self.durum})"
+
+    @classmethod
+    def aktif_versiyon(cls):
+        """Aktif sürümü döndürür; hiç yoksa (boş veritabanı) oluşturur."""
+        versiyon = cls.objects.filter(durum='Aktif').first()
+        if versiyon is None:
+            try:
+                with transaction.atomic():
+                    versiyon = cls.objects.create(durum='Aktif', aktiflesme_tarihi=timezone.now(), aciklama='İlk katalog')
+            except IntegrityError:
+                versiyon = cls.objects.get(durum='Aktif')
+        return versiyon
+
+    def revizyonu_artir(self):
+        """Sürümün satırları yerinde değiştirildikten sonra çağrılır."""
+        KatalogVersiyon.objects.filter(pk=self.pk).update(revizyon=models.F('revizyon') + 1)
+
+
+class MalzemeQuerySet(models.QuerySet):
+    def aktif(self):
+        """Sadece aktif katalog sürümündeki malzemeler (arama, sayım ve raporlar için)."""
+        return self.filter(versiyon__durum='Aktif')
+
+
 class Malzeme(models.Model):
-    # Ana Benzersiz Tanımlayıcı
-    benzersiz_id = models.CharField(max_length=255, unique=True, db_index=True, editable=False)
+    # Kataloğun hangi sürümüne ait olduğu (benzersiz_id her sürümde tekrar eder)
+    versiyon = models.ForeignKey(KatalogVersiyon, on_delete=models.PROTECT, related_name='malzemeler')
+
+    # Ana Benzersiz Tanımlayıcı (sürüm içinde benzersiz)
+    benzersiz_id = models.CharField(max_length=255, db_index=True, editable=False)
     
     # Yeni Eklenen Alan: Seri No (Akıllı arama için öncelikli anahtar)
     seri_no = models.CharField(max_length=100, null=True, blank=True, default='YOK', db_index=True)
     
-    # Stok Tanımlama Alanları
-    malzeme_kodu = models.CharField(max_length=100, db_index=True) # Arama için index eklendi
-    parti_no = models.CharField(max_length=100, null=True, blank=True, default='YOK', db_index=True) # Arama için index eklendi
-    lokasyon_kodu = models.CharField(max_length=100, default='YOK', db_index=True) # Arama için index eklendi
+    # Stok Tanımlama Alanları (arama indeksleri Meta'da, sürümle birleşik)
+    malzeme_kodu = models.CharField(max_length=100)
+    parti_no = models.CharField(max_length=100, null=True, blank=True, default='YOK')
+    lokasyon_kodu = models.CharField(max_length=100, default='YOK')
     renk = models.CharField(max_length=50, null=True, blank=True, default='YOK')
     
     # Açıklayıcı Alanlar
@@ -45,6 +131,8 @@ class Malzeme(models.Model):
     depo_sinif = models.CharField(max_length=100, null=True, blank=True)
     malzeme_adi = models.CharField(max_length=255)
     barkod = models.CharField(max_length=100, null=True, blank=True)
+    # Tedarikçi / eski kodlar ('|', ',' veya ';' ile ayrılmış); okutmada MalzemeKod üzerinden aranır
+    alternatif_kodlar = models.CharField(max_length=500, blank=True, default='')
     olcu_birimi = models.CharField(max_length=20)
     
     # Stok/Finansal Alanlar
@@ -53,14 +141,41 @@ class Malzeme(models.Model):
     sistem_tutari = models.DecimalField(max_digits=19, decimal_places=5, default=Decimal('0.0'))
     birim_fiyat = models.DecimalField(max_digits=19, decimal_places=5, default=Decimal('0.0'))
 
+    # Fark (delta) yükleme için: son yüklemedeki satır içeriğinin özeti ve
+    # son yüklenen dosyada bulunmayan kayıtların işareti
+    icerik_hash = models.BigIntegerField(null=True, blank=True, editable=False)
+    kaynakta_yok = models.BooleanField(default=False, db_index=True)
+
+    objects = MalzemeQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Malzeme"
         verbose_name_plural = "Malzemeler"
+        constraints = [
+            models.UniqueConstraint(fields=['versiyon', 'benzersiz_id'], name='malzeme_versiyon_benzersiz_id'),
+        ] + [
+            # Arama alanları büyük harfli ve kenar boşluksuz saklanır
+            models.CheckConstraint(condition=models.Q(**{alan: Upper(Trim(alan))}), name=f'malzeme_{alan}_standart')
+            for alan in STANDART_ALANLAR
+        ]
+        indexes = [
+            # Okutma: depo + stok kodu (+ parti + renk) ve stok kodu varyantları
+            models.Index(fields=['versiyon', 'lokasyon_kodu', 'malzeme_kodu', 'parti_no', 'renk'], name='malzeme_depo_stok'),
+            # Okutma: stok kodu olmadan sadece parti
+            models.Index(fields=['versiyon', 'lokasyon_kodu', 'parti_no'], name='malzeme_depo_parti'),
+            # "Başka depolarda" uyarısı (stok kodu -> depolar, kapsayan indeks)
+            models.Index(fields=['versiyon', 'malzeme_kodu', 'lokasyon_kodu'], name='malzeme_stok_depo'),
+        ]
         
     def __str__(self):
         return f"{self.malzeme_kodu} ({self.benzersiz_id})"
 
     def save(self, *args, **kwargs):
+        # Sürüm verilmeden oluşturulan kayıtlar aktif kataloğa eklenir
+        if self.versiyon_id is None:
+            self.versiyon = KatalogVersiyon.aktif_versiyon()
+        for alan in STANDART_ALANLAR:
+            setattr(self, alan, standardize_id_part(getattr(self, alan)))
         # Kayıt edilmeden hemen önce benzersiz_id'yi hesapla
         self.benzersiz_id = generate_unique_id(
             self.malzeme_kodu, 
@@ -73,10 +188,47 @@ class Malzeme(models.Model):
              self.sistem_stogu = Decimal(str(self.sistem_stogu))
         if isinstance(self.birim_fiyat, (int, float, str)):
              self.birim_fiyat = Decimal(str(self.birim_fiyat))
+        self.sistem_stogu, self.birim_fiyat = ondalik_yuvarla(self.sistem_stogu), ondalik_yuvarla(self.birim_fiyat)
              
-        self.sistem_tutari = self.sistem_stogu * self.birim_fiyat
+        self.sistem_tutari = ondalik_yuvarla(self.sistem_stogu * self.birim_fiyat)
+        # Elle/onayla yapılan değişiklikten sonra bir sonraki fark yüklemesi bu satırı tekrar yazsın
+        self.icerik_hash = None
         super().save(*args, **kwargs)
 
+class MalzemeKod(models.Model):
+    """
+    Okutulabilir kodların (benzersiz_id, seri no, barkod, alternatif kodlar, stok kodu)
+    standartlaştırılmış halde malzemeye eşlendiği tablo. Okutma, (sürüm, depo, kod)
+    üzerinde tek bir eşitlik sorgusuyla çözülür; aynı kod birden çok malzemede
+    geçiyorsa adaylar oncelik sırasıyla döner. Yükleme sırasında yazılır (bkz. katalog.py).
+    """
+    TUR_SECENEKLERI = [
+        ('benzersiz_id', 'Benzersiz ID'),
+        ('seri_no', 'Seri No'),
+        ('barkod', 'Barkod'),
+        ('alternatif', 'Alternatif Kod'),
+        ('stok_kodu', 'Stok Kodu'),
+    ]
+    # Küçük değer daha güçlü eşleşmedir
+    ONCELIKLER = {'benzersiz_id': 0, 'seri_no': 1, 'barkod': 2, 'alternatif': 3, 'stok_kodu': 4}
+
+    versiyon = models.ForeignKey(KatalogVersiyon, on_delete=models.CASCADE, related_name='+')
+    malzeme = models.ForeignKey(Malzeme, on_delete=models.CASCADE, related_name='kodlar')
+    lokasyon_kodu = models.CharField(max_length=100)
+    kod = models.CharField(max_length=255)
+    tur = models.CharField(max_length=20, choices=TUR_SECENEKLERI)
+    oncelik = models.PositiveSmallIntegerField()
+
+    class Meta:
+        verbose_name = "Malzeme Kodu"
+        verbose_name_plural = "Malzeme Kodları"
+        indexes = [
+            models.Index(fields=['versiyon', 'lokasyon_kodu', 'kod', 'oncelik', 'malzeme'], name='malzemekod_arama'),
+        ]
+
+    def __str__(self):
+        return f"{self.kod} ({self.tur}) -> {self.malzeme_id}"
+
 # --- SAYIM YÖNETİM MODELLERİ ---
 
 class SayimEmri(models.Model):
@@ -89,6 +241,10 @@ class SayimEmri(models.Model):
     tarih = models.DateTimeField(default=timezone.now)
     durum = models.CharField(max_length=20, choices=DURUM_SECENEKLERI, default='Açık')
     onay_tarihi = models.DateTimeField(null=True, blank=True)
+    # Sayılan alan: {'depolar': [...], 'gruplar': [...], 'lokasyon_araliklari': [[başlangıç, bitiş], ...]}; boşsa tüm katalog
+    kapsam = models.JSONField(default=dict, blank=True)
+    # Onay anındaki stok grubu özeti; doluysa raporun dondurulmuş kopyası (SayimRaporSatiri) vardır
+    kapanis_ozeti = models.JSONField(null=True, blank=True, editable=False)
 
     # ⭐ REVİZYON: Çoklu Personel Atama Alanı
     atanan_personel = models.CharField(
@@ -106,6 +262,45 @@ class SayimEmri(models.Model):
     def __str__(self):
         return f"Emir ID:{self.pk} - {self.ad} ({self.durum})"
 
+    def kapsam_kosulu(self):
+        """
+        Malzeme (veya aynı alan adlı açılış stoğu) satırlarını emrin kapsamına sınırlayan koşul.
+        Depolar ve lokasyon aralıkları (başlangıç ve bitiş dahil) birlikte lokasyonu seçer;
+        stok grupları ayrıca uygulanır. Kapsam boşsa koşul da boştur.
+        """
+        kapsam = self.kapsam or {}
+        kosul = models.Q(lokasyon_kodu__in=kapsam['depolar']) if kapsam.get('depolar') else models.Q()
+        for baslangic, bitis in kapsam.get('lokasyon_araliklari', []):
+            kosul |= models.Q(lokasyon_kodu__gte=baslangic, lokasyon_kodu__lte=bitis)
+        if kapsam.get('gruplar'): kosul &= models.Q(stok_grup__in=kapsam['gruplar'])
+        return kosul
+
+    def kapsamda_mi(self, malzeme):
+        """Tek malzemenin (lokasyon_kodu, stok_grup) kapsam_kosulu'na uyup uymadığı; sayım kaydında kontrol edilir."""
+        kapsam = self.kapsam or {}
+        depolar, araliklar = kapsam.get('depolar') or [], kapsam.get('lokasyon_araliklari') or []
+        if (depolar or araliklar) and malzeme.lokasyon_kodu not in depolar \
+                and not any(baslangic <= malzeme.lokasyon_kodu <= bitis for baslangic, bitis in araliklar):
+            return False
+        return not kapsam.get('gruplar') or malzeme.stok_grup in kapsam['gruplar']
+
+    def kapsam_disi_mesaji(self, malzeme):
+        return f"HATA: {malzeme.malzeme_kodu} ({malzeme.lokasyon_kodu}) bu sayım emrinin kapsamı dışında ({self.kapsam_metni()}), kayıt yapılmadı."
+
+    def kapsam_metni(self):
+        kapsam = self.kapsam or {}
+        parcalar = [', '.join(kapsam.get('depolar', [])), ', '.join(f"{b}–{s}" for b, s in kapsam.get('lokasyon_araliklari', []))]
+        lokasyon = ' + '.join(p for p in parcalar if p) or 'Tüm depolar'
+        return f"{lokasyon} / {', '.join(kapsam['gruplar'])}" if kapsam.get('gruplar') else lokasyon
+
+    def save(self, *args, **kwargs):
+        yeni = self._state.adding
+        super().save(*args, **kwargs)
+        # Farklar emrin açıldığı andaki stoklara göre hesaplanır
+        if yeni:
+            from .katalog import acilis_stogunu_al
+            acilis_stogunu_al(self)
+
 
 class SayimDetay(models.Model):
     sayim_emri = models.ForeignKey(SayimEmri, on_delete=models.CASCADE, related_name="detaylar")
@@ -126,6 +321,15 @@ class SayimDetay(models.Model):
     latitude = models.CharField(max_length=50, default='YOK', blank=True, null=True)
     longitude = models.CharField(max_length=50, default='YOK', blank=True, null=True)
     loc_hata = models.CharField(max_length=255, default='', blank=True, null=True)
+    # Metin koordinatların sayısal hali ve geohash hücresi (kaydederken konumu_ayarla ile doldurulur);
+    # konum analizi haritası bunlarla veritabanında kümelenir (bkz. konum.py)
+    enlem = models.FloatField(null=True, blank=True, editable=False)
+    boylam = models.FloatField(null=True, blank=True, editable=False)
+    konum_hucresi = models.CharField(max_length=9, null=True, blank=True, editable=False)
+
+    # Çevrimdışı kuyruktan gelen kayıtların istemcide üretilen tekil anahtarı;
+    # aynı kayıt tekrar gönderildiğinde ikinci kez yazılmaz (eski kayıtlarda boş)
+    istemci_id = models.CharField(max_length=64, null=True, blank=True, unique=True, editable=False)
 
     class Meta:
         verbose_name = "Sayım Detay"
@@ -134,8 +338,210 @@ class SayimDetay(models.Model):
         # ⭐ DÜZELTME 2: 'unique_together' kaldırıldı.
         # Bu kısıtlama, bir malzemeyi birden fazla kez saymanızı engelliyordu.
         # unique_together = (('sayim_emri', 'benzersiz_malzeme'),) # BU SATIR KALDIRILDI
+        indexes = [
+            # Performans analizi: personel kayıtları zaman sırasıyla okunur (LAG penceresi sıralama yapmaz)
+            models.Index(fields=['sayim_emri', 'personel_adi', 'guncellenme_tarihi'], name='sayimdetay_performans'),
+            # Konum kümeleri: emrin kayıtları geohash önekine göre gruplanır
+            models.Index(fields=['sayim_emri', 'konum_hucresi'], name='sayimdetay_konum'),
+        ]
+
+    def konumu_ayarla(self):
+        """latitude/longitude metinlerinden enlem, boylam ve konum_hucresi alanlarını doldurur (toplu yazımda elle çağrılır)."""
+        self.enlem, self.boylam = koordinat_donustur(self.latitude, 90), koordinat_donustur(self.longitude, 180)
+        if self.enlem is None or self.boylam is None:
+            self.enlem = self.boylam = self.konum_hucresi = None
+        else:
+            self.konum_hucresi = geohash_kodla(self.enlem, self.boylam)
+
+    def save(self, *args, **kwargs):
+        self.konumu_ayarla()
+        super().save(*args, **kwargs)
 
     def __str__(self):
         # İlişkili malzeme silinmişse hata vermemesi için kontrol
         malzeme_kodu = self.benzersiz_malzeme.malzeme_kodu if self.benzersiz_malzeme else "SİLİNMİŞ MALZEME"
-        return f"{malzeme_kodu} - {self.sayilan_stok} sayıldı"
\ No newline at end of file
+        return f"{malzeme_kodu} - {self.sayilan_stok} sayıldı"
+
+class SayimToplam(models.Model):
+    """
+    Sayım emri + malzeme bazında sayılan miktarın güncel toplamı. Her SayimDetay
+    kaydıyla aynı işlemde F() ile artırılır (bkz. toplamlar.py); okuyucular detayları
+    yeniden toplamak yerine bu tabloyu kullanır. Malzeme katalog sürümleri arasında
+    benzersiz_id ile eşleştirildiği için anahtar benzersiz_id'dir.
+    """
+    sayim_emri = models.ForeignKey(SayimEmri, on_delete=models.CASCADE, related_name="toplamlar")
+    benzersiz_id = models.CharField(max_length=255)
+    toplam_miktar = models.DecimalField(max_digits=19, decimal_places=5, default=Decimal('0.0'))
+    kayit_sayisi = models.PositiveIntegerField(default=0)
+    son_sayim_tarihi = models.DateTimeField()
+    son_personel = models.CharField(max_length=100)
+
+    class Meta:
+        verbose_name = "Sayım Toplamı"
+        verbose_name_plural = "Sayım Toplamları"
+        constraints = [
+            models.UniqueConstraint(fields=['sayim_emri', 'benzersiz_id'], name='sayim_toplam_emir_malzeme'),
+        ]
+        indexes = [
+            # Malzemenin (tüm emirlerdeki) son sayım bilgisi
+            models.Index(fields=['benzersiz_id', 'son_sayim_tarihi'], name='sayim_toplam_son_sayim'),
+        ]
+
+    def __str__(self):
+        return f"Emir {self.sayim_emri_id} - {self.benzersiz_id}: {self.toplam_miktar} ({self.kayit_sayisi} kayıt)"
+
+class AcilisStogu(models.Model):
+    """
+    Sayım emrinin açılış stoğu: emir oluşturulurken aktif katalogdaki her malzemenin
+    sistem stoğu, fiyatı ve grubu (bkz. katalog.acilis_stogunu_al). Raporlar ve fark
+    özetleri farkı bu tabloya göre hesaplar; sayım sürerken yapılan stok yüklemeleri
+    açık emrin farklarını değiştirmez. Emir açıldıktan sonra katalogda ilk kez sayılan
+    malzeme, sayıldığında sistem stoğu 0 olarak eklenir.
+    """
+    sayim_emri = models.ForeignKey(SayimEmri, on_delete=models.CASCADE, related_name="acilis_stoklari")
+    benzersiz_id = models.CharField(max_length=255)
+    malzeme_kodu = models.CharField(max_length=100)
+    malzeme_adi = models.CharField(max_length=255)
+    parti_no = models.CharField(max_length=100, null=True, blank=True)
+    renk = models.CharField(max_length=50, null=True, blank=True)
+    olcu_birimi = models.CharField(max_length=20)
+    lokasyon_kodu = models.CharField(max_length=100)
+    stok_grup = models.CharField(max_length=100, null=True, blank=True)
+    sistem_stogu = models.DecimalField(max_digits=19, decimal_places=5)
+    birim_fiyat = models.DecimalField(max_digits=19, decimal_places=5)
+
+    class Meta:
+        verbose_name = "Açılış Stoğu"
+        verbose_name_plural = "Açılış Stokları"
+        constraints = [
+            models.UniqueConstraint(fields=['sayim_emri', 'benzersiz_id'], name='acilis_stogu_emir_malzeme'),
+        ]
+
+    def __str__(self):
+        return f"Emir {self.sayim_emri_id} - {self.benzersiz_id}: {self.sistem_stogu}"
+
+class SayimRaporSatiri(models.Model):
+    """
+    Onaylanan emrin mutabakat raporunun dondurulmuş satırı (bkz. rapor.rapor_dondur).
+    Onayda stoklar güncellenmeden önce tek INSERT ... SELECT ile yazılır ve bir daha
+    değişmez. Alan adları rapor sorgusunun alanlarıyla aynıdır; kapalı emrin raporu
+    aynı filtre, sıralama ve imleçle bu tablodan sayfa sayfa okunur.
+    """
+    sayim_emri = models.ForeignKey(SayimEmri, on_delete=models.CASCADE, related_name="rapor_satirlari")
+    benzersiz_id = models.CharField(max_length=255)
+    malzeme_kodu = models.CharField(max_length=100)
+    malzeme_adi = models.CharField(max_length=255)
+    parti_no = models.CharField(max_length=100, null=True, blank=True)
+    renk = models.CharField(max_length=50, null=True, blank=True)
+    olcu_birimi = models.CharField(max_length=20)
+    lokasyon_kodu = models.CharField(max_length=100)
+    stok_grup = models.CharField(max_length=100, null=True, blank=True)
+
+    sistem = models.DecimalField(max_digits=19, decimal_places=5)  # Onaydan önceki sistem stoğu
+    sayilan = models.DecimalField(max_digits=19, decimal_places=5)
+    fiyat = models.DecimalField(max_digits=19, decimal_places=5)
+    mik_fark = models.DecimalField(max_digits=19, decimal_places=5)
+    sistem_tutar = models.DecimalField(max_digits=19, decimal_places=5)
+    tutar_fark = models.DecimalField(max_digits=19, decimal_places=5)
+    mik_fark_mutlak = models.DecimalField(max_digits=19, decimal_places=5)
+    tutar_fark_mutlak = models.DecimalField(max_digits=19, decimal_places=5)
+    etiket = models.CharField(max_length=20)
+    etiket_sira = models.PositiveSmallIntegerField()
+
+    class Meta:
+        verbose_name = "Sayım Rapor Satırı"
+        verbose_name_plural = "Sayım Rapor Satırları"
+        indexes = [
+            # Rapor sıralamaları (rapor.RAPOR_SIRALAMALARI) için: sayfa imleçten sonra indeksle okunur
+            models.Index(fields=['sayim_emri', 'etiket_sira', 'lokasyon_kodu', 'malzeme_kodu', 'parti_no', 'renk', 'id'], name='raporsatiri_oncelik'),
+            models.Index(fields=['sayim_emri', 'malzeme_kodu', 'parti_no', 'renk', 'lokasyon_kodu', 'id'], name='raporsatiri_kod'),
+            models.Index(fields=['sayim_emri', 'lokasyon_kodu', 'malzeme_kodu', 'parti_no', 'renk', 'id'], name='raporsatiri_depo'),
+            models.Index(fields=['sayim_emri', 'tutar_fark_mutlak', 'id'], name='raporsatiri_tutar_fark'),
+            models.Index(fields=['sayim_emri', 'mik_fark_mutlak', 'id'], name='raporsatiri_mik_fark'),
+        ]
+
+    def __str__(self):
+        return f"Emir {self.sayim_emri_id} - {self.malzeme_kodu} ({self.etiket})"
+
+# --- ARKA PLAN İŞLERİ ---
+
+class StokYuklemeIsi(models.Model):
+    """Arka planda parça parça çalışan stok yükleme işi ve ilerleme bilgisi."""
+    DURUM_SECENEKLERI = [
+        ('Bekliyor', 'Bekliyor'),
+        ('Çalışıyor', 'Çalışıyor'),
+        ('Tamamlandı', 'Tamamlandı'),
+        ('Hata', 'Hata'),
+    ]
+    ASAMA_SECENEKLERI = [
+        ('Doğrulama', 'Doğrulama'),
+        ('Yazma', 'Yazma'),
+    ]
+
+    dosya_adi = models.CharField(max_length=255)
+    dosya_yolu = models.CharField(max_length=500)
+    durum = models.CharField(max_length=20, choices=DURUM_SECENEKLERI, default='Bekliyor', db_index=True)
+    asama = models.CharField(max_length=20, choices=ASAMA_SECENEKLERI, blank=True, default='')
+
+    # Yükleme seçenekleri
+    sadece_degisenler = models.BooleanField(default=False)
+    eksikleri_isaretle = models.BooleanField(default=False)
+
+    # İlerleme
+    toplam_satir = models.IntegerField(null=True, blank=True)  # Doğrulama bitince bilinir
+    okunan_satir = models.IntegerField(default=0)
+    yazilan_satir = models.IntegerField(default=0)
+    hata_sayisi = models.IntegerField(default=0)
+    mesaj = models.TextField(blank=True, default='')
+    ozet = models.JSONField(null=True, blank=True)
+
+    olusturma_tarihi = models.DateTimeField(default=timezone.now)
+    baslama_tarihi = models.DateTimeField(null=True, blank=True)
+    asama_baslama_tarihi = models.DateTimeField(null=True, blank=True)
+    bitis_tarihi = models.DateTimeField(null=True, blank=True)
+    # İş kaydına her yazışta güncellenir; uzun süre değişmeyen açık iş, süreci ölmüş
+    # (worker zaman aşımı, bellek, yeniden başlatma) sayılır (bkz. stok_import.yarim_kalan_yuklemeleri_kapat)
+    son_ilerleme_tarihi = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = "Stok Yükleme İşi"
+        verbose_name_plural = "Stok Yükleme İşleri"
+
+    def __str__(self):
+        return f"Yükleme ID:{self.pk} - {self.dosya_adi} ({self.durum})"
+
+    def tahmini_kalan_saniye(self):
+        """Yazma aşamasındaki hıza göre kalan süre tahmini (bilinmiyorsa None)."""
+        if self.durum != 'Çalışıyor' or self.asama != 'Yazma' or not self.toplam_satir or not self.asama_baslama_tarihi:
+            return None
+        gecen = (timezone.now() - self.asama_baslama_tarihi).total_seconds()
+        if self.yazilan_satir <= 0 or gecen <= 0:
+            return None
+        hiz = self.yazilan_satir / gecen
+        return max(self.toplam_satir - self.yazilan_satir, 0) / hiz
+
+
+class OcrIsi(models.Model):
+    """Arka planda çalışan etiket fotoğrafı okuma (OCR) işi ve sonucu (bkz. ocr.py)."""
+    DURUM_SECENEKLERI = [
+        ('Bekliyor', 'Bekliyor'),
+        ('Çalışıyor', 'Çalışıyor'),
+        ('Tamamlandı', 'Tamamlandı'),
+        ('Hata', 'Hata'),
+    ]
+
+    durum = models.CharField(max_length=20, choices=DURUM_SECENEKLERI, default='Bekliyor', db_index=True)
+    arka_uc = models.CharField(max_length=100, blank=True, default='')
+    mesaj = models.TextField(blank=True, default='')
+    sonuclar = models.JSONField(null=True, blank=True)
+
+    olusturma_tarihi = models.DateTimeField(default=timezone.now, db_index=True)
+    baslama_tarihi = models.DateTimeField(null=True, blank=True)
+    bitis_tarihi = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "OCR İşi"
+        verbose_name_plural = "OCR İşleri"
+
+    def __str__(self):
+        return f"OCR ID:{self.pk} ({self.durum})"
@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""
+Etiket fotoğraflarından (OCR) stok kodu / parti / renk / miktar okuma işleri.
+
+gemini_ocr_analiz görseli doğrulayıp bir OcrIsi kaydı açar, işi 'ocr' havuzuna
+(isler.is_gonder; süreç başına en fazla SAYIM_OCR_ISCI_SAYISI eşzamanlı model
+çağrısı) gönderir ve hemen iş numarasını döndürür; ekran ocr_durum'u sorgulayarak
+sonucu alır. Böylece istek thread'i (gunicorn worker'ı) model cevabını beklemez.
+Bekleyen + çalışan iş sayısı SAYIM_OCR_AZAMI_BEKLEYEN'e ulaştıysa yeni iş kabul
+edilmez. İş durumu veritabanında tutulduğu için sorgu hangi worker'a düşerse düşsün
+cevaplanır.
+
+Okuyucu (arka uç) süreç başına bir kez kurulur; Gemini'de API anahtarı, model ve
+cevap şeması her istekte yeniden oluşturulmaz. settings.SAYIM_OCR_ARKA_UCU:
+'gemini' (varsayılan), 'sahte' (ağ çağrısı yapmaz; SAYIM_OCR_SAHTE_SONUC sonucunu
+SAYIM_OCR_SAHTE_GECIKME saniye sonra döndürür — testler ve yük denemeleri için) veya
+aynı arayüzü (etiketleri_oku(resim) -> list) sağlayan bir sınıfın yolu.
+
+Model çağrısı SAYIM_OCR_ZAMAN_ASIMI saniyede kesilir. SAYIM_OCR_IS_ZAMAN_ASIMI
+saniyede hâlâ bitmemiş iş (örn. worker yeniden başladı) sorgulandığında 'Hata' olur.
+"""
+
+import copy
+import json
+import os
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from PIL import Image
+
+from .isler import is_gonder
+from .models import OcrIsi, standardize_id_part
+
+# Google GenAI kütüphanesi kurulu değilse: pip install google-generativeai
+try:
+    import google.generativeai as genai
+    from google.generativeai.types import GenerationConfig, Schema, Type
+    from google.api_core import exceptions as google_exceptions
+except (ImportError, AttributeError):
+    genai, google_exceptions = None, None
+    GenerationConfig, Schema, Type = None, None, None
+    print("UYARI: Google Generative AI kütüphanesi bulunamadı veya uyumsuz. Gemini OCR çalışmayacak.")
+
+GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY")
+OCR_MODELI = getattr(settings, 'SAYIM_OCR_MODELI', 'gemini-2.0-flash')
+OCR_ISCI_SAYISI = getattr(settings, 'SAYIM_OCR_ISCI_SAYISI', 2)
+OCR_AZAMI_BEKLEYEN = getattr(settings, 'SAYIM_OCR_AZAMI_BEKLEYEN', 20)
+OCR_ZAMAN_ASIMI = getattr(settings, 'SAYIM_OCR_ZAMAN_ASIMI', 60)
+OCR_IS_ZAMAN_ASIMI = getattr(settings, 'SAYIM_OCR_IS_ZAMAN_ASIMI', 300)
+OCR_IS_SAKLAMA_SURESI = getattr(settings, 'SAYIM_OCR_IS_SAKLAMA_SURESI', 86400)
+AZAMI_RESIM_BOYUTU = 5 * 1024 * 1024
+
+_okuyucular = {}
+_okuyucu_kilidi = threading.Lock()
+
+
+class OcrHatasi(Exception):
+    """Kullanıcıya olduğu gibi gösterilecek OCR hatası."""
+
+
+class OcrKapasiteHatasi(OcrHatasi):
+    """Bekleyen iş sınırı dolu."""
+
+
+class GeminiOcr:
+    """Gemini ile etiket okuyucu: anahtar, model ve cevap şeması bir kez kurulur."""
+    ISTEM = "Analyze labels, create JSON list with 'stok_kod', 'parti_no', 'renk', 'miktar'. Quantity as decimal."
+
+    def __init__(self, api_anahtari=GEMINI_API_KEY, model_adi=OCR_MODELI, zaman_asimi=OCR_ZAMAN_ASIMI):
+        if not (genai and api_anahtari): raise OcrHatasi("Gemini aktif değil.")
+        genai.configure(api_key=api_anahtari)
+        self.model_adi, self.zaman_asimi = model_adi, zaman_asimi
+        self.model = genai.GenerativeModel(model_adi)
+        self.ayarlar = GenerationConfig(
+            response_mime_type="application/json",
+            response_schema=Schema(type=Type.ARRAY, items=Schema(
+                type=Type.OBJECT, required=['stok_kod'],
+                properties={'stok_kod': Schema(type=Type.STRING), 'parti_no': Schema(type=Type.STRING),
+                            'renk': Schema(type=Type.STRING), 'miktar': Schema(type=Type.NUMBER)},
+            )),
+        )
+
+    def etiketleri_oku(self, resim):
+        print(f"Gemini API Çağrısı: Model={self.model_adi}")
+        cevap = self.model.generate_content([self.ISTEM, resim], generation_config=self.ayarlar, request_options={'timeout': self.zaman_asimi})
+        try:
+            sonuclar = json.loads(cevap.text.strip())
+            if not isinstance(sonuclar, list): raise ValueError("Liste bekleniyordu.")
+        except Exception as e:
+            print(f"Gemini JSON Hatası: {e}. Yanıt: '{cevap.text}'")
+            raise OcrHatasi("YZ yanıtı işlenemedi.")
+        return sonuclar
+
+
+class SahteOcr:
+    """Ağ çağrısı yapmayan okuyucu: ayarlanan sonucu (isteğe bağlı gecikmeyle) döndürür."""
+
+    def __init__(self, sonuc=None, gecikme=None):
+        self.sonuc, self.gecikme = sonuc, gecikme  # Verilmezse her çağrıda ayarlardan okunur
+
+    def etiketleri_oku(self, resim):
+        resim.load()  # Görsel gerçekten çözülebiliyor mu (Gemini'ye gönderilecek olanla aynı)
+        gecikme = self.gecikme if self.gecikme is not None else getattr(settings, 'SAYIM_OCR_SAHTE_GECIKME', 0)
+        if gecikme: time.sleep(gecikme)
+        sonuc = self.sonuc if self.sonuc is not None else getattr(settings, 'SAYIM_OCR_SAHTE_SONUC', [{'stok_kod': 'SAHTE', 'miktar': 1.0}])
+        return copy.deepcopy(sonuc)
+
+
+def ocr_arka_ucu():
+    return getattr(settings, 'SAYIM_OCR_ARKA_UCU', 'gemini')
+
+
+def ocr_kullanilabilir():
+    return ocr_arka_ucu() != 'gemini' or bool(genai and GEMINI_API_KEY)
+
+
+def ocr_okuyucu():
+    """Ayarlı okuyucuyu döndürür (arka uç başına, süreç başına tek nesne)."""
+    arka_uc = ocr_arka_ucu()
+    with _okuyucu_kilidi:
+        if arka_uc not in _okuyucular:
+            sinif = {'gemini': GeminiOcr, 'sahte': SahteOcr}.get(arka_uc) or import_string(arka_uc)
+            _okuyucular[arka_uc] = sinif()
+        return _okuyucular[arka_uc]
+
+
+def sonuclari_isle(ham_sonuclar):
+    """Modelin etiket listesini sayım ekranının satırlarına çevirir (stok kodu olmayanlar atlanır)."""
+    islenen = []
+    for i, item in enumerate(ham_sonuclar):
+        if not isinstance(item, dict): print(f"   -> {i+1} atlandı (dict değil)."); continue
+        try:
+            mr = item.get('miktar', '0.0'); md = Decimal('0.0')
+            if isinstance(mr, (int, float)): md = Decimal(mr)
+            elif isinstance(mr, str): ms = mr.replace(',', '.').strip().upper(); md = Decimal(ms) if ms and ms != 'YOK' else Decimal('0.0')
+        except Exception: print(f"   -> {i+1}: Miktar ('{mr}') geçersiz, 1.0 kullanıldı."); md = Decimal('1.0')
+        sk = standardize_id_part(item.get('stok_kod', 'YOK'))
+        if sk == 'YOK': print(f"   -> {i+1} atlandı (Stok Kodu YOK)."); continue
+        islenen.append({'stok_kod': sk, 'parti_no': standardize_id_part(item.get('parti_no', 'YOK')), 'renk': standardize_id_part(item.get('renk', 'YOK')), 'miktar': f"{md:.2f}", 'barkod': sk})
+    return islenen
+
+
+def hata_mesaji(e):
+    """İş hatasının kullanıcı mesajı."""
+    if isinstance(e, OcrHatasi): return str(e)
+    if google_exceptions and isinstance(e, google_exceptions.GoogleAPICallError):
+        detay = str(e).lower()
+        if isinstance(e, google_exceptions.PermissionDenied) or "api key not valid" in detay:
+            return "Gemini API anahtarı geçersiz veya yetki sorunu. Yönetici ile iletişime geçin."
+        if isinstance(e, google_exceptions.ResourceExhausted) or "quota" in detay:
+            return "Gemini API kullanım kotası aşıldı."
+        if isinstance(e, google_exceptions.DeadlineExceeded):
+            return f"Gemini {OCR_ZAMAN_ASIMI} saniyede yanıt vermedi. Lütfen tekrar deneyin."
+        if isinstance(e, google_exceptions.NotFound) or ("model" in detay and ("not found" in detay or "is not supported" in detay)):
+            return f"Kullanılan Gemini modeli ('{OCR_MODELI}') bulunamadı veya bu işlem için desteklenmiyor."
+        if isinstance(e, google_exceptions.InvalidArgument):
+            return f"Gemini API'ye geçersiz bir argüman gönderildi: {e}"
+        return "Gemini API ile iletişim hatası oluştu. Lütfen API anahtarınızı, kotanızı veya model adını kontrol edin."
+    return f"Görsel analizi sırasında beklenmedik sunucu hatası ({type(e).__name__})."
+
+
+def ocr_isini_calistir(is_id, resim_verisi):
+    """OcrIsi'ni çalıştırır (isler.is_gonder ile worker thread'inde); sonuç veya hata kayda yazılır."""
+    def guncelle(**alanlar): OcrIsi.objects.filter(pk=is_id).update(**alanlar)
+    guncelle(durum='Çalışıyor', baslama_tarihi=timezone.now())
+    try:
+        sonuclar = sonuclari_isle(ocr_okuyucu().etiketleri_oku(Image.open(BytesIO(resim_verisi))))
+        mesaj = f"✅ {len(sonuclar)} etiket okundu." if sonuclar else "Geçerli etiket bulunamadı."
+        print(f"OCR İşi {is_id}: {len(sonuclar)} geçerli etiket.")
+        guncelle(durum='Tamamlandı', sonuclar=sonuclar, mesaj=mesaj, bitis_tarihi=timezone.now())
+    except Exception as e:
+        print(f"OCR İşi {is_id} Hatası ({type(e).__name__}): {e}")
+        guncelle(durum='Hata', mesaj=hata_mesaji(e), bitis_tarihi=timezone.now())
+
+
+def ocr_isi_gonder(resim_verisi):
+    """Görseli okuma işi olarak sıraya alır ve OcrIsi kaydını döndürür (iş, işlem commit olunca başlar)."""
+    simdi = timezone.now()
+    OcrIsi.objects.filter(olusturma_tarihi__lt=simdi - timedelta(seconds=OCR_IS_SAKLAMA_SURESI)).delete()
+    acik = OcrIsi.objects.filter(durum__in=['Bekliyor', 'Çalışıyor'], olusturma_tarihi__gte=simdi - timedelta(seconds=OCR_IS_ZAMAN_ASIMI))
+    if acik.count() >= OCR_AZAMI_BEKLEYEN: raise OcrKapasiteHatasi("Okuma sırası dolu. Lütfen biraz sonra tekrar deneyin.")
+    isi = OcrIsi.objects.create(arka_uc=ocr_arka_ucu()[:100])
+    transaction.on_commit(lambda: is_gonder('ocr', ocr_isini_calistir, isi.pk, resim_verisi, isci_sayisi=OCR_ISCI_SAYISI))
+    return isi
+
+
+def ocr_is_durumu(isi):
+    """İşin güncel hali; süresi içinde bitmemiş iş 'Hata' olarak kapatılır."""
+    sinir = timezone.now() - timedelta(seconds=OCR_IS_ZAMAN_ASIMI)
+    if isi.durum in ('Bekliyor', 'Çalışıyor') and isi.olusturma_tarihi < sinir:
+        OcrIsi.objects.filter(pk=isi.pk, durum__in=['Bekliyor', 'Çalışıyor']).update(
+            durum='Hata', mesaj="Görsel analizi zaman aşımına uğradı. Lütfen tekrar deneyin.", bitis_tarihi=timezone.now())
+        isi.refresh_from_db()
+    return isi
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+Sayım olayları için yayınla/bekle olay yolu (canlı fark özeti ve ilerleme akışı).
+
+Sayım kaydı toplamlara yazıldığında (bkz. toplamlar.toplami_artir) işlem commit
+olunca emrin kanalına bir olay yayınlanır; sayim_olay_akisi görünümü (SSE) kanalı
+bekler ve olayları tarayıcıya iletir. Her kanal sıra numaralı, sınırlı boyutlu bir
+halka tampondur: bekleyen taraf son gördüğü sırayı verir, sonrakileri alır; tampon
+taşıp aradaki olaylar kaybolduysa bunu bildirir (akış o durumda tam durumu yeniden
+gönderir).
+
+Varsayılan yol süreç içidir; olaylar sadece aynı süreçteki akışlara ulaşır. Birden
+çok worker'lı kurulumda settings.SAYIM_OLAY_YOLU aynı arayüzü (yayinla, bekle,
+son_sira) sağlayan bir sınıfın yolu ('paket.modul.Sinif') yapılarak paylaşımlı bir
+yol (örn. Redis pub/sub üzerine yazılmış) kullanılabilir.
+"""
+
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+OLAY_TAMPON_BOYUTU = getattr(settings, 'SAYIM_OLAY_TAMPON_BOYUTU', 1000)
+
+_yol = None
+_yol_kilidi = threading.Lock()
+
+
+class SurecIciOlayYolu:
+    """Kanal başına halka tamponlu, threading.Condition ile beklenen süreç içi olay yolu."""
+
+    def __init__(self, tampon_boyutu=OLAY_TAMPON_BOYUTU):
+        self.tampon_boyutu = tampon_boyutu
+        self._kosul = threading.Condition()
+        self._kanallar = {}  # kanal -> (deque[(sira, olay)], [son sira])
+
+    def _kanal(self, kanal):
+        if kanal not in self._kanallar:
+            self._kanallar[kanal] = (deque(maxlen=self.tampon_boyutu), [0])
+        return self._kanallar[kanal]
+
+    def yayinla(self, kanal, olay):
+        """Olayı kanala ekler, bekleyenleri uyandırır ve olayın sıra numarasını döndürür."""
+        with self._kosul:
+            tampon, sayac = self._kanal(kanal)
+            sayac[0] += 1
+            tampon.append((sayac[0], olay))
+            self._kosul.notify_all()
+            return sayac[0]
+
+    def son_sira(self, kanal):
+        with self._kosul:
+            return self._kanal(kanal)[1][0]
+
+    def bekle(self, kanal, son_sira, zaman_asimi):
+        """
+        son_sira'dan sonraki olayları döndürür: ([(sira, olay), ...], kacirildi). Yeni olay
+        yoksa en fazla zaman_asimi saniye bekler. kacirildi: istenen aralığın başı tampondan
+        düşmüş (veya sayaç geride kalmış, örn. süreç yeniden başlamış) demektir.
+        """
+        with self._kosul:
+            tampon, sayac = self._kanal(kanal)
+            if sayac[0] <= son_sira:
+                self._kosul.wait_for(lambda: sayac[0] > son_sira, timeout=zaman_asimi)
+            if sayac[0] < son_sira: return [], True
+            olaylar = [(s, o) for s, o in tampon if s > son_sira]
+            kacirildi = bool(olaylar) and olaylar[0][0] != son_sira + 1
+            return olaylar, kacirildi
+
+
+def olay_yolu():
+    """Ayarlı olay yolunu döndürür (süreç başına tek nesne)."""
+    global _yol
+    with _yol_kilidi:
+        if _yol is None:
+            yol = getattr(settings, 'SAYIM_OLAY_YOLU', 'surec_ici')
+            _yol = SurecIciOlayYolu() if yol == 'surec_ici' else import_string(yol)()
+        return _yol
+
+
+def emir_kanali(sayim_emri_id):
+    return f"sayim_emri:{sayim_emri_id}"
+
+
+def sayim_olayi_yayinla(sayim_emri_id, olay):
+    """Olayı, çağıran işlem commit olduktan sonra emrin kanalına yayınlar (geri alınan kayıt yayınlanmaz)."""
+    transaction.on_commit(lambda: olay_yolu().yayinla(emir_kanali(sayim_emri_id), olay))
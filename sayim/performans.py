@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+Personel performans analizi: kayıtlar arası süreler SQL'de hesaplanır.
+
+Her personelin kayıtları zaman sırasına dizilip bir önceki kayıtla arası LAG()
+pencere fonksiyonuyla bulunur; makul aralıklar (0 sn < fark < 1 saat) dışındakiler
+atılır ve veritabanından sadece personel başına toplamlar döner: kayıt sayısı,
+geçerli aralık sayısı ve toplamı, ortanca (medyan) aralık. Medyan için geçerli
+aralıklar ROW_NUMBER() ile sıralanıp ortadaki bir veya iki değerin ortalaması
+alınır. (sayim_emri, personel_adi, guncellenme_tarihi) indeksi pencerenin sırasını
+verdiğinden detaylar sıralanmadan taranır.
+
+Saatlik hız: personel ve saat başına kayıt sayısı; saat dilimi aynı sorguda
+zaman damgasının saniye değerinden tamsayı bölmeyle bulunur (satır başına saat
+dilimi dönüşümü yapılmaz). Saat sınırları UTC saatleridir; yerel saat dilimi tam
+saat farklı olduğunda (örn. Europe/Istanbul) yerel saatlerle aynıdır.
+
+Sonuçlar emrin detay tablosunun durumuyla (kayıt sayısı, en büyük pk, son
+güncelleme) anahtarlanıp önbellekte tutulur; yeni kayıt gelmedikçe tekrar hesaplanmaz.
+"""
+
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import NotSupportedError, connection
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from .models import SayimDetay
+
+AZAMI_ARALIK_SN = 3600
+PERFORMANS_ONBELLEK_SURESI = getattr(settings, 'PERFORMANS_ONBELLEK_SURESI', 3600)
+
+# Zaman damgasının saniye cinsinden sayısal değeri (veritabanına göre)
+_SANIYE_IFADELERI = {
+    # Django SQLite'ta 'YYYY-MM-DD HH:MM:SS[.ffffff]' (UTC) saklar; tarih fonksiyonları milisaniyede
+    # kaldığından saniye kesri metinden okunur (Python'daki timedelta ile aynı mikro saniye;
+    # sorgu parametreli çalıştığı için % işareti %% yazılır)
+    'sqlite': "(CAST(strftime('%%s', {0}) AS INTEGER) + CAST(substr({0}, 20) AS REAL))",
+    'postgresql': "EXTRACT(EPOCH FROM {0})",
+    'mysql': "UNIX_TIMESTAMP({0})",
+}
+
+
+def _sql_parcalari():
+    """(tablo, personel sütunu, tarih sütunu, saniye ifadesi, WHERE koşulu) — emir parametresi %s."""
+    if connection.vendor not in _SANIYE_IFADELERI:
+        raise NotSupportedError(f"Performans analizi {connection.vendor} veritabanını desteklemiyor.")
+    q = connection.ops.quote_name
+    emir, personel, tarih = (q(SayimDetay._meta.get_field(a).column) for a in ('sayim_emri', 'personel_adi', 'guncellenme_tarihi'))
+    kosul = f"{emir} = %s AND {tarih} IS NOT NULL AND {personel} IS NOT NULL AND {personel} <> ''"
+    return q(SayimDetay._meta.db_table), personel, tarih, _SANIYE_IFADELERI[connection.vendor].format(tarih), kosul
+
+
+def _performans_sql():
+    tablo, personel, tarih, saniye, kosul = _sql_parcalari()
+    return (
+        f"SELECT personel, COUNT(*), SUM(gecerli), SUM(CASE WHEN gecerli = 1 THEN fark END),"
+        # Geçerli aralıklar tek sayıdaysa ortadaki, çift sayıdaysa ortadaki ikisi (2*sira = adet, adet+1 veya adet+2)
+        f" AVG(CASE WHEN gecerli = 1 AND sira * 2 IN (adet, adet + 1, adet + 2) THEN fark END)"
+        f" FROM (SELECT personel, fark, gecerli,"
+        f"  ROW_NUMBER() OVER (PARTITION BY personel, gecerli ORDER BY fark) AS sira,"
+        f"  COUNT(*) OVER (PARTITION BY personel, gecerli) AS adet"
+        f"  FROM (SELECT personel, fark, CASE WHEN fark > 0 AND fark < {AZAMI_ARALIK_SN} THEN 1 ELSE 0 END AS gecerli"
+        f"   FROM (SELECT {personel} AS personel, {saniye} - LAG({saniye}) OVER (PARTITION BY {personel} ORDER BY {tarih}) AS fark"
+        f"    FROM {tablo} WHERE {kosul}"
+        f"   ) araliklar"
+        f"  ) isaretli"
+        f" ) sirali GROUP BY personel"
+    )
+
+
+def personel_performansi(sayim_emri_id):
+    """[{personel, toplam_kayit, aralik_sayisi, toplam_sure_sn, ortalama_sure_sn, medyan_sure_sn}] (süreler yoksa None)."""
+    with connection.cursor() as cursor:
+        cursor.execute(_performans_sql(), [sayim_emri_id])
+        satirlar = cursor.fetchall()
+    return [{
+        'personel': personel, 'toplam_kayit': kayit, 'aralik_sayisi': aralik,
+        'toplam_sure_sn': float(toplam or 0), 'ortalama_sure_sn': float(toplam) / aralik if aralik else None,
+        'medyan_sure_sn': float(medyan) if medyan is not None else None,
+    } for personel, kayit, aralik, toplam, medyan in satirlar]
+
+
+def saatlik_hiz(sayim_emri_id):
+    """{personel: [(saat, kayıt sayısı), ...]} saat sırasıyla (saat: yerel saat dilimiyle aware datetime)."""
+    tablo, personel, _, saniye, kosul = _sql_parcalari()
+    # SQLite'ta FLOOR her derlemede yok; saniye pozitif olduğundan tamsayıya çevirmek aynı sonucu verir
+    saat = f"CAST({saniye} / 3600 AS INTEGER)" if connection.vendor == 'sqlite' else f"FLOOR({saniye} / 3600)"
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT {personel}, saat, COUNT(*) FROM (SELECT {personel}, {saat} AS saat FROM {tablo} WHERE {kosul}) s"
+            f" GROUP BY {personel}, saat ORDER BY saat, {personel}", [sayim_emri_id],
+        )
+        satirlar = cursor.fetchall()
+    seriler = {}
+    for personel, saat, adet in satirlar:
+        seriler.setdefault(personel, []).append((timezone.localtime(datetime.fromtimestamp(int(saat) * 3600, dt_timezone.utc)), adet))
+    return seriler
+
+
+def performans_analizi(sayim_emri_id):
+    """(personel_performansi, saatlik_hiz); emrin detayları değişmedikçe önbellekten."""
+    durum = SayimDetay.objects.filter(sayim_emri_id=sayim_emri_id).aggregate(sayi=Count('pk'), son=Max('pk'), guncelleme=Max('guncellenme_tarihi'))
+    anahtar = f"performans:{sayim_emri_id}:{durum['sayi']}.{durum['son'] or 0}.{durum['guncelleme'].timestamp() if durum['guncelleme'] else 0}"
+    sonuc = cache.get(anahtar)
+    if sonuc is None:
+        sonuc = (personel_performansi(sayim_emri_id), saatlik_hiz(sayim_emri_id))
+        cache.set(anahtar, sonuc, PERFORMANS_ONBELLEK_SURESI)
+    return sonuc
@@ -0,0 +1,286 @@
+# -*- coding: utf-8 -*-
+"""
+Mutabakat raporu: sayılan / sistem / fark ve durum etiketi SQL'de hesaplanır.
+
+Rapor satırı emrin açılış stoğundaki (AcilisStogu: emir açılırken aktif katalogdaki
+stok, fiyat ve grup) her malzemedir; sayılan miktar emrin toplam tablosundan
+(SayimToplam) alt sorguyla gelir. Katalog sonradan yeniden yüklense de farklar
+açılıştaki stoklara göredir. Farklar, tutarlar ve etiket
+(tamam / fark_var / hic_sayilmadi / yeni_sayildi) annotate ile hesaplandığı için
+filtreleme ve sıralama veritabanında yapılır; sadece istenen sayfa okunur.
+
+Sayfalama anahtar kümesiyledir (keyset): 'sonraki' imleci bir önceki sayfanın
+son satırının sıralama değerlerini taşır, böylece derin sayfalar da OFFSET
+taraması yapmadan aynı maliyette gelir.
+
+Canlı fark özeti (stok grubu toplamları) aynı sorgunun tek GROUP BY'ıdır ve
+önbellekte tutulur. Önbellek anahtarı emrin toplam
+tablosunun durumundan (satır sayısı, kayıt sayısı toplamı, en büyük pk) üretilir:
+yeni sayım gelince veya toplamlar yeniden kurulunca anahtar değişir, eski sonuç
+kullanılmaz. Sayım sırasında yenilemek emrin toplam satırları üzerinde tek küçük
+toplama sorgusudur, katalog taranmaz. SQLite ondalık toplamları kayan noktayla
+yaptığından özetteki toplamlar 10^5 ile ölçeklenmiş tamsayılarla alınır (tutarlar tam ve
+ondalık kısımlarına ayrılarak; bkz. grup_ozeti_hesapla); sonuç her veritabanında Decimal
+hesabıyla kuruşu kuruşuna aynıdır.
+
+Onaylanan emrin raporu dondurulur (rapor_dondur): onayda, stoklar sayılanla
+güncellenmeden önce rapor satırları tek INSERT ... SELECT ile SayimRaporSatiri
+tablosuna, grup özeti emrin kapanis_ozeti alanına yazılır. Kapalı emrin raporu,
+sayfaları ve özeti bundan sonra canlı katalogdan (artık onaylı stokları gösterir)
+değil bu kopyadan okunur; tablo alanları rapor sorgusunun alanlarıyla aynı
+olduğundan filtre, sıralama ve imleç aynen çalışır.
+"""
+
+import base64
+import json
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import BigIntegerField, Case, Count, DecimalField, ExpressionWrapper, F, IntegerField, Max, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Abs, Cast, Coalesce, NullIf, Round
+
+from .models import AcilisStogu, SayimRaporSatiri, SayimToplam, standardize_id_part
+
+RAPOR_SAYFA_BOYUTU = 200
+RAPOR_AZAMI_SAYFA_BOYUTU = 1000
+RAPOR_ETIKETLERI = ('fark_var', 'yeni_sayildi', 'hic_sayilmadi', 'tamam')
+FARK_OZETI_ONBELLEK_SURESI = getattr(settings, 'FARK_OZETI_ONBELLEK_SURESI', 3600)
+ESIK = Decimal('0.01')
+OLCEK = 10 ** 5  # DecimalField decimal_places
+
+# Sıralama adı -> alanlar ('-' azalan). Son alan her zaman pk'dır (imlecin tekil olması için).
+# 'oncelik' eski rapor sırasıdır: önce farklar ve yeniler, sonra hiç sayılmayanlar.
+RAPOR_SIRALAMALARI = {
+    'oncelik': ['-etiket_sira', '-lokasyon_kodu', '-malzeme_kodu', '-parti_no', '-renk', '-pk'],
+    'kod': ['malzeme_kodu', 'parti_no', 'renk', 'lokasyon_kodu', 'pk'],
+    'depo': ['lokasyon_kodu', 'malzeme_kodu', 'parti_no', 'renk', 'pk'],
+    'tutar_fark': ['-tutar_fark_mutlak', 'pk'],
+    'mik_fark': ['-mik_fark_mutlak', 'pk'],
+}
+_ONDALIK_ALANLAR = {'tutar_fark_mutlak', 'mik_fark_mutlak'}
+_ONDALIK = DecimalField(max_digits=19, decimal_places=5)
+
+
+class RaporParametreHatasi(ValueError):
+    """Geçersiz filtre, sıralama veya imleç."""
+
+
+def rapor_donduruldu(sayim_emri):
+    return sayim_emri.kapanis_ozeti is not None
+
+
+def rapor_kaynagi(sayim_emri):
+    """Rapor satırlarının okunduğu tablo (filtre seçenekleri için): dondurulmuş kopya veya açılış stoğu."""
+    return (SayimRaporSatiri if rapor_donduruldu(sayim_emri) else AcilisStogu).objects.filter(sayim_emri=sayim_emri)
+
+
+def rapor_sorgusu(sayim_emri):
+    """Emrin rapor satırları: kapalı emirde dondurulmuş kopya, açık emirde canlı_rapor_sorgusu."""
+    if rapor_donduruldu(sayim_emri): return SayimRaporSatiri.objects.filter(sayim_emri=sayim_emri)
+    return canli_rapor_sorgusu(sayim_emri)
+
+
+def canli_rapor_sorgusu(sayim_emri):
+    """Emrin açılış stoğu üzerinde rapor alanlarıyla annotate edilmiş sorgu (henüz çalıştırılmamış)."""
+    sayilan = SayimToplam.objects.filter(sayim_emri=sayim_emri, benzersiz_id=OuterRef('benzersiz_id')).values('toplam_miktar')[:1]
+    ondalik = lambda ifade: ExpressionWrapper(ifade, output_field=_ONDALIK)
+    return AcilisStogu.objects.filter(sayim_emri=sayim_emri).annotate(
+        sayilan=Coalesce(Subquery(sayilan, output_field=_ONDALIK), Value(Decimal('0.0')), output_field=_ONDALIK),
+        sistem=Coalesce('sistem_stogu', Value(Decimal('0.0')), output_field=_ONDALIK),
+        fiyat=Coalesce('birim_fiyat', Value(Decimal('0.0')), output_field=_ONDALIK),
+    ).annotate(
+        mik_fark=ondalik(F('sayilan') - F('sistem')),
+        sistem_tutar=ondalik(F('sistem') * F('fiyat')),
+    ).annotate(
+        tutar_fark=ondalik(F('mik_fark') * F('fiyat')),
+        mik_fark_mutlak=ondalik(Abs('mik_fark')),
+    ).annotate(
+        tutar_fark_mutlak=ondalik(Abs('tutar_fark')),
+        etiket=Case(
+            When(mik_fark_mutlak__lt=ESIK, then=Value('tamam')),
+            When(sistem__gt=ESIK, sayilan__lt=ESIK, then=Value('hic_sayilmadi')),
+            When(sistem__lt=ESIK, sayilan__gt=ESIK, then=Value('yeni_sayildi')),
+            default=Value('fark_var'),
+        ),
+    ).annotate(
+        etiket_sira=Case(
+            When(etiket__in=('fark_var', 'yeni_sayildi'), then=Value(2)), When(etiket='hic_sayilmadi', then=Value(1)),
+            default=Value(0), output_field=IntegerField(),
+        ),
+    )
+
+
+def rapor_filtrele(qs, depo=None, etiketler=None, grup=None):
+    if depo: qs = qs.filter(lokasyon_kodu=standardize_id_part(depo))
+    if grup: qs = qs.filter(stok_grup=grup)
+    if etiketler:
+        gecersiz = set(etiketler) - set(RAPOR_ETIKETLERI)
+        if gecersiz: raise RaporParametreHatasi(f"Geçersiz etiket: {', '.join(sorted(gecersiz))}.")
+        qs = qs.filter(etiket__in=etiketler)
+    return qs
+
+
+def imlec_yaz(degerler):
+    return base64.urlsafe_b64encode(json.dumps([str(d) if isinstance(d, Decimal) else d for d in degerler]).encode()).decode()
+
+
+def imlec_oku(imlec, alanlar):
+    try:
+        degerler = json.loads(base64.urlsafe_b64decode(imlec.encode()))
+        if not isinstance(degerler, list) or len(degerler) != len(alanlar): raise ValueError
+        return [Decimal(d) if a.lstrip('-') in _ONDALIK_ALANLAR else d for a, d in zip(alanlar, degerler)]
+    except Exception: raise RaporParametreHatasi("Geçersiz imleç.")
+
+
+def _imlecten_sonra(alanlar, degerler):
+    """(a1, a2, ...) > (d1, d2, ...) koşulu (alan başına yönle): a1 ötesi VEYA a1 eşit ve a2 ötesi ..."""
+    kosul, esitler = Q(), {}
+    for alan, deger in zip(alanlar, degerler):
+        ad = alan.lstrip('-')
+        kosul |= Q(**esitler, **{f"{ad}__{'lt' if alan.startswith('-') else 'gt'}": deger})
+        esitler[ad] = deger
+    return kosul
+
+
+def _satir(m):
+    if m.sistem > Decimal('0.0'): yuzde = m.mik_fark / m.sistem * 100
+    else: yuzde = Decimal('100.0') if m.etiket == 'yeni_sayildi' else Decimal('0.0')
+    return {
+        'kod': m.malzeme_kodu, 'ad': m.malzeme_adi, 'parti': m.parti_no, 'renk': m.renk, 'birim': m.olcu_birimi,
+        'depo': m.lokasyon_kodu, 'grup': m.stok_grup,
+        'sistem_mik': f"{m.sistem:.2f}", 'sayilan_mik': f"{m.sayilan:.2f}", 'mik_fark': f"{m.mik_fark:.2f}",
+        'mik_yuzde': f"{yuzde:.2f}%", 'sistem_tutar': f"{m.sistem_tutar:.2f}", 'tutar_fark': f"{m.tutar_fark:.2f}",
+        'tag': m.etiket,
+    }
+
+
+def rapor_ozeti(qs):
+    """Filtrelenmiş sorgudaki etiket sayıları (tek toplama sorgusu)."""
+    return qs.aggregate(toplam=Count('pk'), **{e: Count('pk', filter=Q(etiket=e)) for e in RAPOR_ETIKETLERI})
+
+
+def rapor_sayfasi(sayim_emri, depo=None, etiketler=None, grup=None, siralama='oncelik', imlec=None, limit=RAPOR_SAYFA_BOYUTU, ozet=False):
+    """
+    Raporun bir sayfası: {'satirlar': [...], 'sonraki': imleç veya None, 'ozet': etiket sayıları (istenirse)}.
+    Sadece limit + 1 satır okunur (fazlası sonraki sayfa olup olmadığını gösterir).
+    """
+    if siralama not in RAPOR_SIRALAMALARI: raise RaporParametreHatasi(f"Geçersiz sıralama: '{siralama}'.")
+    alanlar = RAPOR_SIRALAMALARI[siralama]
+    limit = max(1, min(int(limit), RAPOR_AZAMI_SAYFA_BOYUTU))
+    qs = rapor_filtrele(rapor_sorgusu(sayim_emri), depo, etiketler, grup)
+    sayfa_qs = qs.filter(_imlecten_sonra(alanlar, imlec_oku(imlec, alanlar))) if imlec else qs
+    sayfa = list(sayfa_qs.order_by(*alanlar)[:limit + 1])
+    sonraki = None
+    if len(sayfa) > limit:
+        sayfa = sayfa[:limit]
+        sonraki = imlec_yaz([getattr(sayfa[-1], a.lstrip('-')) for a in alanlar])
+    sonuc = {'satirlar': [_satir(m) for m in sayfa], 'sonraki': sonraki}
+    if ozet: sonuc['ozet'] = rapor_ozeti(qs)
+    return sonuc
+
+
+def _olcekli(ifade):
+    """Decimal ifadeyi 10^5 ile çarpılıp yuvarlanmış tamsayı olarak okur (5 ondalık kayıpsız)."""
+    return Cast(Round(ExpressionWrapper(ifade * Value(OLCEK), output_field=_ONDALIK)), BigIntegerField())
+
+
+def _tam(ifade):
+    return ExpressionWrapper(ifade, output_field=BigIntegerField())
+
+
+def _carpim_toplamlari(on, a, b):
+    """
+    SUM(a * b) için tam toplamlar (a, b: 10^5 ölçekli tamsayı alanlar). Çarpım 10^10 ölçeğinde
+    int64'e sığmayabileceği için a ve b tam ve ondalık kısımlarına ayrılır (a = ah * 10^5 + al);
+    üç toplam sırasıyla 1, 10^5 ve 10^10 ölçeğindedir.
+    """
+    ah, bh = _tam(F(a) / OLCEK), _tam(F(b) / OLCEK)  # Tamsayı bölmesi (sıfıra doğru); al = a - ah * 10^5 aynı işaretli
+    al, bl = _tam(F(a) - ah * OLCEK), _tam(F(b) - bh * OLCEK)
+    return {f'{on}_tam': Sum(_tam(ah * bh)), f'{on}_kesir': Sum(_tam(ah * bl + al * bh)), f'{on}_kalan': Sum(_tam(al * bl))}
+
+
+def _carpim(g, on):
+    """_carpim_toplamlari sonucunu 10 ondalıklı tam Decimal'e çevirir."""
+    toplam = (g[f'{on}_tam'] or 0) * OLCEK * OLCEK + (g[f'{on}_kesir'] or 0) * OLCEK + (g[f'{on}_kalan'] or 0)
+    return Decimal(toplam).scaleb(-10)
+
+
+def grup_ozeti_hesapla(sayim_emri):
+    """
+    Stok grubu başına sistem miktar/tutar ve fazla/eksik miktar/tutar; tek GROUP BY sorgusu (grup
+    adına göre sıralı). Toplamlar ölçekli tamsayılarla alındığı için Decimal hesabıyla aynıdır.
+    """
+    sayilan = SayimToplam.objects.filter(sayim_emri=sayim_emri, benzersiz_id=OuterRef('benzersiz_id')).values('toplam_miktar')[:1]
+    gruplar = AcilisStogu.objects.filter(sayim_emri=sayim_emri).annotate(
+        grup=Coalesce(NullIf('stok_grup', Value('')), Value('TANIMSIZ')),
+        sistem_o=_olcekli(Coalesce('sistem_stogu', Value(Decimal('0.0')), output_field=_ONDALIK)),
+        fiyat_o=_olcekli(Coalesce('birim_fiyat', Value(Decimal('0.0')), output_field=_ONDALIK)),
+        sayilan_o=_olcekli(Coalesce(Subquery(sayilan, output_field=_ONDALIK), Value(Decimal('0.0')), output_field=_ONDALIK)),
+    ).annotate(fark_o=_tam(F('sayilan_o') - F('sistem_o'))).values('grup').annotate(
+        sistem_toplam=Sum('sistem_o'), sayilan_toplam=Sum('sayilan_o'),
+        **_carpim_toplamlari('sistem_tutar', 'sistem_o', 'fiyat_o'), **_carpim_toplamlari('tutar_fark', 'fark_o', 'fiyat_o'),
+    ).order_by()
+    rapor_list = []
+    for g in sorted(gruplar, key=lambda g: g['grup']):
+        sistem_mik = Decimal(g['sistem_toplam'] or 0).scaleb(-5)
+        mik_fark_toplam = Decimal((g['sayilan_toplam'] or 0) - (g['sistem_toplam'] or 0)).scaleb(-5)
+        tutar_fark_toplam = _carpim(g, 'tutar_fark')
+        rapor_list.append({
+            'grup': g['grup'],
+            'sistem_mik': f"{sistem_mik:.2f}",
+            'sistem_tutar': f"{_carpim(g, 'sistem_tutar'):.2f}",
+            'fazla_mik': f"{mik_fark_toplam:.2f}" if mik_fark_toplam > 0 else "0.00",
+            'eksik_mik': f"{-mik_fark_toplam:.2f}" if mik_fark_toplam < 0 else "0.00",
+            'fazla_tutar': f"{tutar_fark_toplam:.2f}" if tutar_fark_toplam > 0 else "0.00",
+            'eksik_tutar': f"{-tutar_fark_toplam:.2f}" if tutar_fark_toplam < 0 else "0.00",
+        })
+    return rapor_list
+
+
+def _fark_ozeti_anahtari(sayim_emri):
+    # Açılış stoğu değişmez (sadece yeni malzemenin ilk sayımında, yeni toplam satırıyla birlikte eklenir)
+    durum = SayimToplam.objects.filter(sayim_emri=sayim_emri).aggregate(satir=Count('pk'), kayit=Sum('kayit_sayisi'), son=Max('pk'))
+    return f"fark_ozeti:{sayim_emri.pk}:{durum['satir']}.{durum['kayit'] or 0}.{durum['son'] or 0}"
+
+
+def grup_ozeti(sayim_emri):
+    """grup_ozeti_hesapla sonucu; emrin toplamları ve katalog değişmedikçe önbellekten (kapalı emirde onaydaki özet)."""
+    if rapor_donduruldu(sayim_emri): return sayim_emri.kapanis_ozeti
+    anahtar = _fark_ozeti_anahtari(sayim_emri)
+    ozet = cache.get(anahtar)
+    if ozet is None:
+        ozet = grup_ozeti_hesapla(sayim_emri)
+        cache.set(anahtar, ozet, FARK_OZETI_ONBELLEK_SURESI)
+    return ozet
+
+
+# Dondurulan satırlara yazılan rapor alanları (SayimRaporSatiri alan adlarıyla aynı)
+_KOPYA_ALANLARI = (
+    'benzersiz_id', 'malzeme_kodu', 'malzeme_adi', 'parti_no', 'renk', 'olcu_birimi', 'lokasyon_kodu', 'stok_grup',
+    'sistem', 'sayilan', 'fiyat', 'mik_fark', 'sistem_tutar', 'tutar_fark', 'mik_fark_mutlak', 'tutar_fark_mutlak',
+    'etiket', 'etiket_sira',
+)
+
+
+def rapor_dondur(sayim_emri):
+    """
+    Emrin raporunu dondurur: canlı rapor satırları INSERT ... SELECT ile kopyalanır ve grup
+    özeti kapanis_ozeti'ne yazılır. Stoklar güncellenmeden önce, onayla aynı işlemde
+    çağrılmalıdır. Dönüş: yazılan satır sayısı.
+    """
+    ozet = grup_ozeti(sayim_emri)
+    secim, parametreler = canli_rapor_sorgusu(sayim_emri).annotate(emir=Value(sayim_emri.pk, output_field=IntegerField()))\
+        .order_by('pk').values_list('emir', *_KOPYA_ALANLARI).query.sql_with_params()
+    q = connection.ops.quote_name
+    sutunlar = ', '.join(q(SayimRaporSatiri._meta.get_field(a).column) for a in ('sayim_emri', *_KOPYA_ALANLARI))
+    with transaction.atomic(), connection.cursor() as cursor:
+        SayimRaporSatiri.objects.filter(sayim_emri=sayim_emri).delete()
+        cursor.execute(f"INSERT INTO {q(SayimRaporSatiri._meta.db_table)} ({sutunlar}) {secim}", parametreler)
+        yazilan = cursor.rowcount
+        sayim_emri.kapanis_ozeti = ozet
+        sayim_emri.save(update_fields=['kapanis_ozeti'])
+        # Açılış stoğu artık dondurulmuş satırlarda; tekrar okunmaz
+        AcilisStogu.objects.filter(sayim_emri=sayim_emri).delete()
+    return yazilan
@@ -0,0 +1,504 @@
+# -*- coding: utf-8 -*-
+"""
+Stok (Malzeme) yükleme yardımcıları.
+
+Akış iki aşamalıdır:
+  1. stok_df_hazirla: DataFrame üzerinde sütun bazlı (vektörel) temizleme,
+     sayısal dönüşüm, benzersiz_id / içerik özeti (hash) üretimi ve hata/tekrar tespiti.
+  2. toplu_malzeme_yaz: satırlar update_or_create yerine parça (chunk) halinde
+     bulk_create (ON CONFLICT DO UPDATE) ile yazılır. Böylece 80 bin satırlık bir ERP
+     çıktısı için binlerce sorgu yerine parça başına birkaç sorgu çalışır.
+     Fark (delta) modunda içerik özeti değişmeyen satırlar hiç yazılmaz.
+
+Yazma her zaman tek bir katalog sürümüne yapılır (verilmezse aktif sürüm);
+arka plan yüklemesi yeni bir sürüme yazıp bitince onu aktif yapar (bkz. katalog.py).
+"""
+
+import os
+from datetime import timedelta
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .katalog import KatalogVersiyonHatasi, malzeme_kodlarini_yaz, versiyonu_aktiflestir, versiyonu_iptal_et, yeni_versiyon_hazirla
+from .models import STANDART_ALANLAR, KatalogVersiyon, Malzeme, StokYuklemeIsi, generate_unique_id, ondalik_yuvarla, standardize_id_part
+
+# Bir parçada işlenecek satır sayısı. SQLite değişken limitine takılmamak için
+# benzersiz_id__in sorguları da bu boyutta yapılır.
+CHUNK_BOYUTU = 1000
+
+# Yükleme ekranındaki Excel başlıklarının Malzeme alanlarına karşılığı
+EXCEL_SUTUNLARI = {
+    "Stok Kodu": 'malzeme_kodu', "Depo Kodu": 'lokasyon_kodu', "Parti": 'parti_no', "Renk": 'renk',
+    "seri_no": 'seri_no', "Stok Adı": 'malzeme_adi', "Grup": 'stok_grup', "Birim": 'olcu_birimi',
+    "Miktar": 'sistem_stogu', "Maliyet birim": 'birim_fiyat', "barkod": 'barkod', "Alternatif Kodlar": 'alternatif_kodlar',
+}
+
+# Boş hücreler için varsayılanlar (Malzeme alan adlarıyla; web yüklemesinin kuralları).
+# malzeme_adi varsayılanlarda varsa boş ad 'Stok <kod>' olur.
+VARSAYILANLAR = {
+    'parti_no': 'YOK', 'renk': 'YOK', 'lokasyon_kodu': 'MERKEZ', 'seri_no': 'YOK',
+    'sistem_stogu': '0.0', 'birim_fiyat': '0.0', 'stok_grup': 'GENEL', 'malzeme_adi': '', 'olcu_birimi': 'ADET',
+}
+
+# Boş ('YOK') olursa satırı hatalı sayan ID alanları ve hata mesajları
+ZORUNLU_ALANLAR = {'malzeme_kodu': 'Stok Kodu boş.', 'lokasyon_kodu': 'Depo Kodu boş.'}
+
+# standardize_id_part ile temizlenen (ID parçası olan) alanlar
+ID_ALANLARI = ['malzeme_kodu', 'parti_no', 'lokasyon_kodu', 'renk', 'seri_no']
+# Sadece kenar boşlukları temizlenen metin alanları
+METIN_ALANLARI = ['malzeme_adi', 'stok_grup', 'olcu_birimi', 'depo_adi', 'depo_sinif', 'barkod', 'alternatif_kodlar']
+SAYISAL_ALANLAR = ['sistem_stogu', 'birim_fiyat']
+
+# Hata tablosunun sütunları
+HATA_SUTUNLARI = ['satir', 'sutun', 'deger', 'hata', 'kritik']
+
+# Çakışmada (mevcut benzersiz_id) her zaman güncellenen alanlar; dosyada gelen diğer alanlar
+# (depo_adi, barkod vb.) satırlarda varsa bunlara eklenir.
+GUNCELLENECEK_ALANLAR = [
+    'malzeme_kodu', 'malzeme_adi', 'parti_no', 'renk', 'lokasyon_kodu',
+    'olcu_birimi', 'stok_grup', 'seri_no', 'sistem_stogu', 'birim_fiyat', 'sistem_tutari', 'kaynakta_yok',
+]
+
+
+# --- VEKTÖREL HAZIRLAMA ---
+
+def standardize_series(seri):
+    """
+    models.standardize_id_part'ın sütun bazlı karşılığı: aynı girdiler için
+    birebir aynı sonucu üretir (str -> strip -> upper, boş/NAN/NONE/NULL/NA -> 'YOK').
+    """
+    temiz = seri.astype(str).str.strip().str.upper()
+    return temiz.mask((temiz == '') | temiz.isin(['NAN', 'NONE', 'NULL', 'NA']), 'YOK')
+
+
+def generate_unique_id_series(stok_kod, parti_no, lokasyon_kod, renk):
+    """models.generate_unique_id'nin sütun bazlı karşılığı."""
+    return (standardize_series(stok_kod) + '_' + standardize_series(parti_no) + '_'
+            + standardize_series(lokasyon_kod) + '_' + standardize_series(renk))
+
+
+def _sayisal_seri(seri):
+    """
+    Virgüllü sayıları noktalıya çevirir. Dönüş: (temiz_metin, gecerli_mi).
+    Değerler Decimal'e kayıpsız çevrilebilsin diye metin olarak bırakılır;
+    geçerlilik pd.to_numeric ile toplu kontrol edilir.
+    """
+    metin = seri.astype(str).str.replace(',', '.', regex=False).str.strip()
+    metin = metin.mask(metin == '', '0.0')
+    sayi = pd.to_numeric(metin, errors='coerce')
+    return metin, pd.Series(np.isfinite(sayi.to_numpy(dtype=float)), index=seri.index)
+
+
+def _yazilacak_sayi_metni(metin):
+    """Temiz sayı metinlerini _malzeme_nesnesi'nin yazacağı değere (ondalik_yuvarla) çevirir; her farklı değer bir kez."""
+    return metin.map({deger: str(ondalik_yuvarla(deger)) for deger in metin.unique()})
+
+
+def stok_df_hazirla(df, varsayilanlar=VARSAYILANLAR, ilk_satir=2, sayisal_hata='hata', zorunlu_alanlar=ZORUNLU_ALANLAR):
+    """
+    Malzeme alan adlarıyla gelen ham DataFrame'i satır döngüsü olmadan temizler.
+
+    - Eksik sütunlar ve boş hücreler varsayılanlarla doldurulur.
+    - ID alanları standardize edilir, benzersiz_id sütun olarak üretilir; zorunlu_alanlar
+      boş kalan satırlar kritik hatadır.
+    - Miktar/maliyet virgül -> nokta dönüşümüyle doğrulanır. sayisal_hata='sifir'
+      ise geçersiz sayılar hata yerine 0 kabul edilir.
+    - Aynı benzersiz_id dosyada birden çok geçiyorsa son satır geçerli olur,
+      öncekiler kritik olmayan 'tekrar' kaydı olarak raporlanır.
+
+    - Her geçerli satır için yazılacak alanların 64 bitlik özeti (icerik_hash)
+      pd.util.hash_pandas_object ile toplu hesaplanır; miktar/maliyet metin haliyle
+      değil, yazılacak (5 basamağa yuvarlanmış) değerleriyle özetlenir.
+
+    Satır numaraları indeks adı 'satir' ise indeksten, değilse ilk_satir'dan ardışık alınır.
+
+    Dönüş: (temiz_df, hatalar_df). temiz_df Malzeme alanlarını, 'icerik_hash'
+    ve 'satir' sütunlarını içerir; hatalar_df HATA_SUTUNLARI yapısındadır.
+    """
+    df = df.copy()
+    # Okuyucu gerçek satır numaralarını verdiyse (indeks adı 'satir', bkz. stok_okuyucu) onlar kullanılır
+    df['satir'] = df.index.to_numpy(dtype=np.int64) if df.index.name == 'satir' else np.arange(ilk_satir, ilk_satir + len(df))
+    df.index = df['satir']
+
+    for alan in ID_ALANLARI + METIN_ALANLARI + SAYISAL_ALANLAR:
+        if alan not in df.columns:
+            if alan in varsayilanlar or alan in ID_ALANLARI + SAYISAL_ALANLAR:
+                df[alan] = varsayilanlar.get(alan, 'YOK' if alan in ID_ALANLARI else '0.0')
+            continue
+        df[alan] = df[alan].astype(str).str.strip()
+        if alan in varsayilanlar: df[alan] = df[alan].mask(df[alan] == '', varsayilanlar[alan])
+
+    ham = {alan: df[alan] for alan in tuple(zorunlu_alanlar) + tuple(SAYISAL_ALANLAR)}
+    for alan in ID_ALANLARI: df[alan] = standardize_series(df[alan])
+    df['benzersiz_id'] = df['malzeme_kodu'] + '_' + df['parti_no'] + '_' + df['lokasyon_kodu'] + '_' + df['renk']
+    if 'malzeme_adi' in df.columns and 'malzeme_adi' in varsayilanlar:
+        df['malzeme_adi'] = df['malzeme_adi'].mask(df['malzeme_adi'] == '', 'Stok ' + df['malzeme_kodu'])
+
+    hata_parcalari = []
+    def _hata_ekle(maske, sutun, degerler, mesaj, kritik=True):
+        if maske.any():
+            hata_parcalari.append(pd.DataFrame({
+                'satir': df.loc[maske, 'satir'], 'sutun': sutun, 'deger': degerler[maske],
+                'hata': mesaj, 'kritik': kritik,
+            }))
+
+    gecersiz = pd.Series(False, index=df.index)
+    for alan, mesaj in zorunlu_alanlar.items():
+        maske = df[alan] == 'YOK'
+        _hata_ekle(maske, alan, ham[alan], mesaj)
+        gecersiz |= maske
+    for alan in SAYISAL_ALANLAR:
+        metin, gecerli = _sayisal_seri(df[alan])
+        if sayisal_hata == 'sifir':
+            df[alan] = metin.where(gecerli, '0.0')
+        else:
+            df[alan] = metin
+            _hata_ekle(~gecerli, alan, ham[alan], f"Geçersiz sayı ({alan}).")
+            gecersiz |= ~gecerli
+
+    # Tekrar kontrolü sadece geçerli satırlar arasında yapılır
+    tekrar = df['benzersiz_id'].where(~gecersiz).duplicated(keep='last') & ~gecersiz
+    _hata_ekle(tekrar, 'benzersiz_id', df['benzersiz_id'], 'Tekrarlanan benzersiz ID (son satır kullanıldı).', kritik=False)
+
+    hatalar = pd.concat(hata_parcalari, ignore_index=True).sort_values('satir', kind='stable') if hata_parcalari \
+        else pd.DataFrame(columns=HATA_SUTUNLARI).astype({'satir': int, 'kritik': bool})
+    temiz = df[~(gecersiz | tekrar)].reset_index(drop=True)
+    # Sayılar yazılacak değerleriyle özetlenir: '10' / '10.0' / '1,5' / '1.5' farkı değişiklik sayılmaz
+    icerik = temiz[[a for a in ID_ALANLARI + METIN_ALANLARI if a in temiz.columns]]\
+        .assign(**{alan: _yazilacak_sayi_metni(temiz[alan]) for alan in SAYISAL_ALANLAR})
+    temiz['icerik_hash'] = pd.util.hash_pandas_object(icerik, index=False).to_numpy().view(np.int64)
+    return temiz, hatalar.reset_index(drop=True)
+
+
+def temiz_df_kayitlari(temiz):
+    """stok_df_hazirla çıktısını toplu_malzeme_yaz'ın beklediği sözlüklere çevirir."""
+    alanlar = [a for a in ID_ALANLARI + METIN_ALANLARI + SAYISAL_ALANLAR + ['icerik_hash'] if a in temiz.columns]
+    return temiz[alanlar].to_dict('records')
+
+
+# --- TOPLU YAZMA ---
+
+def _parcala(liste, boyut):
+    for i in range(0, len(liste), boyut):
+        yield liste[i:i + boyut]
+
+
+def _malzeme_nesnesi(kayit, versiyon):
+    """
+    Standartlaştırılmış bir satır sözlüğünden, verilen katalog sürümüne ait kaydedilmemiş Malzeme nesnesi üretir.
+    bulk_create Malzeme.save()'i çağırmadığı için benzersiz_id ve
+    sistem_tutari burada hesaplanır.
+    """
+    sistem_stogu = kayit['sistem_stogu'] if isinstance(kayit['sistem_stogu'], Decimal) else Decimal(str(kayit['sistem_stogu']))
+    birim_fiyat = kayit['birim_fiyat'] if isinstance(kayit['birim_fiyat'], Decimal) else Decimal(str(kayit['birim_fiyat']))
+    malzeme = Malzeme(**{alan: deger for alan, deger in kayit.items() if alan not in ('sistem_stogu', 'birim_fiyat')})
+    for alan in STANDART_ALANLAR:
+        setattr(malzeme, alan, standardize_id_part(getattr(malzeme, alan)))
+    malzeme.benzersiz_id = generate_unique_id(malzeme.malzeme_kodu, malzeme.parti_no, malzeme.lokasyon_kodu, malzeme.renk)
+    malzeme.sistem_stogu = sistem_stogu = ondalik_yuvarla(sistem_stogu)
+    malzeme.birim_fiyat = birim_fiyat = ondalik_yuvarla(birim_fiyat)
+    malzeme.sistem_tutari = ondalik_yuvarla(sistem_stogu * birim_fiyat)
+    malzeme.kaynakta_yok = False
+    malzeme.versiyon = versiyon
+    return malzeme
+
+
+def _parca_yaz(malzemeler, versiyon, alanlar=GUNCELLENECEK_ALANLAR, sadece_degisenler=False):
+    """
+    Tek bir parçayı yazar. Parça içinde aynı benzersiz_id birden çok kez geçiyorsa
+    (update_or_create davranışıyla uyumlu olarak) sonuncusu geçerli olur ve
+    öncekiler 'güncellenen' sayılır. sadece_degisenler True ise içerik özeti
+    veritabanındakiyle aynı olan (ve kaynakta_yok işareti olmayan) satırlar atlanır.
+    Dönüş: (yeni, guncellenen, degismeyen)
+    """
+    son_kayitlar = {}
+    tekrar_sayisi = 0
+    for m in malzemeler:
+        if m.benzersiz_id in son_kayitlar: tekrar_sayisi += 1
+        son_kayitlar[m.benzersiz_id] = m
+
+    mevcut = {
+        bid: (icerik_hash, kaynakta_yok) for bid, icerik_hash, kaynakta_yok in
+        Malzeme.objects.filter(versiyon=versiyon, benzersiz_id__in=list(son_kayitlar.keys())).values_list('benzersiz_id', 'icerik_hash', 'kaynakta_yok')
+    }
+    degismeyen = 0
+    if sadece_degisenler:
+        for bid in [bid for bid, m in son_kayitlar.items() if mevcut.get(bid) == (m.icerik_hash, False) and m.icerik_hash is not None]:
+            del son_kayitlar[bid]; degismeyen += 1
+
+    # Yeni ve mevcut kayıtlar tek bir INSERT ... ON CONFLICT DO UPDATE ile yazılır;
+    # mevcut ID'ler sadece yeni/güncellenen sayılarını raporlamak için çekilir.
+    if son_kayitlar:
+        Malzeme.objects.bulk_create(
+            list(son_kayitlar.values()), batch_size=CHUNK_BOYUTU,
+            update_conflicts=True, unique_fields=['versiyon', 'benzersiz_id'], update_fields=alanlar,
+        )
+        # Yazılan satırların okutulabilir kodları (MalzemeKod) aynı transaction'da yenilenir
+        malzeme_kodlarini_yaz(Malzeme.objects.filter(versiyon=versiyon, benzersiz_id__in=list(son_kayitlar.keys())))
+    guncellenen = len(mevcut) - degismeyen
+    return len(son_kayitlar) - guncellenen, guncellenen + tekrar_sayisi, degismeyen
+
+
+def toplu_malzeme_yaz(kayitlar, chunk_boyutu=CHUNK_BOYUTU, sadece_degisenler=False, versiyon=None):
+    """
+    Malzeme alan adlarıyla gelen satır sözlüklerini toplu olarak yazar (upsert).
+
+    Her parça için mevcut benzersiz_id'ler tek sorguda çekilir, ardından parça
+    tek bir upsert (bulk_create + update_conflicts) ile yazılır. Bir parçada veritabanı hatası
+    olursa o parça satır satır tekrar denenir ve sadece hatalı satırlar atlanır.
+    sadece_degisenler True ise (fark yükleme) içerik özeti değişmeyen satırlar yazılmaz.
+    versiyon verilmezse aktif katalog sürümüne yazılır.
+    Dönüş: (created_count, updated_count, unchanged_count, fail_count)
+    """
+    created_count, updated_count, unchanged_count, fail_count = 0, 0, 0, 0
+    versiyon = versiyon or KatalogVersiyon.aktif_versiyon()
+
+    malzemeler, alanlar = [], list(GUNCELLENECEK_ALANLAR)
+    for index, kayit in enumerate(kayitlar):
+        if index == 0: alanlar += [a for a in kayit if a not in alanlar]
+        try:
+            malzemeler.append(_malzeme_nesnesi(kayit, versiyon))
+        except Exception as e:
+            print(f"Satır {index + 2} dönüştürme hatası: {e}"); fail_count += 1
+
+    for parca in _parcala(malzemeler, chunk_boyutu):
+        try:
+            with transaction.atomic():
+                yeni, guncel, ayni = _parca_yaz(parca, versiyon, alanlar, sadece_degisenler)
+            created_count += yeni; updated_count += guncel; unchanged_count += ayni
+        except DatabaseError as e:
+            print(f"Toplu yazma hatası ({len(parca)} satır), satır satır deneniyor: {e}")
+            for m in parca:
+                try:
+                    with transaction.atomic():
+                        yeni, guncel, ayni = _parca_yaz([m], versiyon, alanlar, sadece_degisenler)
+                    created_count += yeni; updated_count += guncel; unchanged_count += ayni
+                except DatabaseError as row_err:
+                    print(f"{m.benzersiz_id} DB hatası: {row_err}"); fail_count += 1
+
+    # Sürüm yerinde değişti; arama indeksleri yeniden kurulur
+    if created_count or updated_count: versiyon.revizyonu_artir()
+    return created_count, updated_count, unchanged_count, fail_count
+
+
+def kaynakta_olmayanlari_isaretle(gorulen_idler, versiyon=None):
+    """
+    Son yüklenen dosyada bulunmayan (verilen sürümdeki) Malzeme kayıtlarını kaynakta_yok=True yapar
+    (silmez; sayımlar bu kayıtlara bağlı olabilir). Dosyada tekrar görülen
+    kayıtların işareti yazma sırasında zaten kaldırılır.
+    Dönüş: işaretli (kaynakta olmayan) toplam kayıt sayısı.
+    """
+    satirlar = Malzeme.objects.filter(versiyon=versiyon or KatalogVersiyon.aktif_versiyon())
+    eksik_pkler = [
+        pk for pk, bid in satirlar.filter(kaynakta_yok=False).values_list('pk', 'benzersiz_id').iterator(chunk_size=CHUNK_BOYUTU)
+        if bid not in gorulen_idler
+    ]
+    for parca in _parcala(eksik_pkler, CHUNK_BOYUTU):
+        Malzeme.objects.filter(pk__in=parca).update(kaynakta_yok=True)
+    return satirlar.filter(kaynakta_yok=True).count()
+
+
+# --- PARÇALI (AKIŞ) YÜKLEME ---
+
+# Sonuçta saklanacak en fazla hata satırı (bellek sınırı için)
+AZAMI_HATA_SATIRI = 100
+
+
+class StokImportHatasi(Exception):
+    """Yüklemeyi durduran (kritik) veri hatası. Atomic blok içinde yükseltilirse yazılanlar geri alınır."""
+
+
+def excel_sutunlarini_hazirla(df):
+    """
+    Yükleme ekranındaki başlıklı dosya parçasını Malzeme alan adlarına çevirir.
+    Zorunlu sütunlar eksikse StokImportHatasi yükseltir; 'seri_no' yoksa 'barkod'
+    sütunu seri_no olarak kullanılır.
+    """
+    zorunlu = ["Stok Kodu", "Depo Kodu", "Miktar", "Maliyet birim", "seri_no"]
+    eksik = [col for col in zorunlu if col not in df.columns]
+    if 'seri_no' in eksik and 'barkod' in df.columns:
+        df = df.assign(seri_no=df['barkod'])
+        eksik.remove('seri_no')
+    if eksik: raise StokImportHatasi(f'Eksik sütunlar: {", ".join(eksik)}')
+    return df[[col for col in EXCEL_SUTUNLARI if col in df.columns]].rename(columns=EXCEL_SUTUNLARI)
+
+
+def parcalari_dogrula(parcalar, sutun_hazirla=None, ilerleme=None):
+    """
+    Parçaları yazmadan hazırlayıp kritik hata arar (arka plan işinin ilk aşaması).
+    ilerleme verilirse her parçadan sonra okunan toplam satır sayısıyla çağrılır.
+    Dönüş: (satir_sayisi, ilk_kritik_hata_mesaji veya None)
+    """
+    satir_sayisi = 0
+    for ham_parca in parcalar:
+        df = sutun_hazirla(ham_parca) if sutun_hazirla else ham_parca
+        _, hatalar = stok_df_hazirla(df, ilk_satir=satir_sayisi + 2)
+        satir_sayisi += len(df)
+        kritik = hatalar[hatalar['kritik']]
+        if not kritik.empty:
+            ilk = kritik.iloc[0]
+            return satir_sayisi, f'Satır {ilk["satir"]}: Veri hatası - "{ilk["hata"]}". Değer="{ilk["deger"]}".'
+        if ilerleme: ilerleme(satir_sayisi)
+    return satir_sayisi, None
+
+
+def parcalari_yukle(parcalar, sutun_hazirla=None, kritik_hatada_dur=True, sayisal_hata='hata',
+                    sadece_degisenler=False, eksikleri_isaretle=False, ilerleme=None, versiyon=None,
+                    varsayilanlar=VARSAYILANLAR, zorunlu_alanlar=ZORUNLU_ALANLAR):
+    """
+    stok_okuyucu.stok_parcalari_oku'dan gelen ham parçaları sırayla hazırlar ve yazar.
+
+    sutun_hazirla: ham parçayı Malzeme alan adlarına çeviren fonksiyon.
+    kritik_hatada_dur: True ise ilk kritik hatada StokImportHatasi yükseltilir
+    (çağıran transaction.atomic içindeyse o ana kadar yazılanlar geri alınır);
+    False ise hatalı satırlar atlanıp devam edilir.
+    sadece_degisenler: fark yükleme; içeriği değişmeyen satırlar yazılmaz.
+    eksikleri_isaretle: dosyada bulunmayan kayıtlar kaynakta_yok olarak işaretlenir
+    (bunun için görülen benzersiz_id'ler bellekte bir kümede tutulur).
+    ilerleme: verilirse her parça yazıldıktan sonra güncel özet ile çağrılır.
+    versiyon: yazılacak katalog sürümü (verilmezse aktif sürüm).
+    varsayilanlar, zorunlu_alanlar: stok_df_hazirla'ya aynen geçirilir.
+
+    Bellekte aynı anda sadece bir parça tutulur. Dönüş: özet sözlüğü
+    {'satir', 'yeni', 'guncellenen', 'degismeyen', 'eksik', 'hatali', 'tekrar', 'hatalar'};
+    'eksik' sadece eksikleri_isaretle ile dolar, 'hatalar' ilk AZAMI_HATA_SATIRI
+    hata kaydının listesidir.
+    """
+    ozet = {'satir': 0, 'yeni': 0, 'guncellenen': 0, 'degismeyen': 0, 'eksik': None, 'hatali': 0, 'tekrar': 0, 'hatalar': []}
+    gorulen_idler = set()
+    versiyon = versiyon or KatalogVersiyon.aktif_versiyon()
+    for ham_parca in parcalar:
+        df = sutun_hazirla(ham_parca) if sutun_hazirla else ham_parca
+        temiz_df, hatalar = stok_df_hazirla(df, varsayilanlar, ozet['satir'] + 2, sayisal_hata, zorunlu_alanlar)
+        ozet['satir'] += len(df)
+
+        kritik = hatalar[hatalar['kritik']]
+        if not kritik.empty and kritik_hatada_dur:
+            ilk = kritik.iloc[0]
+            raise StokImportHatasi(
+                f'Satır {ilk["satir"]}: Veri hatası - "{ilk["hata"]}". Değer="{ilk["deger"]}". '
+                f'(Bu parçada {len(kritik)} hatalı satır)'
+            )
+        ozet['hatali'] += len(kritik)
+        ozet['tekrar'] += len(hatalar) - len(kritik)
+        kalan = AZAMI_HATA_SATIRI - len(ozet['hatalar'])
+        if kalan > 0 and not hatalar.empty: ozet['hatalar'] += hatalar.head(kalan).to_dict('records')
+
+        if eksikleri_isaretle: gorulen_idler.update(temiz_df['benzersiz_id'])
+        yeni, guncel, ayni, hatali = toplu_malzeme_yaz(temiz_df_kayitlari(temiz_df), sadece_degisenler=sadece_degisenler, versiyon=versiyon)
+        ozet['yeni'] += yeni; ozet['guncellenen'] += guncel; ozet['degismeyen'] += ayni; ozet['hatali'] += hatali
+        if ilerleme: ilerleme(ozet)
+
+    if eksikleri_isaretle: ozet['eksik'] = kaynakta_olmayanlari_isaretle(gorulen_idler, versiyon)
+    return ozet
+
+
+def yukleme_mesaji(ozet, sadece_degisenler=False):
+    """Yükleme özetinden kullanıcıya gösterilecek sonuç mesajını üretir."""
+    msg = f"✅ Bitti: {ozet['yeni']} yeni, {ozet['guncellenen']} güncellenen"
+    msg += f", {ozet['degismeyen']} değişmeyen." if sadece_degisenler else "."
+    msg += f" Hata/Atlanan: {ozet['hatali']}."
+    if ozet['tekrar']: msg += f" Tekrarlanan: {ozet['tekrar']}."
+    if ozet['eksik'] is not None: msg += f" Dosyada olmayan (işaretlendi): {ozet['eksik']}."
+    return msg
+
+
+# --- ARKA PLAN YÜKLEME İŞİ ---
+
+# Arka plan işinde okunan parça boyutu (ilerleme bu sıklıkla güncellenir)
+IS_PARCA_BOYUTU = 5000
+# Bu kadar saniye ilerleme yazmayan açık iş, süreci ölmüş sayılıp kapatılır
+STOK_YUKLEME_IS_ZAMAN_ASIMI = getattr(settings, 'STOK_YUKLEME_IS_ZAMAN_ASIMI', 900)
+
+
+def yarim_kalan_yuklemeleri_kapat():
+    """
+    Süreci ölmüş (worker zaman aşımı, bellek, yeniden başlatma) yükleme işlerini kapatır;
+    finally bloğu o durumda çalışmadığı için iş 'Çalışıyor' ve sürümü 'Yükleniyor' kalırdı
+    (onaylar da o sürüme yazılmaya devam ederdi). STOK_YUKLEME_IS_ZAMAN_ASIMI saniyedir
+    ilerleme yazmayan çalışan işler ile çalışan iş yokken bu süredir bekleyen işler 'Hata'
+    olur; 'Yükleniyor' sürümleri iptal edilir, dosyaları silinir. Dönüş: kapatılan iş sayısı.
+    """
+    sinir = timezone.now() - timedelta(seconds=STOK_YUKLEME_IS_ZAMAN_ASIMI)
+    bayat = Q(durum='Çalışıyor', son_ilerleme_tarihi__lt=sinir)
+    if not StokYuklemeIsi.objects.filter(durum='Çalışıyor', son_ilerleme_tarihi__gte=sinir).exists():
+        bayat |= Q(durum='Bekliyor', son_ilerleme_tarihi__lt=sinir)
+
+    kapatilan = 0
+    for isi in StokYuklemeIsi.objects.filter(bayat):
+        if not StokYuklemeIsi.objects.filter(pk=isi.pk, durum=isi.durum).update(
+                durum='Hata', mesaj='Yükleme yarıda kaldı (sunucu yeniden başlatıldı veya zaman aşımı). Lütfen dosyayı tekrar yükleyin.',
+                bitis_tarihi=timezone.now(), son_ilerleme_tarihi=timezone.now()):
+            continue
+        for versiyon in KatalogVersiyon.objects.filter(yukleme_isi=isi, durum='Yükleniyor'): versiyonu_iptal_et(versiyon)
+        if os.path.exists(isi.dosya_yolu): os.remove(isi.dosya_yolu)
+        print(f"Stok Yükleme İşi {isi.pk}: yarıda kalmış, kapatıldı.")
+        kapatilan += 1
+    return kapatilan
+
+
+def yukleme_isi_durumu(isi):
+    """İşin güncel hali; süreci ölmüş açık iş 'Hata' olarak kapatılır."""
+    if isi.durum in ('Bekliyor', 'Çalışıyor') and yarim_kalan_yuklemeleri_kapat(): isi.refresh_from_db()
+    return isi
+
+
+def yukleme_isini_calistir(is_id):
+    """
+    StokYuklemeIsi kaydını çalıştırır (isler.is_gonder ile worker thread'inde).
+
+    1. Doğrulama: dosya yazılmadan baştan sona okunur; kritik hata varsa hiçbir
+       satır yazılmadan iş 'Hata' ile biter.
+    2. Yazma: aktif katalog yeni bir sürüme kopyalanır ve parçalar bu sürüme
+       ayrı ayrı (kısa) transaction'larla yazılır. Arama ve sayım bu sırada
+       aktif sürümü okumaya devam eder; yükleme bitince yeni sürüm tek
+       transaction ile aktif olur. Hata olursa yeni sürüm iptal edilir.
+    İlerleme her parçadan sonra iş kaydına yazılır; dosya iş bitince silinir.
+    """
+    from .stok_okuyucu import stok_parcalari_oku
+
+    isi = StokYuklemeIsi.objects.get(pk=is_id)
+    def guncelle(**alanlar): StokYuklemeIsi.objects.filter(pk=is_id).update(son_ilerleme_tarihi=timezone.now(), **alanlar)
+
+    versiyon = None
+    simdi = timezone.now()
+    # Beklerken yarıda kaldı diye kapatılmış iş çalıştırılmaz
+    if not StokYuklemeIsi.objects.filter(pk=is_id, durum='Bekliyor').update(
+            durum='Çalışıyor', asama='Doğrulama', baslama_tarihi=simdi, asama_baslama_tarihi=simdi, son_ilerleme_tarihi=simdi):
+        if os.path.exists(isi.dosya_yolu): os.remove(isi.dosya_yolu)
+        return
+    try:
+        toplam, hata = parcalari_dogrula(
+            stok_parcalari_oku(isi.dosya_yolu, chunk_boyutu=IS_PARCA_BOYUTU), excel_sutunlarini_hazirla,
+            ilerleme=lambda n: guncelle(okunan_satir=n),
+        )
+        if hata: raise StokImportHatasi(hata)
+        if toplam == 0: raise StokImportHatasi('Geçerli veri yok.')
+
+        guncelle(okunan_satir=toplam, toplam_satir=toplam, mesaj='Katalog kopyalanıyor...')
+        versiyon = yeni_versiyon_hazirla(aciklama=isi.dosya_adi, yukleme_isi=isi)
+        guncelle(asama='Yazma', asama_baslama_tarihi=timezone.now(), mesaj='')
+        ozet = parcalari_yukle(
+            stok_parcalari_oku(isi.dosya_yolu, chunk_boyutu=IS_PARCA_BOYUTU), sutun_hazirla=excel_sutunlarini_hazirla,
+            sadece_degisenler=isi.sadece_degisenler, eksikleri_isaretle=isi.eksikleri_isaretle,
+            ilerleme=lambda o: guncelle(yazilan_satir=o['yeni'] + o['guncellenen'] + o['degismeyen'], hata_sayisi=o['hatali']),
+            versiyon=versiyon,
+        )
+        versiyonu_aktiflestir(versiyon)
+        mesaj = f"{yukleme_mesaji(ozet, isi.sadece_degisenler)} Katalog v{versiyon.pk} aktif."
+        guncelle(durum='Tamamlandı', mesaj=mesaj, ozet=ozet, bitis_tarihi=timezone.now())
+    except (StokImportHatasi, KatalogVersiyonHatasi) as e:
+        print(f"Stok Yükleme İşi {is_id}: {e}")
+        guncelle(durum='Hata', mesaj=str(e), hata_sayisi=1, bitis_tarihi=timezone.now())
+    except Exception as e:
+        print(f"Stok Yükleme İşi {is_id} Kritik Hata: {e}")
+        guncelle(durum='Hata', mesaj=f'Kritik hata: {e}', bitis_tarihi=timezone.now())
+    finally:
+        if versiyon is not None: versiyonu_iptal_et(versiyon)  # Aktif olduysa etkisizdir
+        if os.path.exists(isi.dosya_yolu): os.remove(isi.dosya_yolu)
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+Büyük stok dosyaları için düşük bellekli okuyucu.
+
+Yüklenen dosya önce diske alınır (Django büyük dosyaları zaten geçici dosyaya
+yazar), ardından satırlar sabit boyutlu DataFrame parçaları halinde okunur.
+Böylece 200 MB'lık bir CSV'de bile bellekte aynı anda sadece bir parça durur.
+
+- CSV: kodlama ve ayraç, dosyanın başından alınan küçük bir örnek üzerinde bir
+  kez tespit edilir; okuma pandas C motoru ile chunksize kullanılarak yapılır.
+- XLSX: openpyxl read-only modunda satır satır okunur. Tamamen boş satırlar atlanır;
+  parçaların indeksi ('satir') sayfadaki gerçek satır numarasıdır, böylece hata
+  satır numaraları atlanan satırlardan kaymaz (bkz. stok_import.stok_df_hazirla).
+- XLS: xlrd akış desteklemediği için tamamı okunup parçalara bölünür.
+
+Tüm hücreler metin olarak döner (boş hücre -> ''), sütun adlarının kenar
+boşlukları temizlenir.
+"""
+
+import csv
+import os
+import tempfile
+
+import pandas as pd
+
+# Bir parçada okunacak satır sayısı
+SATIR_PARCA_BOYUTU = 20000
+# Kodlama / ayraç tespiti için okunan örnek boyutu
+ORNEK_BOYUTU = 64 * 1024
+# UTF-8 çözülemezse sırayla denenen kodlamalar (Türkçe karakterler için latin1 yerine).
+# Excel'in Türkçe Windows CSV çıktısı cp1254'tür ('’', '€' gibi 0x80-0x9F karakterleri
+# iso-8859-9'da kontrol karakteri olur); cp1254'te tanımsız bayt varsa iso-8859-9.
+YEDEK_KODLAMALAR = ('cp1254', 'iso-8859-9')
+
+DESTEKLENEN_UZANTILAR = ('.xlsx', '.xls', '.csv')
+
+
+def dosya_uzantisi(dosya_adi):
+    return os.path.splitext(str(dosya_adi))[1].lower()
+
+
+def yuklemeyi_diske_al(yuklenen_dosya, dizin=None, kopyala=False):
+    """
+    Django UploadedFile'ı diske alır. Dönüş: (dosya_yolu, gecici_mi).
+    TemporaryUploadedFile zaten diskteyse (ve kopyala=False ise) kopyalanmaz;
+    diğer durumlarda dosya parça parça dizin altındaki yeni bir dosyaya yazılır.
+    İstek bittikten sonra da okunacak dosyalar (arka plan işleri) için
+    kopyala=True kullanılmalıdır. gecici_mi True ise dosyayı silmek çağıranın
+    sorumluluğundadır.
+    """
+    if hasattr(yuklenen_dosya, 'temporary_file_path') and not kopyala:
+        return yuklenen_dosya.temporary_file_path(), False
+    if dizin: os.makedirs(dizin, exist_ok=True)
+    with tempfile.NamedTemporaryFile(delete=False, suffix=dosya_uzantisi(yuklenen_dosya.name), dir=dizin) as hedef:
+        for parca in yuklenen_dosya.chunks():
+            hedef.write(parca)
+    return hedef.name, True
+
+
+def _yedek_kodlama(ornek):
+    for kodlama in YEDEK_KODLAMALAR[:-1]:
+        try:
+            ornek.decode(kodlama); return kodlama
+        except UnicodeDecodeError:
+            continue
+    return YEDEK_KODLAMALAR[-1]
+
+
+def csv_ozelliklerini_tespit_et(dosya_yolu):
+    """CSV örneğinden (kodlama, ayraç) tespit eder."""
+    with open(dosya_yolu, 'rb') as f:
+        ornek = f.read(ORNEK_BOYUTU)
+
+    if ornek.startswith(b'\xef\xbb\xbf'):
+        kodlama = 'utf-8-sig'
+    else:
+        kodlama = 'utf-8'
+        try:
+            ornek.decode('utf-8')
+        except UnicodeDecodeError as e:
+            # Örneğin sonunda yarım kalmış çok baytlı karakter hata sayılmaz
+            if e.reason != 'unexpected end of data': kodlama = _yedek_kodlama(ornek)
+    metin = ornek.decode(kodlama, errors='ignore')
+
+    try:
+        ayrac = csv.Sniffer().sniff(metin, delimiters=';,\t|').delimiter
+    except csv.Error:
+        ayrac = ','
+    return kodlama, ayrac
+
+
+def _hucre_metni(deger):
+    """openpyxl hücre değerini pd.read_excel(dtype=str) ile aynı şekilde metne çevirir."""
+    if deger is None: return ''
+    if isinstance(deger, float) and deger.is_integer(): return str(int(deger))
+    return str(deger)
+
+
+def _xlsx_parcasi(tampon, basliklar, satir_nolari):
+    return pd.DataFrame(tampon, columns=basliklar, dtype=str, index=pd.Index(satir_nolari, name='satir'))
+
+
+def _xlsx_parcalari(dosya_yolu, chunk_boyutu):
+    from openpyxl import load_workbook
+    wb = load_workbook(dosya_yolu, read_only=True, data_only=True)
+    try:
+        satirlar = wb.worksheets[0].iter_rows(values_only=True)
+        baslik = next(satirlar, None)
+        if baslik is None: return
+        basliklar = [_hucre_metni(b).strip() for b in baslik]
+        tampon, satir_nolari = [], []
+        for satir_no, satir in enumerate(satirlar, start=2):
+            if not any(h is not None and h != '' for h in satir): continue  # tamamen boş satırlar
+            degerler = [_hucre_metni(h) for h in satir[:len(basliklar)]]
+            degerler += [''] * (len(basliklar) - len(degerler))
+            tampon.append(degerler); satir_nolari.append(satir_no)
+            if len(tampon) >= chunk_boyutu:
+                yield _xlsx_parcasi(tampon, basliklar, satir_nolari); tampon, satir_nolari = [], []
+        if tampon: yield _xlsx_parcasi(tampon, basliklar, satir_nolari)
+    finally:
+        wb.close()
+
+
+def stok_parcalari_oku(dosya_yolu, uzanti=None, chunk_boyutu=SATIR_PARCA_BOYUTU):
+    """
+    Stok dosyasını sabit boyutlu DataFrame parçaları halinde döndüren generator.
+    uzanti verilmezse dosya adından alınır.
+    """
+    uzanti = uzanti or dosya_uzantisi(dosya_yolu)
+    if uzanti == '.csv':
+        kodlama, ayrac = csv_ozelliklerini_tespit_et(dosya_yolu)
+        okuyucu = pd.read_csv(
+            dosya_yolu, sep=ayrac, encoding=kodlama, engine='c', dtype=str,
+            keep_default_na=False, chunksize=chunk_boyutu,
+        )
+        with okuyucu:
+            for parca in okuyucu:
+                parca.columns = parca.columns.str.strip()
+                yield parca
+    elif uzanti == '.xlsx':
+        yield from _xlsx_parcalari(dosya_yolu, chunk_boyutu)
+    elif uzanti == '.xls':
+        df = pd.read_excel(dosya_yolu, engine='xlrd', dtype=str, keep_default_na=False)
+        df.columns = df.columns.str.strip()
+        for i in range(0, len(df), chunk_boyutu):
+            yield df.iloc[i:i + chunk_boyutu].reset_index(drop=True)
+    else:
+        raise ValueError(f"Desteklenmeyen dosya formatı: {uzanti}")
@@ -1,3 +1,789 @@
-from django.test import TestCase
+import gzip
+import json
+import os
+import tempfile
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import pandas as pd
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from .arama_indeksi import AramaIndeksi, _db_ile_coz, arama_indeksi, aktif_katalog_anahtari
+from .olay_yolu import SurecIciOlayYolu
+from .models import KatalogVersiyon, Malzeme, OcrIsi, SayimDetay, SayimEmri, SayimRaporSatiri, SayimToplam, StokYuklemeIsi, generate_unique_id, standardize_id_part
+from .stok_import import excel_sutunlarini_hazirla, generate_unique_id_series, parcalari_dogrula, parcalari_yukle, standardize_series, stok_df_hazirla, temiz_df_kayitlari, toplu_malzeme_yaz
+from .katalog import sayilan_stoklari_yaz, yeni_versiyon_hazirla
+from .konum import konum_ozeti
+from .performans import personel_performansi, saatlik_hiz
+from .rapor import RAPOR_SIRALAMALARI, grup_ozeti, grup_ozeti_hesapla
+from .stok_okuyucu import csv_ozelliklerini_tespit_et, stok_parcalari_oku
+from .toplamlar import sayilan_miktarlar, toplam_farklari
+from .toplu_sayim import sayim_satirlarini_kaydet
+
+# Skaler ve vektörel standartlaştırmanın karşılaştırılacağı karışık değerler
+ORNEK_DEGERLER = [
+    'abc', '  abc  ', 'ABC', 'ışık', 'çiğ-01', '', '   ', 'nan', 'NaN', 'None', 'null', 'NA', 'na', 'YOK', 'yok',
+    None, float('nan'), 12, 12.0, 0.5, -3, '0012', 'a_b', '\tx\n', 'N/A',
+]
+
+
+class StandartlastirmaDenklikTest(SimpleTestCase):
+    def test_standardize_series_skaler_ile_ayni(self):
+        seri = pd.Series(ORNEK_DEGERLER, dtype=object)
+        beklenen = [standardize_id_part(v) for v in ORNEK_DEGERLER]
+        self.assertEqual(standardize_series(seri).tolist(), beklenen)
+
+    def test_generate_unique_id_series_skaler_ile_ayni(self):
+        n = len(ORNEK_DEGERLER)
+        kodlar = pd.Series(ORNEK_DEGERLER, dtype=object)
+        partiler = pd.Series(ORNEK_DEGERLER[3:] + ORNEK_DEGERLER[:3], dtype=object)
+        depolar = pd.Series(ORNEK_DEGERLER[7:] + ORNEK_DEGERLER[:7], dtype=object)
+        renkler = pd.Series(ORNEK_DEGERLER[::-1], dtype=object)
+        beklenen = [generate_unique_id(kodlar[i], partiler[i], depolar[i], renkler[i]) for i in range(n)]
+        self.assertEqual(generate_unique_id_series(kodlar, partiler, depolar, renkler).tolist(), beklenen)
+
+    def test_stok_df_hazirla_benzersiz_id_skaler_ile_ayni(self):
+        df = pd.DataFrame({
+            'malzeme_kodu': ['a1', ' b2 ', 'c3', 'ç4'],
+            'parti_no': ['p1', '', 'nan', 'P-9'],
+            'lokasyon_kodu': ['d1', 'd1', '', 'depo 2'],
+            'renk': ['kırmızı', '', 'None', 'mavi'],
+            'sistem_stogu': ['1', '2,5', '', '4'],
+            'birim_fiyat': ['10', '0,75', '1', ''],
+        })
+        temiz, hatalar = stok_df_hazirla(df)
+        self.assertTrue(hatalar.empty)
+        # Boş hücreler varsayılanlarla doldurulduktan sonra skaler fonksiyonla üretilen ID
+        beklenen = [
+            generate_unique_id('a1', 'p1', 'd1', 'kırmızı'), generate_unique_id('b2', 'YOK', 'd1', 'YOK'),
+            generate_unique_id('c3', 'nan', 'MERKEZ', 'None'), generate_unique_id('ç4', 'P-9', 'depo 2', 'mavi'),
+        ]
+        self.assertEqual(temiz['benzersiz_id'].tolist(), beklenen)
+        self.assertEqual(temiz['sistem_stogu'].tolist(), ['1', '2.5', '0.0', '4'])
+
+    def test_stok_df_hazirla_hata_tablosu(self):
+        df = pd.DataFrame({
+            'malzeme_kodu': ['a1', '', 'a1', 'b1', 'c1'],
+            'lokasyon_kodu': ['d1', 'd1', 'd1', 'YOK', 'd1'],
+            'sistem_stogu': ['1', '1', '2', '1', 'abc'],
+            'birim_fiyat': ['1', '1', '1', '1', '1'],
+        })
+        temiz, hatalar = stok_df_hazirla(df)
+        self.assertEqual(temiz['satir'].tolist(), [4])
+        self.assertEqual(hatalar['satir'].tolist(), [2, 3, 5, 6])
+        self.assertEqual(hatalar['kritik'].tolist(), [False, True, True, True])
+
+
+class StokOkuyucuTest(SimpleTestCase):
+    def _dosya(self, veri):
+        with tempfile.NamedTemporaryFile('wb', suffix='.csv', delete=False) as f: f.write(veri)
+        self.addCleanup(os.remove, f.name)
+        return f.name
+
+    def test_cp1254_ve_noktali_virgul_tespit_edilir(self):
+        icerik = "Stok Kodu;Stok Adı;Miktar\n" + "".join(f"K{i};Şişe ığdır’ çay €;{i},5\n" for i in range(50))
+        yol = self._dosya(icerik.encode('cp1254'))
+        self.assertEqual(csv_ozelliklerini_tespit_et(yol), ('cp1254', ';'))
+        parcalar = list(stok_parcalari_oku(yol, chunk_boyutu=20))
+        self.assertEqual([len(p) for p in parcalar], [20, 20, 10])
+        self.assertEqual(parcalar[2].iloc[-1].tolist(), ['K49', 'Şişe ığdır’ çay €', '49,5'])
+
+    def test_ornek_ve_parca_siniri_cok_satirli_hucrenin_icine_duser(self):
+        icerik = 'Stok Kodu,Stok Adı,Miktar\nK1,"satır bir\nsatır iki",1\nK2,"a\nb\nc",2\nK3,düz,3\n'.encode('utf-8')
+        yol = self._dosya(icerik)
+        # Örnek, tırnaklı çok satırlı hücrenin içinde ve 'ı'nın iki baytının arasında biter
+        with mock.patch('sayim.stok_okuyucu.ORNEK_BOYUTU', icerik.index('ır iki'.encode('utf-8')) + 1):
+            self.assertEqual(csv_ozelliklerini_tespit_et(yol), ('utf-8', ','))
+            parcalar = list(stok_parcalari_oku(yol, chunk_boyutu=1))
+        self.assertEqual([p.to_dict('records') for p in parcalar], [
+            [{'Stok Kodu': 'K1', 'Stok Adı': 'satır bir\nsatır iki', 'Miktar': '1'}],
+            [{'Stok Kodu': 'K2', 'Stok Adı': 'a\nb\nc', 'Miktar': '2'}],
+            [{'Stok Kodu': 'K3', 'Stok Adı': 'düz', 'Miktar': '3'}],
+        ])
+
+    def test_xlsx_hata_satiri_bos_satirlar_atlansa_da_sayfadaki_satirdir(self):
+        from openpyxl import Workbook
+        wb = Workbook()
+        for satir in (["Stok Kodu", "Depo Kodu", "Miktar", "Maliyet birim", "seri_no"], ['a', 'd', '1', '1', ''], [], [None, ''], ['b', 'd', 'abc', '1', '']):
+            wb.active.append(satir)
+        with tempfile.NamedTemporaryFile(suffix='.xlsx', delete=False) as f: wb.save(f.name)
+        self.addCleanup(os.remove, f.name)
+        parcalar = list(stok_parcalari_oku(f.name, chunk_boyutu=1))
+        self.assertEqual([p.index.tolist() for p in parcalar], [[2], [5]])
+        self.assertEqual(parcalari_dogrula(parcalar, sutun_hazirla=excel_sutunlarini_hazirla)[1], 'Satır 5: Veri hatası - "Geçersiz sayı (sistem_stogu).". Değer="abc".')
+
+
+class TopluMalzemeYazTest(TestCase):
+    def test_yeni_ve_guncellenen_sayilari(self):
+        df = pd.DataFrame({'malzeme_kodu': ['a', 'b'], 'lokasyon_kodu': ['d', 'd'], 'sistem_stogu': ['2', '3'], 'birim_fiyat': ['1,5', '2']})
+        temiz, _ = stok_df_hazirla(df)
+        self.assertEqual(toplu_malzeme_yaz(temiz_df_kayitlari(temiz)), (2, 0, 0, 0))
+        self.assertEqual(toplu_malzeme_yaz(temiz_df_kayitlari(temiz)), (0, 2, 0, 0))
+        malzeme = Malzeme.objects.get(benzersiz_id='A_YOK_D_YOK')
+        self.assertEqual(malzeme.sistem_tutari, Decimal('3.0'))
+
+    def test_fark_yukleme_sadece_degisenleri_yazar(self):
+        ilk = pd.DataFrame({'malzeme_kodu': ['a', 'b', 'c'], 'lokasyon_kodu': ['d'] * 3, 'sistem_stogu': ['1', '2', '3'], 'birim_fiyat': ['1'] * 3})
+        ozet = parcalari_yukle([ilk])
+        self.assertEqual((ozet['yeni'], ozet['guncellenen']), (3, 0))
+
+        ikinci = pd.DataFrame({'malzeme_kodu': ['a', 'b', 'e'], 'lokasyon_kodu': ['d'] * 3, 'sistem_stogu': ['1', '5', '1'], 'birim_fiyat': ['1'] * 3})
+        ozet = parcalari_yukle([ikinci], sadece_degisenler=True, eksikleri_isaretle=True)
+        self.assertEqual({k: ozet[k] for k in ('yeni', 'guncellenen', 'degismeyen', 'eksik')},
+                         {'yeni': 1, 'guncellenen': 1, 'degismeyen': 1, 'eksik': 1})
+        self.assertTrue(Malzeme.objects.get(benzersiz_id='C_YOK_D_YOK').kaynakta_yok)
+        self.assertEqual(Malzeme.objects.get(benzersiz_id='B_YOK_D_YOK').sistem_stogu, Decimal('5'))
+
+        # Aynı sayıların farklı yazımı (10 / 10.0, 1,5 / 1.5 / 1.500000) değişiklik sayılmaz
+        ucuncu = pd.DataFrame({'malzeme_kodu': ['a', 'b', 'e'], 'lokasyon_kodu': ['d'] * 3, 'sistem_stogu': ['1.0', '5,00', '1e0'], 'birim_fiyat': ['1,000000', '1', '1.']})
+        ozet = parcalari_yukle([ucuncu], sadece_degisenler=True)
+        self.assertEqual((ozet['guncellenen'], ozet['degismeyen']), (0, 3))
+
+    def test_load_stok_bos_depo_ve_grubu_web_yuklemesi_gibi_doldurmaz(self):
+        # Web yüklemesi: boş depo MERKEZ, boş grup GENEL
+        parcalari_yukle([pd.DataFrame({'malzeme_kodu': ['w'], 'lokasyon_kodu': [''], 'stok_grup': [''], 'malzeme_adi': ['']})])
+        web = Malzeme.objects.get(benzersiz_id='W_YOK_MERKEZ_YOK')
+        self.assertEqual((web.stok_grup, web.malzeme_adi), ('GENEL', 'Stok W'))
+        # load_stok: boş depo 'YOK' olarak yüklenir, grup / ad boş kalır; sadece stok kodu boş satır atlanır
+        with tempfile.TemporaryDirectory() as dizin:
+            yol = os.path.join(dizin, 'stok.csv')
+            with open(yol, 'w', encoding='utf-8') as f:
+                f.write(';'.join(f's{i}' for i in range(14)) + '\n')
+                f.write(';p;;;a;;;2;;1,5;;;;\n;p;d;;;;;1;;1;;;;\n')
+            call_command('load_stok', yol, stdout=StringIO(), stderr=StringIO())
+        malzeme = Malzeme.objects.aktif().get(malzeme_kodu='A')
+        self.assertEqual((malzeme.benzersiz_id, malzeme.stok_grup, malzeme.malzeme_adi, malzeme.sistem_tutari), ('A_P_YOK_YOK', '', '', Decimal('3')))
+        self.assertEqual(sorted(Malzeme.objects.aktif().values_list('malzeme_kodu', flat=True)), ['A', 'W'])
+
+
+@override_settings(SAYIM_IS_YURUTUCU='senkron')
+class StokYuklemeIsiTest(TestCase):
+    def _yukle(self, icerik):
+        dosya = SimpleUploadedFile('stok.csv', icerik.encode('utf-8'))
+        with self.captureOnCommitCallbacks(execute=True):
+            cevap = self.client.post(reverse('upload_stok_excel'), {'excel_file': dosya})
+        self.assertEqual(cevap.status_code, 202)
+        return self.client.get(cevap.json()['durum_url']).json()
+
+    def test_yukleme_arka_plan_isi_olarak_tamamlanir(self):
+        durum = self._yukle("Stok Kodu;Depo Kodu;Miktar;Maliyet birim;seri_no\na;d;1;2;s1\nb;d;3,5;1;\n")
+        self.assertEqual((durum['durum'], durum['toplam_satir'], durum['yazilan_satir']), ('Tamamlandı', 2, 2))
+        self.assertEqual(durum['ozet']['yeni'], 2)
+        self.assertEqual(Malzeme.objects.get(benzersiz_id='B_YOK_D_YOK').sistem_tutari, Decimal('3.5'))
+
+    def test_kritik_hatada_hicbir_satir_yazilmaz(self):
+        durum = self._yukle("Stok Kodu;Depo Kodu;Miktar;Maliyet birim;seri_no\na;d;1;2;\nb;d;abc;1;\n")
+        self.assertEqual(durum['durum'], 'Hata')
+        self.assertIn('Satır 3', durum['message'])
+        self.assertFalse(Malzeme.objects.exists())
+        self.assertFalse(StokYuklemeIsi.objects.filter(durum='Tamamlandı').exists())
+
+    def test_yukleme_yeni_katalog_surumune_yazilir_ve_geri_alinabilir(self):
+        baslik = "Stok Kodu;Depo Kodu;Miktar;Maliyet birim;seri_no\n"
+        parcalari_yukle([pd.DataFrame({'malzeme_kodu': ['a'], 'lokasyon_kodu': ['d'], 'sistem_stogu': ['1'], 'birim_fiyat': ['1']})])
+        ilk = Malzeme.objects.aktif().get(benzersiz_id='A_YOK_D_YOK')
+        emir = SayimEmri.objects.create(ad='Test')
+        SayimDetay.objects.create(sayim_emri=emir, benzersiz_malzeme=ilk, sayilan_stok=Decimal('1'), personel_adi='X')
+
+        self._yukle(baslik + "a;d;5;1;\n")
+        self.assertEqual(Malzeme.objects.aktif().get(benzersiz_id='A_YOK_D_YOK').sistem_stogu, Decimal('5'))
+        self.assertEqual(KatalogVersiyon.objects.get(pk=ilk.versiyon_id).durum, 'Arşiv')
+
+        cevap = self.client.post(reverse('katalog_geri_al')).json()
+        self.assertTrue(cevap['success'])
+        self.assertEqual(Malzeme.objects.aktif().get(benzersiz_id='A_YOK_D_YOK').pk, ilk.pk)
+
+        # Arşiv sınırını aşan eski sürümlerden sadece sayımda kullanılmayan satırlar silinir
+        self._yukle(baslik + "a;d;7;1;\nb;d;1;1;\n")
+        self._yukle(baslik + "a;d;8;1;\n")
+        self.assertEqual(KatalogVersiyon.objects.get(pk=ilk.versiyon_id).durum, 'Temizlendi')
+        self.assertTrue(Malzeme.objects.filter(pk=ilk.pk).exists())
+        self.assertEqual(Malzeme.objects.filter(versiyon__durum__in=['Aktif', 'Arşiv']).count(), 4)
+        self.assertEqual(Malzeme.objects.aktif().count(), 2)
+
+    def test_sureci_olmus_yukleme_kapatilir_ve_surumu_iptal_edilir(self):
+        parcalari_yukle([pd.DataFrame({'malzeme_kodu': ['a'], 'lokasyon_kodu': ['d'], 'sistem_stogu': ['1'], 'birim_fiyat': ['1']})])
+        eski = timezone.now() - timedelta(hours=1)
+        isi = StokYuklemeIsi.objects.create(dosya_adi='x.csv', dosya_yolu='/yok/x.csv', durum='Çalışıyor', son_ilerleme_tarihi=eski)
+        versiyon = yeni_versiyon_hazirla(yukleme_isi=isi)
+
+        durum = self.client.get(reverse('stok_yukleme_durum', kwargs={'is_id': isi.pk})).json()
+        self.assertEqual((durum['durum'], durum['bitti']), ('Hata', True))
+        self.assertEqual(KatalogVersiyon.objects.get(pk=versiyon.pk).durum, 'Temizlendi')
+
+        # Yetim sürüm kalmadığı için yeni yükleme normal tamamlanır
+        self.assertEqual(self._yukle("Stok Kodu;Depo Kodu;Miktar;Maliyet birim;seri_no\na;d;4;1;\n")['durum'], 'Tamamlandı')
+
+
+class AramaIndeksiTest(TestCase):
+    def setUp(self):
+        arama_indeksi.temizle()
+        parcalari_yukle([pd.DataFrame({
+            'malzeme_kodu': ['K1', 'K1', 'K1', 'K2', 'K3', 'K1'],
+            'parti_no': ['P1', 'P2', 'P2', '', 'P1', 'P1'],
+            'renk': ['R1', 'R1', 'R2', '', '', 'R1'],
+            'lokasyon_kodu': ['D1', 'D1', 'D1', 'D1', 'D1', 'D2'],
+            'seri_no': ['S1', '', '', 'S2', 'K2', ''],
+            'sistem_stogu': ['1', '2', '3', '4', '5', '6'], 'birim_fiyat': ['1'] * 6,
+        })])
+
+    def test_indeks_veritabani_ile_ayni_sonucu_verir(self):
+        aramalar = [
+            ('S1', 'YOK', 'YOK', 'YOK'), ('K2', 'YOK', 'YOK', 'YOK'), ('K1_P2_D1_R2', 'YOK', 'YOK', 'YOK'),
+            ('YOK', 'K1', 'P2', 'YOK'), ('YOK', 'YOK', 'P1', 'YOK'), ('YOK', 'K1', 'P9', 'R1'),
+            ('YOK', 'K3', 'YOK', 'YOK'), ('YOK', 'K9', 'YOK', 'YOK'), ('X', 'YOK', 'YOK', 'YOK'),
+        ]
+        for arama in aramalar:
+            with self.subTest(arama=arama):
+                indeks = arama_indeksi.depo(aktif_katalog_anahtari(), 'D1')
+                self.assertEqual(indeks.coz(*arama), _db_ile_coz(aktif_katalog_anahtari()[0], 'D1', *arama))
+
+    def test_depo_kurulumu_diger_depolari_bekletmez_ve_tek_sefer_yapilir(self):
+        indeks, basladi, birak, kurulanlar = AramaIndeksi(), threading.Event(), threading.Event(), []
+        def kur(anahtar, depo_kod):
+            kurulanlar.append(depo_kod)
+            if depo_kod == 'YAVAS': basladi.set(); birak.wait(5)
+            return depo_kod
+        with mock.patch.object(indeks, '_depo_kur', side_effect=kur):
+            yavaslar = [threading.Thread(target=indeks.depo, args=((1, 0), 'YAVAS')) for _ in range(2)]
+            for t in yavaslar: t.start()
+            self.assertTrue(basladi.wait(5))
+            self.assertEqual(indeks.depo((1, 0), 'HIZLI'), 'HIZLI')  # YAVAS kurulurken beklemeden döner
+            birak.set()
+            for t in yavaslar: t.join(5)
+        self.assertEqual(sorted(kurulanlar), ['HIZLI', 'YAVAS'])
+
+    def test_arama_sorgusuz_cozer_ve_degisiklikte_yenilenir(self):
+        url = reverse('ajax_akilli_stok_ara')
+        self.assertTrue(self.client.get(url, {'seri_no': 's2', 'depo_kod': 'd1'}).json()['found'])
+        with self.assertNumQueries(2):  # katalog anahtarı + son sayım bilgisi
+            cevap = self.client.get(url, {'seri_no': 's2', 'depo_kod': 'd1'}).json()
+        self.assertEqual(cevap['sistem_stok'], '4.00')
+        self.assertEqual(self.client.get(url, {'stok_kod': 'K1', 'depo_kod': 'D1'}).json()['parti_varyantlar'], ['P1', 'P2'])
+        self.assertIn('D2', self.client.get(url, {'seri_no': 'S1', 'depo_kod': 'D1'}).json()['farkli_depo_uyarisi'])
+
+        parcalari_yukle([pd.DataFrame({'malzeme_kodu': ['K2'], 'lokasyon_kodu': ['D1'], 'seri_no': ['S2'], 'sistem_stogu': ['9'], 'birim_fiyat': ['1']})])
+        self.assertEqual(self.client.get(url, {'seri_no': 'S2', 'depo_kod': 'D1'}).json()['sistem_stok'], '9.00')
+        self.assertGreater(arama_indeksi.istatistik()['bayt'], 0)
+
+    def test_barkod_ve_alternatif_kodlar_tek_tablodan_cozulur(self):
+        parcalari_yukle([pd.DataFrame({
+            'malzeme_kodu': ['K5', 'K6', 'K7'], 'lokasyon_kodu': ['D1'] * 3, 'seri_no': ['S5', 'S6', 'S7'],
+            'barkod': ['869001', 'ORTAK', 'ORTAK'], 'alternatif_kodlar': ['ESKI-5|eski5b', '', ''],
+            'sistem_stogu': ['1'] * 3, 'birim_fiyat': ['1'] * 3,
+        })])
+        anahtar = aktif_katalog_anahtari()
+        for kod, beklenen in [('869001', 'K5'), ('ESKI5B', 'K5'), ('S6', 'K6')]:
+            with self.subTest(kod=kod):
+                self.assertEqual(arama_indeksi.depo(anahtar, 'D1').coz(kod, 'YOK', 'YOK', 'YOK').malzeme.malzeme_kodu, beklenen)
+                self.assertEqual(_db_ile_coz(anahtar[0], 'D1', kod, 'YOK', 'YOK', 'YOK').malzeme.malzeme_kodu, beklenen)
+        cevap = self.client.get(reverse('ajax_akilli_stok_ara'), {'seri_no': 'ortak', 'depo_kod': 'D1'}).json()
+        self.assertFalse(cevap['found'])
+        self.assertEqual(len(cevap['adaylar']), 2)
+
+
+class RaporTest(TestCase):
+    def setUp(self):
+        arama_indeksi.temizle()
+        parcalari_yukle([pd.DataFrame({
+            'malzeme_kodu': ['A', 'A', 'B', 'C', 'D', 'E', 'F'], 'parti_no': ['P1', 'P2', '', '', '', '', ''],
+            'lokasyon_kodu': ['D1', 'D1', 'D1', 'D2', 'D2', 'D1', 'D2'], 'stok_grup': ['G1', 'G1', 'G2', 'G1', 'G2', 'G2', 'G1'],
+            'sistem_stogu': ['5', '2', '0', '3', '1', '4', '2.5'], 'birim_fiyat': ['10', '1', '2', '1', '3', '0.5', '4'],
+        })])
+        self.emir = SayimEmri.objects.create(ad='Rapor')
+        url = reverse('ajax_sayim_kaydet_toplu', args=[self.emir.pk])
+        satirlar = [{'benzersiz_id': b, 'miktar': m} for b, m in [('A_P1_D1_YOK', '5'), ('A_P2_D1_YOK', '3'), ('B_YOK_D1_YOK', '2'), ('D_YOK_D2_YOK', '1'), ('F_YOK_D2_YOK', '1.25')]]
+        self.client.post(url, json.dumps({'satirlar': satirlar}), content_type='application/json')
+
+    def _sayfalar(self, **params):
+        satirlar, sonraki = [], None
+        while True:
+            cevap = self.client.get(reverse('ajax_rapor', args=[self.emir.pk]), {**params, 'limit': 2, **({'sonraki': sonraki} if sonraki else {})}).json()
+            satirlar += cevap['satirlar']
+            sonraki = cevap['sonraki']
+            if not sonraki: return satirlar
+
+    def test_etiketler_ve_anahtar_kumesi_sayfalama(self):
+        tum = self.client.get(reverse('ajax_rapor', args=[self.emir.pk]), {'limit': 100}).json()
+        etiketler = {(r['kod'], r['parti']): r['tag'] for r in tum['satirlar']}
+        self.assertEqual(etiketler, {
+            ('A', 'P1'): 'tamam', ('A', 'P2'): 'fark_var', ('B', 'YOK'): 'yeni_sayildi', ('C', 'YOK'): 'hic_sayilmadi',
+            ('D', 'YOK'): 'tamam', ('E', 'YOK'): 'hic_sayilmadi', ('F', 'YOK'): 'fark_var',
+        })
+        self.assertEqual(tum['ozet'], {'toplam': 7, 'fark_var': 2, 'yeni_sayildi': 1, 'hic_sayilmadi': 2, 'tamam': 2})
+        f = next(r for r in tum['satirlar'] if r['kod'] == 'F')
+        self.assertEqual((f['mik_fark'], f['tutar_fark'], f['mik_yuzde']), ('-1.25', '-5.00', '-50.00%'))
+        # Eski rapor sırası: farklar/yeniler, sonra sayılmayanlar, sonra tamamlar (her grupta depo/kod azalan)
+        self.assertEqual([r['kod'] for r in tum['satirlar']], ['F', 'B', 'A', 'C', 'E', 'D', 'A'])
+
+        for siralama in ('oncelik', 'kod', 'depo', 'tutar_fark', 'mik_fark'):
+            with self.subTest(siralama=siralama):
+                tek = self.client.get(reverse('ajax_rapor', args=[self.emir.pk]), {'sirala': siralama, 'limit': 100}).json()['satirlar']
+                self.assertEqual(self._sayfalar(sirala=siralama), tek)
+        self.assertEqual([r['tutar_fark'] for r in self._sayfalar(sirala='tutar_fark')][:3], ['-5.00', '4.00', '-3.00'])
+        self.assertEqual([r['kod'] for r in self._sayfalar(depo='d2', tag='fark_var,tamam', sirala='kod')], ['D', 'F'])
+        self.assertEqual(len(self._sayfalar(grup='G2')), 3)
+        self.assertEqual(self.client.get(reverse('ajax_rapor', args=[self.emir.pk]), {'sirala': 'x'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('ajax_rapor', args=[self.emir.pk]), {'sonraki': 'bozuk'}).status_code, 400)
+
+    def test_grup_ozeti_tek_sorgu_ve_yeni_sayimda_yenilenen_onbellek(self):
+        cache.clear()
+        url = reverse('canli_fark_ozeti', args=[self.emir.pk])
+        self.client.get(url)
+        with self.assertNumQueries(2):  # önbellekten: emir + önbellek anahtarı (toplamlar), açılış stoğu taranmaz
+            self.client.get(url)
+        ozet = grup_ozeti(self.emir)
+        self.assertEqual(grup_ozeti_hesapla(self.emir), ozet)
+        self.assertEqual(ozet[0], {'grup': 'G1', 'sistem_mik': '12.50', 'sistem_tutar': '65.00', 'fazla_mik': '0.00', 'eksik_mik': '3.25',
+                                   'fazla_tutar': '0.00', 'eksik_tutar': '7.00'})
+        with self.assertNumQueries(1):
+            grup_ozeti_hesapla(self.emir)
+
+        self.client.post(reverse('ajax_sayim_kaydet', args=[self.emir.pk]), json.dumps({'benzersiz_id': 'C_YOK_D2_YOK', 'miktar': '3'}), content_type='application/json')
+        self.assertEqual(self.client.get(url).context['analiz_data'][0]['eksik_mik'], '0.25')
+
+    def test_sayim_sirasinda_stok_yuklemesi_farklari_degistirmez(self):
+        once = self.client.get(reverse('ajax_rapor', args=[self.emir.pk]), {'limit': 100}).json()['satirlar']
+        parcalari_yukle([pd.DataFrame({
+            'malzeme_kodu': ['A', 'A', 'B', 'C', 'D', 'E', 'F', 'G'], 'parti_no': ['P1', 'P2', '', '', '', '', '', ''],
+            'lokasyon_kodu': ['D1', 'D1', 'D1', 'D2', 'D2', 'D1', 'D2', 'D1'], 'stok_grup': ['G1', 'G1', 'G2', 'G1', 'G2', 'G2', 'G1', 'G2'],
+            'sistem_stogu': ['50', '2', '0', '3', '1', '4', '2.5', '7'], 'birim_fiyat': ['10', '1', '2', '1', '3', '0.5', '4', '2'],
+        })])
+        self.assertEqual(self.client.get(reverse('ajax_rapor', args=[self.emir.pk]), {'limit': 100}).json()['satirlar'], once)
+        # Açılıştan sonra kataloğa giren malzeme sayılınca açılışta sistemde yokmuş gibi eklenir
+        self.client.post(reverse('ajax_sayim_kaydet', args=[self.emir.pk]), json.dumps({'benzersiz_id': 'G_YOK_D1_YOK', 'miktar': '7'}), content_type='application/json')
+        g = self._sayfalar(depo='D1', tag='yeni_sayildi', sirala='kod')[-1]
+        self.assertEqual((g['kod'], g['sistem_mik'], g['sayilan_mik'], g['tutar_fark']), ('G', '0.00', '7.00', '14.00'))
+        self.assertEqual(SayimEmri.objects.create(ad='Yeni').acilis_stoklari.get(benzersiz_id='A_P1_D1_YOK').sistem_stogu, Decimal('50'))
+
+    def test_kapsamli_emir_sadece_kapsamdaki_malzemeleri_raporlar_ve_onaylar(self):
+        self.client.post(reverse('yeni_sayim_emri'), {'ad': 'D2', 'atanan_personel': '', 'depolar': ['D2']})
+        emir = SayimEmri.objects.latest('pk')
+        self.assertEqual(emir.kapsam, {'depolar': ['D2']})
+        kaydet = lambda ad, govde: self.client.post(reverse(ad, args=[emir.pk]), json.dumps(govde), content_type='application/json')
+        self.assertEqual(kaydet('ajax_sayim_kaydet', {'benzersiz_id': 'D_YOK_D2_YOK', 'miktar': '1'}).status_code, 200)
+        # Kapsam dışı malzeme (B, D1 deposunda) üç kayıt yolunda da reddedilir, sayılmaz
+        cevap = kaydet('ajax_sayim_kaydet', {'benzersiz_id': 'B_YOK_D1_YOK', 'miktar': '2'})
+        self.assertEqual((cevap.status_code, cevap.json()['kapsam_disi']), (422, True))
+        self.assertIn('kapsamı dışında', cevap.json()['message'])
+        self.assertEqual(kaydet('ajax_okut_ve_kaydet', {'stok_kod': 'B', 'depo_kod': 'D1'}).status_code, 422)
+        toplu = kaydet('ajax_sayim_kaydet_toplu', {'satirlar': [{'benzersiz_id': 'B_YOK_D1_YOK', 'miktar': '2'}, {'stok_kod': 'C', 'miktar': '1'}], 'depo_kod': 'D2'}).json()
+        self.assertEqual([(s['success'], s.get('kapsam_disi', False)) for s in toplu['sonuclar']], [(False, True), (True, False)])
+        self.assertFalse(SayimToplam.objects.filter(sayim_emri=emir, benzersiz_id='B_YOK_D1_YOK').exists())
+        cevap = self.client.get(reverse('ajax_rapor', args=[emir.pk]), {'sirala': 'kod'}).json()
+        self.assertEqual(([r['kod'] for r in cevap['satirlar']], cevap['ozet']['toplam']), (['C', 'D', 'F'], 3))
+        self.assertEqual([g['grup'] for g in grup_ozeti(emir)], ['G1', 'G2'])
+        self.assertEqual(self.client.get(reverse('depo_secim', args=[emir.pk])).context['lokasyonlar'], ['D2'])
+        self.client.post(reverse('stoklari_onayla', args=[emir.pk]))
+        self.assertEqual(Malzeme.objects.aktif().get(benzersiz_id='B_YOK_D1_YOK').sistem_stogu, Decimal('0'))
+
+        self.client.post(reverse('yeni_sayim_emri'), {'ad': 'Aralık', 'lokasyon_araliklari': 'd1:d1\n', 'gruplar': ['G2']})
+        self.assertEqual(set(SayimEmri.objects.latest('pk').acilis_stoklari.values_list('malzeme_kodu', flat=True)), {'B', 'E'})
+        cevap = self.client.post(reverse('yeni_sayim_emri'), {'ad': 'Hatalı', 'lokasyon_araliklari': 'D2:D1'})
+        self.assertIn('lokasyon_araliklari', cevap.context['form'].errors)
+
+    def test_onaylanan_emrin_raporu_dondurulmus_kopyadan_okunur(self):
+        cache.clear()
+        acik = {s: self.client.get(reverse('ajax_rapor', args=[self.emir.pk]), {'sirala': s, 'limit': 100}).json() for s in RAPOR_SIRALAMALARI}
+        ozet = grup_ozeti(self.emir)
+        self.client.post(reverse('stoklari_onayla', args=[self.emir.pk]))
+        self.emir.refresh_from_db()
+        self.assertEqual(self.emir.durum, 'Tamamlandı')
+        self.assertEqual(Malzeme.objects.aktif().get(benzersiz_id='F_YOK_D2_YOK').sistem_stogu, Decimal('1.25'))
+        # Stoklar güncellendi ama rapor onaydaki farkları göstermeye devam eder
+        self.assertEqual(SayimRaporSatiri.objects.filter(sayim_emri=self.emir).count(), 7)
+        for siralama, beklenen in acik.items():
+            with self.subTest(siralama=siralama):
+                self.assertEqual(self.client.get(reverse('ajax_rapor', args=[self.emir.pk]), {'sirala': siralama, 'limit': 100}).json(), beklenen)
+                self.assertEqual(self._sayfalar(sirala=siralama), beklenen['satirlar'])
+        self.assertEqual([r['kod'] for r in self._sayfalar(depo='d2', tag='fark_var,tamam', sirala='kod')], ['D', 'F'])
+        with self.assertNumQueries(1):  # sadece emir; özet onayda yazıldı
+            self.assertEqual(self.client.get(reverse('canli_fark_ozeti', args=[self.emir.pk])).context['analiz_data'], ozet)
+
+    def test_olay_akisi_durum_sonra_sayimla_gelen_fark(self):
+        cache.clear()
+        cevap = self.client.get(reverse('sayim_olay_akisi', args=[self.emir.pk]))
+        self.assertEqual(cevap['Content-Type'], 'text/event-stream')
+        akis = iter(cevap.streaming_content)
+        mesaj = lambda: next(akis).decode()
+        self.assertEqual(mesaj(), 'retry: 3000\n\n')
+        durum = mesaj()
+        self.assertIn('event: durum', durum)
+        durum = json.loads(durum.split('data: ', 1)[1])
+        self.assertEqual((durum['kalem'], durum['kayit'], durum['gruplar'][0]['eksik_mik']), (5, 5, '3.25'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('ajax_sayim_kaydet', args=[self.emir.pk]), json.dumps({'benzersiz_id': 'C_YOK_D2_YOK', 'miktar': '3', 'personel_adi': 'ali'}), content_type='application/json')
+        fark = mesaj()
+        self.assertIn('event: fark', fark)
+        fark = json.loads(fark.split('data: ', 1)[1])
+        self.assertEqual(fark['gruplar'], {'G1': {'mik_fark': '3.00000', 'tutar_fark': '3.00000'}})
+        self.assertEqual((fark['yeni_kalem'], fark['yeni_kayit'], fark['son_kayitlar'][0]['kod']), (1, 1, 'C'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('sayim_toplamlarini_kur', stdout=StringIO())
+        self.assertIn('event: durum', mesaj())  # toplamlar yeniden kurulunca tam durum yeniden gönderilir
+
+        # Açık akış sınırı doluysa yeni bağlantı thread tutmadan hemen kapanır; yer kapanınca boşalır
+        with mock.patch('sayim.canli_ozet.OLAY_AKISI_AZAMI_BAGLANTI', 1):
+            dolu = [p.decode() for p in self.client.get(reverse('sayim_olay_akisi', args=[self.emir.pk])).streaming_content]
+            self.assertEqual(dolu[0], 'retry: 30000\n\n')
+            self.assertIn('event: dolu', dolu[1])
+            cevap.close()
+            yeni = self.client.get(reverse('sayim_olay_akisi', args=[self.emir.pk]))
+            self.assertEqual(next(iter(yeni.streaming_content)), b'retry: 3000\n\n')
+            yeni.close()
+
+
+class PerformansTest(TestCase):
+    def test_pencere_fonksiyonlu_araliklar_eski_python_hesabiyla_ayni(self):
+        cache.clear()
+        parcalari_yukle([pd.DataFrame({'malzeme_kodu': ['K1'], 'lokasyon_kodu': ['D1'], 'sistem_stogu': ['1']})])
+        emir, malzeme = SayimEmri.objects.create(ad='Performans'), Malzeme.objects.get()
+        baslangic = timezone.now().replace(minute=0, second=0, microsecond=0)
+        saniyeler = {
+            'ali': [0, 12.5, 12.5, 30.000001, 3630.000001, 7230.000001, 7300],  # 0 sn ve tam 1 saat aralıkları atılır
+            'veli': [5, 4000],  # geçerli aralık yok
+            'ayse': [100],  # tek kayıt
+            'can': [0, 10, 40, 100, 200],  # çift sayıda aralık: medyan ortadaki ikisinin ortalaması
+        }
+        for personel, liste in saniyeler.items():
+            for sn in liste:
+                detay = SayimDetay.objects.create(sayim_emri=emir, benzersiz_malzeme=malzeme, personel_adi=personel, sayilan_stok=1)
+                SayimDetay.objects.filter(pk=detay.pk).update(guncellenme_tarihi=baslangic + timezone.timedelta(seconds=sn))
+
+        sonuc = {p['personel']: p for p in personel_performansi(emir.pk)}
+        for personel, liste in saniyeler.items():
+            farklar = sorted(f for f in (b - a for a, b in zip(liste, liste[1:])) if 0 < f < 3600)
+            with self.subTest(personel=personel):
+                p = sonuc[personel]
+                self.assertEqual((p['toplam_kayit'], p['aralik_sayisi']), (len(liste), len(farklar)))
+                self.assertAlmostEqual(p['toplam_sure_sn'], sum(farklar), places=5)
+                if farklar:
+                    self.assertAlmostEqual(p['ortalama_sure_sn'], sum(farklar) / len(farklar), places=5)
+                    orta = len(farklar) // 2
+                    self.assertAlmostEqual(p['medyan_sure_sn'], farklar[orta] if len(farklar) % 2 else (farklar[orta - 1] + farklar[orta]) / 2, places=5)
+                else:
+                    self.assertIsNone(p['ortalama_sure_sn'])
+        self.assertEqual(sonuc['can']['medyan_sure_sn'], 45.0)
+
+        self.assertEqual([adet for _, adet in saatlik_hiz(emir.pk)['ali']], [4, 1, 2])
+        cevap = self.client.get(reverse('analiz_performans', args=[emir.pk]))
+        analiz = {item['personel']: item for item in cevap.context['analiz_data']}
+        self.assertEqual([item['personel'] for item in cevap.context['analiz_data']][:2], ['ali', 'can'])  # ortalamaya göre, N/A'lar sonda
+        self.assertEqual((analiz['veli']['ortalama_sure_formatli'], analiz['ayse']['ortalama_sure_formatli']), ('Aykırı Veri (>1 Saat)', 'Yetersiz Kayıt (N=1)'))
+        self.assertEqual((analiz['can']['medyan_sure_sn'], len(cevap.context['saatlik_hiz'])), ('45.00 sn', 3))
+
+
+class KonumKumeleriTest(TestCase):
+    def setUp(self):
+        parcalari_yukle([pd.DataFrame({'malzeme_kodu': ['K1'], 'lokasyon_kodu': ['D1'], 'sistem_stogu': ['1']})])
+        self.emir = SayimEmri.objects.create(ad='Konum')
+        # İstanbul'da birbirine yakın iki nokta, Ankara'da bir nokta; konumsuz, okunamayan ve Türkiye dışı birer kayıt
+        satirlar = [('41,0082', '28.9784', 'ali'), ('41.0092', '28.9785', 'ali'), ('39.9334', '32.8597', 'veli'),
+                    ('YOK', 'YOK', 'ali'), ('abc', '28.1', 'ali'), ('48.85', '2.35', 'veli')]
+        sayim_satirlarini_kaydet(self.emir, [{'benzersiz_id': 'K1_YOK_D1_YOK', 'miktar': '1', 'lat': lat, 'lon': lon, 'personel_adi': p}
+                                             for lat, lon, p in satirlar[:3]])
+        for lat, lon, p in satirlar[3:]:
+            self.client.post(reverse('ajax_sayim_kaydet', args=[self.emir.pk]), json.dumps(
+                {'benzersiz_id': 'K1_YOK_D1_YOK', 'miktar': '2', 'lat': lat, 'lon': lon, 'personel_adi': p}), content_type='application/json')
+
+    def _kumeler(self, **params):
+        return self.client.get(reverse('ajax_konum_kumeleri', args=[self.emir.pk]), params).json()
+
+    def test_sayisal_koordinat_ve_yakinlastirmaya_gore_kumeler(self):
+        d = SayimDetay.objects.get(latitude='41,0082')
+        self.assertEqual((d.enlem, d.boylam, d.konum_hucresi), (41.0082, 28.9784, 'sxk973m6j'))
+        self.assertIsNone(SayimDetay.objects.get(latitude='abc').enlem)
+        self.assertEqual(konum_ozeti(self.emir), {'gecerli': 3, 'konumsuz': 1, 'gecersiz': 2, 'sinirlar': [39.9334, 28.9784, 41.0092, 32.8597]})
+
+        yakin = self._kumeler(zoom=18)
+        self.assertEqual((yakin['hassasiyet'], sorted(k['adet'] for k in yakin['kumeler'])), (8, [1, 1, 1]))
+        uzak = self._kumeler(zoom=6)
+        istanbul = next(k for k in uzak['kumeler'] if k['adet'] == 2)
+        self.assertEqual((uzak['hassasiyet'], istanbul['personel'], istanbul['stok']), (4, 'ALI', '2.00'))
+        self.assertAlmostEqual(istanbul['lat'], 41.0087)
+        # Görüş alanı sadece Ankara'yı kapsıyor
+        self.assertEqual([k['adet'] for k in self._kumeler(zoom=10, bbox='39,32,40,33')['kumeler']], [1])
+        with mock.patch('sayim.konum.KONUM_AZAMI_KUME', 1):
+            self.assertEqual(self._kumeler(zoom=18)['kumeler'][0]['adet'], 3)  # sınıra sığana kadar önek kısaltılır
+        self.assertEqual(self.client.get(reverse('ajax_konum_kumeleri', args=[self.emir.pk]), {'bbox': '1,2'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('analiz_konum', args=[self.emir.pk])).context['konum_almayan_kayitlar'], 3)
+
+
+class OlayYoluTest(SimpleTestCase):
+    def test_sira_ile_bekleme_ve_kacirilan_olaylar(self):
+        yol = SurecIciOlayYolu(tampon_boyutu=2)
+        self.assertEqual(yol.bekle('k', 0, 0.01), ([], False))
+        for i in range(3): yol.yayinla('k', {'no': i})
+        self.assertEqual(yol.bekle('k', 1, 0.01), ([(2, {'no': 1}), (3, {'no': 2})], False))
+        self.assertTrue(yol.bekle('k', 0, 0.01)[1])  # ilk olay tampondan düştü
+        self.assertEqual(yol.son_sira('diger'), 0)
+
+
+def _decimal_grup_ozeti(sayim_emri):
+    """Eski CanliFarkOzetiView döngüsünün Decimal hesabı (karşılaştırma için)."""
+    toplamlar, gruplar = sayilan_miktarlar(sayim_emri), {}
+    for m in Malzeme.objects.aktif().order_by('pk'):
+        sayilan, sistem, fiyat = toplamlar.get(m.benzersiz_id, Decimal('0.0')), m.sistem_stogu, m.birim_fiyat
+        g = gruplar.setdefault(m.stok_grup or 'TANIMSIZ', [Decimal('0.0')] * 4)
+        for k, d in enumerate((sistem, sistem * fiyat, sayilan, (sayilan - sistem) * fiyat)): g[k] += d
+    ozet = []
+    for grup, (sistem, sistem_tutar, sayilan, tutar_fark) in sorted(gruplar.items()):
+        fark = sayilan - sistem
+        ozet.append({
+            'grup': grup, 'sistem_mik': f"{sistem:.2f}", 'sistem_tutar': f"{sistem_tutar:.2f}",
+            'fazla_mik': f"{fark:.2f}" if fark > 0 else "0.00", 'eksik_mik': f"{-fark:.2f}" if fark < 0 else "0.00",
+            'fazla_tutar': f"{tutar_fark:.2f}" if tutar_fark > 0 else "0.00", 'eksik_tutar': f"{-tutar_fark:.2f}" if tutar_fark < 0 else "0.00",
+        })
+    return ozet
+
+
+class GrupOzetiKesinlikTest(TestCase):
+    def test_olcekli_toplamlar_decimal_ile_kurusuna_kadar_ayni(self):
+        # Yarım kuruşlar (çift/tek), negatif stok, negatif sıfır, sıfır fiyat ve 10^10 ölçekte int64'e sığmayan tutarlar
+        sistem = ['5', '2', '0', '3', '0.005', '0.015', '-2.5', '0.00001', '1.00003', '0', '123456789.12345', '7', '0.001']
+        fiyat = ['10', '1', '2', '0', '1', '1', '3', '0', '0.33333', '4', '99999.99999', '0.12345', '1']
+        sayilan = ['5', '3', '2', '0', '0', '0', '1.25', '0', '0.00001', '0.005', '98765432.1', '6.99999', '0']
+        n = len(sistem)
+        parcalari_yukle([pd.DataFrame({
+            'malzeme_kodu': [f"K{i}" for i in range(n)], 'lokasyon_kodu': ['D1'] * n, 'stok_grup': ['G1', 'G2', ''] * 4 + ['G1'],
+            'sistem_stogu': sistem, 'birim_fiyat': fiyat,
+        })])
+        emir = SayimEmri.objects.create(ad='Dizi')
+        for i, miktar in enumerate(sayilan):
+            if miktar != '0': SayimToplam.objects.create(sayim_emri=emir, benzersiz_id=f"K{i}_YOK_D1_YOK", toplam_miktar=Decimal(miktar), kayit_sayisi=1, son_sayim_tarihi=timezone.now())
+
+        beklenen_ozet = _decimal_grup_ozeti(emir)
+        self.assertEqual(grup_ozeti_hesapla(emir), beklenen_ozet)
+        self.assertEqual(self.client.get(reverse('canli_fark_ozeti', args=[emir.pk])).context['analiz_data'], beklenen_ozet)
+
+
+class DepoKataloguTest(TestCase):
+    def setUp(self):
+        arama_indeksi.temizle()
+        cache.clear()
+        parcalari_yukle([pd.DataFrame({
+            'malzeme_kodu': ['K1', 'K1', 'K2', 'K3'], 'parti_no': ['P1', 'P2', '', ''], 'lokasyon_kodu': ['D1', 'D1', 'D1', 'D2'],
+            'barkod': ['8690', '', '', ''], 'sistem_stogu': ['1', '2', '3', '4'], 'birim_fiyat': ['1'] * 4,
+        })])
+        self.url = reverse('ajax_depo_katalogu', args=['d1'])
+
+    def _govde(self, cevap):
+        return json.loads(gzip.decompress(cevap.content)) if cevap.get('Content-Encoding') == 'gzip' else json.loads(cevap.content)
+
+    def test_etag_304_ve_sadece_degisen_satirlarin_farki(self):
+        cevap = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(cevap['Content-Encoding'], 'gzip')
+        tam = self._govde(cevap)
+        self.assertEqual((tam['tip'], tam['depo'], len(tam['satirlar'])), ('tam', 'D1', 3))
+        kodlar = {s[1]: s[-1] for s in tam['satirlar']}
+        self.assertEqual(kodlar['K1_P1_D1_YOK'], [['8690', 2]])  # ID ve stok kodu satırdan türetilir
+        self.assertEqual(tam['diger_depolar'], {})
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=cevap['ETag']).status_code, 304)
+
+        # Elle düzeltme: tek satır değişir, eski sürümü bilen istemciye sadece o satır gider
+        malzeme = Malzeme.objects.aktif().get(benzersiz_id='K2_YOK_D1_YOK')
+        malzeme.sistem_stogu = Decimal('7')
+        malzeme.save()
+        malzeme.versiyon.revizyonu_artir()
+        cevap = self.client.get(self.url, {'since': tam['surum']}, HTTP_IF_NONE_MATCH=cevap['ETag'])
+        self.assertEqual(cevap.status_code, 200)
+        fark = self._govde(cevap)
+        self.assertEqual((fark['tip'], fark['taban'], fark['silinen']), ('fark', tam['surum'], []))
+        self.assertEqual([(s[1], s[7]) for s in fark['guncel']], [('K2_YOK_D1_YOK', '7.00')])
+        self.assertNotEqual(fark['surum'], tam['surum'])
+        self.assertEqual(self.client.get(reverse('ajax_depo_katalogu', args=['D9'])).status_code, 404)
+
+
+@skipUnless(connection.vendor == 'sqlite', "EXPLAIN QUERY PLAN çıktısı SQLite'a özgü")
+class MalzemeIndeksPlaniTest(TestCase):
+    """Sıcak arama sorgularının büyük bir katalogda tablo taraması yerine bileşik indeksleri kullandığını doğrular."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.versiyon = KatalogVersiyon.aktif_versiyon()
+        Malzeme.objects.bulk_create([
+            Malzeme(versiyon=cls.versiyon, malzeme_kodu=f'K{i % 2000}', parti_no=f'P{i % 7}', lokasyon_kodu=f'D{i % 40}',
+                    renk=f'R{i % 3}', seri_no=f'S{i}', malzeme_adi='x', olcu_birimi='ADET',
+                    benzersiz_id=generate_unique_id(f'K{i % 2000}', f'P{i % 7}', f'D{i % 40}', f'R{i % 3}'))
+            for i in range(20000)
+        ], batch_size=2000)
+        with connection.cursor() as cursor: cursor.execute('ANALYZE')
+
+    def assertIndeksKullanir(self, queryset, *indeksler):
+        plan = queryset.explain()
+        self.assertTrue(any(indeks in plan for indeks in indeksler), plan)
+        self.assertNotRegex(plan, r'SCAN sayim_malzeme\b(?! USING)')
+
+    def test_arama_sorgulari_bilesik_indeks_kullanir(self):
+        aktif = Malzeme.objects.filter(versiyon=self.versiyon, lokasyon_kodu='D7')
+        self.assertIndeksKullanir(aktif.filter(malzeme_kodu='K7', parti_no='P0'), 'malzeme_depo_stok')
+        self.assertIndeksKullanir(aktif.filter(malzeme_kodu='K7'), 'malzeme_depo_stok', 'malzeme_stok_depo')
+        self.assertIndeksKullanir(aktif.filter(parti_no='P0'), 'malzeme_depo_parti')
+        self.assertIndeksKullanir(
+            Malzeme.objects.aktif().filter(malzeme_kodu='K7').exclude(lokasyon_kodu='D7').values_list('lokasyon_kodu', flat=True).distinct(),
+            'COVERING INDEX malzeme_stok_depo')
+
+    def test_kucuk_harfli_yazim_standartlastirilir(self):
+        malzeme = Malzeme.objects.create(malzeme_kodu=' k-1 ', parti_no='', lokasyon_kodu='d1', renk=None, malzeme_adi='x', olcu_birimi='ADET')
+        self.assertEqual((malzeme.malzeme_kodu, malzeme.parti_no, malzeme.lokasyon_kodu, malzeme.renk), ('K-1', 'YOK', 'D1', 'YOK'))
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Malzeme.objects.filter(pk=malzeme.pk).update(lokasyon_kodu='d1')
+
+
+class SayimToplamTest(TestCase):
+    def setUp(self):
+        arama_indeksi.temizle()
+        parcalari_yukle([pd.DataFrame({'malzeme_kodu': ['K1', 'K2'], 'lokasyon_kodu': ['D1'] * 2, 'sistem_stogu': ['5', '1'], 'birim_fiyat': ['1'] * 2})])
+        self.emir = SayimEmri.objects.create(ad='Test')
+        self.url = reverse('ajax_sayim_kaydet', args=[self.emir.pk])
+
+    def _kaydet_govde(self, govde):
+        return self.client.post(self.url, json.dumps(govde), content_type='application/json').json()
+
+    def _kaydet(self, bid, miktar, personel):
+        return self._kaydet_govde({'benzersiz_id': bid, 'miktar': miktar, 'personel_adi': personel})
+
+    def test_kayit_toplami_artirir_ve_yeniden_kurma_ayni_sonucu_verir(self):
+        self._kaydet('K1_YOK_D1_YOK', '2', 'ali')
+        self.assertEqual(self._kaydet('K1_YOK_D1_YOK', '1,5', 'veli')['yeni_miktar'], '3.50')
+        self._kaydet('K2_YOK_D1_YOK', '4', 'ali')
+
+        toplam = SayimToplam.objects.get(sayim_emri=self.emir, benzersiz_id='K1_YOK_D1_YOK')
+        self.assertEqual((toplam.toplam_miktar, toplam.kayit_sayisi, toplam.son_personel), (Decimal('3.5'), 2, 'VELI'))
+        cevap = self.client.get(reverse('ajax_akilli_stok_ara'), {'stok_kod': 'K1', 'depo_kod': 'D1', 'sayim_emri_id': self.emir.pk}).json()
+        self.assertEqual((cevap['sayilan_stok'], cevap['last_sayim']['personel']), ('3.50', 'VELI'))
+        self.assertEqual(toplam_farklari(), [])
+
+        # Detay doğrudan silinirse tutarsızlık görülür, yeniden kurma düzeltir
+        SayimDetay.objects.filter(personel_adi='VELI').delete()
+        self.assertEqual(toplam_farklari(), [(self.emir.pk, 'K1_YOK_D1_YOK')])
+        call_command('sayim_toplamlarini_kur', stdout=StringIO())
+        self.assertEqual(toplam_farklari(), [])
+        self.assertEqual(SayimToplam.objects.get(benzersiz_id='K1_YOK_D1_YOK').toplam_miktar, Decimal('2'))
+
+        self.client.post(reverse('stoklari_onayla', args=[self.emir.pk]))
+        self.assertEqual(Malzeme.objects.aktif().get(benzersiz_id='K2_YOK_D1_YOK').sistem_stogu, Decimal('4'))
+
+    def test_onay_stoklari_parca_parca_toplu_gunceller(self):
+        self._kaydet('K1_YOK_D1_YOK', '5', 'ali')  # sistem stoğuyla aynı
+        self._kaydet('K2_YOK_D1_YOK', '2,5', 'ali')
+        # Tutar yarımda: 1.5 * 0.00001 = 0.000015 -> Malzeme.save gibi yarımda çifte 0.00002
+        parcalari_yukle([pd.DataFrame({'malzeme_kodu': ['K3'], 'lokasyon_kodu': ['D1'], 'sistem_stogu': ['0'], 'birim_fiyat': ['0.00001']})])
+        self._kaydet('K3_YOK_D1_YOK', '1.5', 'ali')
+        yukleniyor = yeni_versiyon_hazirla('yükleme sürüyor')
+        with self.captureOnCommitCallbacks(execute=True):
+            cevap = self.client.post(reverse('stoklari_onayla', args=[self.emir.pk]), follow=True)
+        self.assertIn("2 stok güncellendi, 1 aynı kaldı", [str(m) for m in cevap.context['messages']][0])
+        for versiyon in (KatalogVersiyon.objects.get(durum='Aktif'), yukleniyor):
+            k2 = Malzeme.objects.get(versiyon=versiyon, benzersiz_id='K2_YOK_D1_YOK')
+            self.assertEqual((k2.sistem_stogu, k2.sistem_tutari, k2.icerik_hash), (Decimal('2.5'), Decimal('2.5'), None))
+            self.assertEqual(Malzeme.objects.get(versiyon=versiyon, benzersiz_id='K3_YOK_D1_YOK').sistem_tutari, Decimal('0.00002'))
+        self.assertEqual(sayilan_stoklari_yaz(self.emir, parca_boyutu=1), (0, 3))
+
+    def test_okut_ve_kaydet_tek_istekte_cozer_ve_yazar(self):
+        url = reverse('ajax_okut_ve_kaydet', args=[self.emir.pk])
+        okut = lambda **govde: self.client.post(url, json.dumps({'depo_kod': 'd1', 'personel_adi': 'ali', **govde}), content_type='application/json')
+        self.assertEqual(okut(stok_kod='k1').json()['yeni_miktar'], '1.00')
+        with self.assertNumQueries(7):  # emir, katalog anahtarı, insert, toplam güncelleme, toplam okuma + savepoint
+            cevap = okut(seri_no='K1_YOK_D1_YOK', miktar='2').json()
+        self.assertEqual((cevap['success'], cevap['found'], cevap['yeni_miktar'], cevap['sayilan_stok']), (True, True, '3.00', '3.00'))
+        self.assertEqual(cevap['last_sayim']['personel'], 'ALI')
+        self.assertEqual(okut(stok_kod='K9').status_code, 404)
+
+        parcalari_yukle([pd.DataFrame({'malzeme_kodu': ['K3', 'K3'], 'parti_no': ['P1', 'P2'], 'lokasyon_kodu': ['D1'] * 2, 'sistem_stogu': ['1'] * 2, 'birim_fiyat': ['1'] * 2})])
+        cevap = okut(stok_kod='K3').json()
+        self.assertEqual((cevap['success'], cevap['parti_varyantlar']), (False, ['P1', 'P2']))
+        self.assertEqual(SayimDetay.objects.count(), 2)
+        self.assertEqual(toplam_farklari(), [])
+
+        # Tekrar gönderim olmayan çakışma JSON 409 döner, kayıt geri alınır
+        with mock.patch('sayim.views.toplami_artir', side_effect=IntegrityError('kilit')):
+            cevap = okut(stok_kod='k1', istemci_id='c-1')
+        self.assertEqual((cevap.status_code, cevap.json()['success']), (409, False))
+        self.assertEqual(SayimDetay.objects.count(), 2)
+
+    def test_toplu_kayit_kismi_ve_hepsi_modlari(self):
+        url = reverse('ajax_sayim_kaydet_toplu', args=[self.emir.pk])
+        gonder = lambda **govde: self.client.post(url, json.dumps(govde), content_type='application/json')
+        satirlar = [
+            {'benzersiz_id': 'K1_YOK_D1_YOK', 'miktar': '2'}, {'stok_kod': 'k1', 'miktar': '1,5'},
+            {'stok_kod': 'K9', 'miktar': '1'}, {'benzersiz_id': 'K2_YOK_D1_YOK', 'miktar': '-1'},
+        ]
+
+        cevap = gonder(satirlar=satirlar, mod='hepsi', depo_kod='d1', personel_adi='ali')
+        self.assertEqual(cevap.status_code, 422)
+        self.assertEqual(cevap.json()['kaydedilen'], 0)
+        self.assertFalse(SayimDetay.objects.exists())
+
+        with self.assertNumQueries(11):  # satır sayısından bağımsız: emir, malzemeler, bulk_create, toplam, açılış stoğu, savepoint'ler
+            veri = gonder(satirlar=satirlar, depo_kod='d1', personel_adi='ali').json()
+        self.assertEqual((veri['kaydedilen'], veri['hatali']), (2, 2))
+        self.assertEqual([s['success'] for s in veri['sonuclar']], [True, True, False, False])
+        self.assertEqual(veri['toplamlar'], {'K1_YOK_D1_YOK': '3.50'})
+        self.assertEqual(toplam_farklari(), [])
+        self.assertEqual(SayimToplam.objects.get(benzersiz_id='K1_YOK_D1_YOK').kayit_sayisi, 2)
+
+    def test_ayni_istemci_id_tekrar_gonderilince_iki_kez_sayilmaz(self):
+        url = reverse('ajax_sayim_kaydet_toplu', args=[self.emir.pk])
+        parca = [{'istemci_id': 'a-1', 'benzersiz_id': 'K1_YOK_D1_YOK', 'miktar': '2', 'kayit_tarihi': '2026-01-05T10:00:00Z'},
+                 {'istemci_id': 'a-2', 'benzersiz_id': 'K1_YOK_D1_YOK', 'miktar': '3'},
+                 {'istemci_id': 'a-2', 'benzersiz_id': 'K1_YOK_D1_YOK', 'miktar': '3'}]
+        for _ in range(2):  # bağlantı koptu, aynı parça tekrar gönderildi
+            veri = self.client.post(url, json.dumps({'satirlar': parca}), content_type='application/json').json()
+            self.assertTrue(veri['success'])
+        self.assertEqual(veri['kaydedilen'], 0)
+        self.assertTrue(all(s['tekrar'] for s in veri['sonuclar']))
+        self.assertEqual(veri['toplamlar'], {'K1_YOK_D1_YOK': '5.00'})
+        self.assertEqual(SayimDetay.objects.get(istemci_id='a-1').kayit_tarihi.date().isoformat(), '2026-01-05')
+
+        tekil = self._kaydet_govde({'istemci_id': 'a-1', 'benzersiz_id': 'K1_YOK_D1_YOK', 'miktar': '2', 'personel_adi': 'x'})
+        self.assertEqual((tekil['tekrar'], tekil['yeni_miktar']), (True, '5.00'))
+        self.assertEqual(SayimDetay.objects.count(), 2)
+
+        # Tekrar gönderim olmayan çakışma 500 değil JSON 409 döner (istemci kuyruğu satırı bırakır)
+        with mock.patch('sayim.views.toplami_artir', side_effect=IntegrityError('kilit')):
+            cevap = self.client.post(self.url, json.dumps({'istemci_id': 'a-3', 'benzersiz_id': 'K1_YOK_D1_YOK', 'miktar': '1'}), content_type='application/json')
+        self.assertEqual((cevap.status_code, cevap.json()['success']), (409, False))
+        with mock.patch('sayim.toplu_sayim.detaylari_toplamlara_ekle', side_effect=IntegrityError('kilit')):
+            cevap = self.client.post(url, json.dumps({'satirlar': [{'istemci_id': 'a-4', 'benzersiz_id': 'K1_YOK_D1_YOK', 'miktar': '1'}]}), content_type='application/json')
+        self.assertEqual((cevap.status_code, cevap.json()['success']), (409, False))
+        self.assertEqual(SayimDetay.objects.count(), 2)
+
+
+@override_settings(SAYIM_IS_YURUTUCU='senkron', SAYIM_OCR_ARKA_UCU='sahte', SAYIM_OCR_SAHTE_SONUC=[
+    {'stok_kod': 'k1', 'parti_no': 'p1', 'miktar': '2,5'}, {'stok_kod': 'YOK', 'miktar': 1}, 'bozuk',
+])
+class OcrIsiTest(TestCase):
+    def _gonder(self, veri):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse('gemini_ocr_analiz'), {'image_file': SimpleUploadedFile('etiket.png', veri)})
+
+    def test_is_hemen_doner_ve_sonuc_sorgulanir(self):
+        resim = BytesIO()
+        Image.new('RGB', (8, 8)).save(resim, 'PNG')
+        cevap = self._gonder(resim.getvalue())
+        self.assertEqual(cevap.status_code, 202)
+        durum = self.client.get(cevap.json()['durum_url']).json()
+        self.assertEqual((durum['durum'], durum['bitti'], durum['count']), ('Tamamlandı', True, 1))
+        self.assertEqual(durum['results'], [{'stok_kod': 'K1', 'parti_no': 'P1', 'renk': 'YOK', 'miktar': '2.50', 'barkod': 'K1'}])
+
+        self.assertEqual(self._gonder(b'resim degil').status_code, 400)
+        with mock.patch('sayim.ocr.OCR_AZAMI_BEKLEYEN', 1):
+            OcrIsi.objects.create(durum='Çalışıyor')
+            self.assertEqual(self._gonder(resim.getvalue()).status_code, 503)
+        # Süresinde bitmeyen iş (örn. worker yeniden başladı) sorgulanınca hataya düşer
+        OcrIsi.objects.filter(durum='Çalışıyor').update(olusturma_tarihi=timezone.now() - timedelta(hours=1))
+        durum = self.client.get(reverse('ocr_durum', args=[OcrIsi.objects.get(durum='Çalışıyor').pk])).json()
+        self.assertEqual((durum['success'], durum['durum'], durum['bitti']), (False, 'Hata', True))
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+Sayım toplamları (SayimToplam) bakımı.
+
+Her sayım kaydı (SayimDetay) yazılırken aynı işlem içinde toplami_artir ile
+(sayım emri, benzersiz_id) satırı F() ifadesiyle artırılır; böylece eşzamanlı
+kayıtlar birbirinin artışını ezmez ve okuyucular detay tablosunu taramaz.
+Detaylar elle silinir/değiştirilirse toplamlar toplamlari_yeniden_kur ile
+detaylardan yeniden hesaplanır (bkz. sayim_toplamlarini_kur komutu).
+
+Her artış işlem commit olunca emrin olay kanalına da yayınlanır (bkz. olay_yolu.py);
+canlı fark özeti ve ilerleme ekranları bu olaylarla yerinde güncellenir.
+"""
+
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, F, Max, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Greatest
+
+from .katalog import acilisa_ekle
+from .models import SayimDetay, SayimToplam
+from .olay_yolu import sayim_olayi_yayinla
+
+KURMA_PARCA_BOYUTU = 1000
+
+
+def toplami_artir(sayim_emri_id, benzersiz_id, miktar, personel, tarih, adet=1):
+    """Bir (veya aynı malzemeye ait adet kadar) sayım kaydını toplamlara ekler (çağıran işlem içinde)."""
+    guncelle = lambda: SayimToplam.objects.filter(sayim_emri_id=sayim_emri_id, benzersiz_id=benzersiz_id).update(
+        toplam_miktar=F('toplam_miktar') + miktar, kayit_sayisi=F('kayit_sayisi') + adet,
+        # Geç gelen (eski tarihli) kayıt son sayım bilgisini geriye almaz
+        son_personel=Case(When(son_sayim_tarihi__lte=tarih, then=Value(personel)), default=F('son_personel')),
+        son_sayim_tarihi=Greatest('son_sayim_tarihi', Value(tarih)),
+    )
+    yeni = False
+    if not guncelle():
+        try:
+            with transaction.atomic():
+                SayimToplam.objects.create(sayim_emri_id=sayim_emri_id, benzersiz_id=benzersiz_id, toplam_miktar=miktar,
+                                           kayit_sayisi=adet, son_sayim_tarihi=tarih, son_personel=personel)
+            yeni = True
+        except IntegrityError:
+            # Aynı anda ilk kaydı başka bir istek oluşturdu
+            guncelle()
+    # Emir açıldıktan sonra kataloğa giren malzeme ilk sayımında açılış stoğuna eklenir
+    if yeni: acilisa_ekle(sayim_emri_id, benzersiz_id)
+    sayim_olayi_yayinla(sayim_emri_id, {
+        'tip': 'sayim', 'benzersiz_id': benzersiz_id, 'miktar': str(miktar), 'adet': adet,
+        'personel': personel, 'tarih': tarih.isoformat(), 'yeni': yeni,
+    })
+
+
+def detaylari_toplamlara_ekle(detaylar):
+    """Toplu yazılan SayimDetay nesnelerini malzeme başına tek güncellemeyle toplamlara ekler."""
+    gruplar = {}
+    for d in sorted(detaylar, key=lambda d: d.kayit_tarihi):
+        miktar, adet, _, _ = gruplar.get((d.sayim_emri_id, d.benzersiz_malzeme.benzersiz_id), (Decimal('0.0'), 0, None, None))
+        gruplar[(d.sayim_emri_id, d.benzersiz_malzeme.benzersiz_id)] = (miktar + d.sayilan_stok, adet + 1, d.personel_adi, d.kayit_tarihi)
+    for (emir_id, bid), (miktar, adet, personel, tarih) in gruplar.items():
+        toplami_artir(emir_id, bid, miktar, personel, tarih, adet=adet)
+
+
+def sayilan_miktar(sayim_emri_id, benzersiz_id):
+    """Emirde malzeme için sayılan toplam (hiç sayılmadıysa 0)."""
+    toplam = SayimToplam.objects.filter(sayim_emri_id=sayim_emri_id, benzersiz_id=benzersiz_id).values_list('toplam_miktar', flat=True).first()
+    return toplam if toplam is not None else Decimal('0.0')
+
+
+def sayilan_miktarlar(sayim_emri, benzersiz_idler=None):
+    """{benzersiz_id: sayılan toplam} (sadece sayılan malzemeler; istenirse verilen ID'lerle sınırlı)."""
+    toplamlar = SayimToplam.objects.filter(sayim_emri=sayim_emri)
+    if benzersiz_idler is not None: toplamlar = toplamlar.filter(benzersiz_id__in=benzersiz_idler)
+    return dict(toplamlar.values_list('benzersiz_id', 'toplam_miktar'))
+
+
+def son_sayim(benzersiz_id):
+    """Malzemenin tüm emirlerdeki son sayımı (SayimToplam) veya None."""
+    return SayimToplam.objects.filter(benzersiz_id=benzersiz_id).order_by('-son_sayim_tarihi').first()
+
+
+def toplamlari_hesapla(sayim_emri_ids=None):
+    """Toplamları detaylardan hesaplar: {(emir_id, benzersiz_id): (toplam, kayıt sayısı, son tarih, son personel)}."""
+    detaylar = SayimDetay.objects.all()
+    if sayim_emri_ids is not None: detaylar = detaylar.filter(sayim_emri_id__in=sayim_emri_ids)
+    son_personel = SayimDetay.objects.filter(
+        sayim_emri_id=OuterRef('sayim_emri_id'), benzersiz_malzeme__benzersiz_id=OuterRef('benzersiz_malzeme__benzersiz_id'),
+    ).order_by('-kayit_tarihi', '-pk').values('personel_adi')[:1]
+    satirlar = detaylar.values('sayim_emri_id', 'benzersiz_malzeme__benzersiz_id').annotate(
+        toplam=Sum('sayilan_stok'), sayi=Count('pk'), son_tarih=Max('kayit_tarihi'), son_personel=Subquery(son_personel),
+    ).order_by()
+    return {
+        (s['sayim_emri_id'], s['benzersiz_malzeme__benzersiz_id']): (s['toplam'], s['sayi'], s['son_tarih'], s['son_personel'])
+        for s in satirlar
+    }
+
+
+def toplam_farklari(sayim_emri_ids=None):
+    """Tablodaki toplamların detaylardan hesaplananlardan farklı olduğu anahtarlar (tutarlılık kontrolü)."""
+    beklenen = toplamlari_hesapla(sayim_emri_ids)
+    mevcut_qs = SayimToplam.objects.all()
+    if sayim_emri_ids is not None: mevcut_qs = mevcut_qs.filter(sayim_emri_id__in=sayim_emri_ids)
+    mevcut = {
+        (t.sayim_emri_id, t.benzersiz_id): (t.toplam_miktar, t.kayit_sayisi, t.son_sayim_tarihi, t.son_personel)
+        for t in mevcut_qs
+    }
+    return sorted(k for k in beklenen.keys() | mevcut.keys() if beklenen.get(k) != mevcut.get(k))
+
+
+@transaction.atomic
+def toplamlari_yeniden_kur(sayim_emri_ids=None):
+    """Verilen emirlerin (None ise tümünün) toplamlarını detaylardan baştan yazar. Dönüş: yazılan satır sayısı."""
+    hesaplanan = toplamlari_hesapla(sayim_emri_ids)
+    silinecek = SayimToplam.objects.all()
+    if sayim_emri_ids is not None: silinecek = silinecek.filter(sayim_emri_id__in=sayim_emri_ids)
+    silinecek.delete()
+    SayimToplam.objects.bulk_create([
+        SayimToplam(sayim_emri_id=emir_id, benzersiz_id=bid, toplam_miktar=toplam, kayit_sayisi=sayi,
+                    son_sayim_tarihi=son_tarih, son_personel=son_personel or '')
+        for (emir_id, bid), (toplam, sayi, son_tarih, son_personel) in hesaplanan.items()
+    ], batch_size=KURMA_PARCA_BOYUTU)
+    # Artış olaylarıyla izlenemeyen değişiklik: canlı ekranlar tam durumu yeniden alır
+    for emir_id in sayim_emri_ids if sayim_emri_ids is not None else {emir_id for emir_id, _ in hesaplanan}:
+        sayim_olayi_yayinla(emir_id, {'tip': 'yenile'})
+    return len(hesaplanan)
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+Toplu sayım kaydı: tek istekte birden çok sayım satırı.
+
+OCR sonucu onaylanırken veya el terminalinin tamponu boşaltılırken satır başına
+ayrı istek atmak yerine tüm satırlar tek POST ile gelir:
+  - Tüm satırların malzemeleri tek sorguyla aktif katalogda doğrulanır; emrin
+    kapsamı (SayimEmri.kapsam) dışındaki malzemeler satır hatası olur.
+  - Geçerli satırlar tek işlemde bulk_create ile yazılır, toplamlar malzeme
+    başına tek güncellemeyle artırılır (bkz. toplamlar.py).
+
+Tekrar gönderim: satırlar istemcide üretilen 'istemci_id' taşıyabilir (çevrimdışı
+kuyruk). Bu anahtar SayimDetay'da tekildir; daha önce yazılmış bir anahtar tekrar
+gelirse satır yazılmadan başarılı ('tekrar') sayılır, toplamlar ikinci kez artmaz.
+Kuyrukta bekleyen satırın sayım zamanı 'kayit_tarihi' ile korunur.
+
+Kısmi hata davranışı açıkça seçilir:
+  - 'kismi' (varsayılan): geçerli satırlar yazılır, hatalı satırlar sonuçta
+    nedeniyle raporlanır.
+  - 'hepsi': tek bir satır bile hatalıysa hiçbir satır yazılmaz.
+"""
+
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Malzeme, SayimDetay, generate_unique_id, ondalik_yuvarla, standardize_id_part
+from .toplamlar import detaylari_toplamlara_ekle, sayilan_miktarlar
+
+TOPLU_KAYIT_AZAMI_SATIR = 500
+TOPLU_KAYIT_MODLARI = ('kismi', 'hepsi')
+# İstemci saatine güvenilen en fazla ileri kayma
+ISTEMCI_SAAT_TOLERANSI = timedelta(minutes=5)
+
+
+class TopluSayimHatasi(Exception):
+    """İsteğin tamamını geçersiz kılan hata (satır hatalarından ayrı)."""
+
+
+def miktar_donustur(ham):
+    """'1,5' gibi girişleri Decimal'e çevirir; geçersiz veya pozitif olmayan miktarda ValueError."""
+    metin = str(ham if ham is not None else '').replace(',', '.').strip() or '0.0'
+    try: miktar = Decimal(metin)
+    except InvalidOperation: raise ValueError("Geçersiz miktar formatı.")
+    if not miktar.is_finite() or ondalik_yuvarla(miktar) <= Decimal('0.0'): raise ValueError("Miktar pozitif olmalı.")
+    return ondalik_yuvarla(miktar)
+
+
+def _kayit_tarihi(ham, simdi):
+    """İstemcinin bildirdiği sayım zamanı (ISO 8601); geçersiz veya ileri tarihliyse sunucu zamanı."""
+    tarih = parse_datetime(str(ham)) if ham else None
+    if tarih is None: return simdi
+    if timezone.is_naive(tarih): tarih = timezone.make_aware(tarih)
+    return tarih if tarih <= simdi + ISTEMCI_SAAT_TOLERANSI else simdi
+
+
+def _satir_id(satir, depo_kod):
+    """Satırın benzersiz_id'si: doğrudan verilmişse o, yoksa stok kodu/parti/renk ve depodan üretilir."""
+    if satir.get('benzersiz_id'): return str(satir['benzersiz_id']).strip()
+    stok_kod = standardize_id_part(satir.get('stok_kod', 'YOK'))
+    if stok_kod == 'YOK' or depo_kod == 'YOK': return None
+    return generate_unique_id(stok_kod, satir.get('parti_no', 'YOK'), depo_kod, satir.get('renk', 'YOK'))
+
+
+def sayim_satirlarini_kaydet(sayim_emri, satirlar, personel_adi='MISAFIR', lat='YOK', lon='YOK', depo_kod='YOK', mod='kismi',
+                             yeniden_deneme=True):
+    """
+    Satırları doğrular ve yazar. Her satır {'benzersiz_id' veya 'stok_kod'/'parti_no'/'renk',
+    'miktar'} ve isteğe bağlı 'istemci_id', 'kayit_tarihi' içerir; personel_adi/lat/lon
+    satırda verilmezse isteğinkiler kullanılır.
+    Dönüş: {'kaydedilen', 'hatali', 'sonuclar': [satır başına sonuç], 'toplamlar': {benzersiz_id: toplam}}
+    """
+    if mod not in TOPLU_KAYIT_MODLARI: raise TopluSayimHatasi(f"Geçersiz mod: '{mod}'.")
+    if not isinstance(satirlar, list) or not satirlar: raise TopluSayimHatasi("Satır listesi boş.")
+    if len(satirlar) > TOPLU_KAYIT_AZAMI_SATIR: raise TopluSayimHatasi(f"En fazla {TOPLU_KAYIT_AZAMI_SATIR} satır gönderilebilir.")
+    if sayim_emri.durum != 'Açık': raise TopluSayimHatasi('Sayım kapalı.')
+    depo_kod = standardize_id_part(depo_kod)
+
+    sonuclar, hazir, istemci_idler = [], [], set()
+    for sira, satir in enumerate(satirlar):
+        sonuc = {'sira': sira, 'benzersiz_id': None, 'success': False}
+        sonuclar.append(sonuc)
+        if not isinstance(satir, dict): sonuc['message'] = "Satır nesne değil."; continue
+        sonuc['istemci_id'] = str(satir['istemci_id'])[:64] if satir.get('istemci_id') else None
+        sonuc['benzersiz_id'] = _satir_id(satir, depo_kod)
+        if not sonuc['benzersiz_id']: sonuc['message'] = "Ürün ID veya Stok Kodu + Depo eksik."; continue
+        try: miktar = miktar_donustur(satir.get('miktar'))
+        except ValueError as e: sonuc['message'] = str(e); continue
+        if sonuc['istemci_id'] in istemci_idler:
+            sonuc.update({'success': True, 'tekrar': True, 'message': "Aynı istekte tekrar eden kayıt atlandı."}); continue
+        if sonuc['istemci_id']: istemci_idler.add(sonuc['istemci_id'])
+        hazir.append((sonuc, satir, miktar))
+
+    # Tüm malzemeler ve daha önce yazılmış istemci anahtarları tek sorgularla kontrol edilir
+    malzemeler = {m.benzersiz_id: m for m in Malzeme.objects.aktif().filter(benzersiz_id__in={sonuc['benzersiz_id'] for sonuc, _, _ in hazir})}
+    yazilmislar = set(SayimDetay.objects.filter(istemci_id__in=istemci_idler).values_list('istemci_id', flat=True)) if istemci_idler else set()
+    detaylar, simdi = [], timezone.now()
+    for sonuc, satir, miktar in hazir:
+        if sonuc['istemci_id'] in yazilmislar:
+            sonuc.update({'success': True, 'tekrar': True, 'message': "Bu kayıt daha önce alınmış."}); continue
+        malzeme = malzemeler.get(sonuc['benzersiz_id'])
+        if malzeme is None: sonuc['message'] = f"ID '{sonuc['benzersiz_id']}' bulunamadı."; continue
+        if not sayim_emri.kapsamda_mi(malzeme): sonuc.update({'kapsam_disi': True, 'message': sayim_emri.kapsam_disi_mesaji(malzeme)}); continue
+        personel = str(satir.get('personel_adi') or personel_adi or '').strip().upper() or 'MISAFIR'
+        detay = SayimDetay(
+            sayim_emri=sayim_emri, benzersiz_malzeme=malzeme, personel_adi=personel, sayilan_stok=miktar,
+            kayit_tarihi=_kayit_tarihi(satir.get('kayit_tarihi'), simdi), istemci_id=sonuc['istemci_id'],
+            latitude=str(satir.get('lat', lat)), longitude=str(satir.get('lon', lon)),
+        )
+        detay.konumu_ayarla()  # bulk_create save() çağırmaz
+        detaylar.append(detay)
+        sonuc.update({'success': True, 'message': f"{malzeme.malzeme_kodu} ({malzeme.parti_no}) {miktar:.2f} kayıt."})
+
+    hatali = sum(not s['success'] for s in sonuclar)
+    if hatali and mod == 'hepsi':
+        for s in sonuclar:
+            if s['success']: s.update({'success': False, 'message': "Kaydedilmedi (diğer satırlarda hata var)."})
+        return {'kaydedilen': 0, 'hatali': hatali, 'sonuclar': sonuclar, 'toplamlar': {}}
+
+    try:
+        with transaction.atomic():
+            SayimDetay.objects.bulk_create(detaylar)
+            detaylari_toplamlara_ekle(detaylar)
+    except IntegrityError:
+        # Aynı kuyruk eşzamanlı iki istekle gönderildi; yeniden denemede yazılmışlar 'tekrar' olur
+        if not yeniden_deneme: raise
+        return sayim_satirlarini_kaydet(sayim_emri, satirlar, personel_adi, lat, lon, depo_kod, mod, yeniden_deneme=False)
+    toplamlar = sayilan_miktarlar(sayim_emri, {s['benzersiz_id'] for s in sonuclar if s['success']})
+    for s in sonuclar:
+        if s['success'] and s['benzersiz_id'] in toplamlar: s['yeni_miktar'] = f"{toplamlar[s['benzersiz_id']]:.2f}"
+    return {
+        'kaydedilen': len(detaylar), 'hatali': hatali, 'sonuclar': sonuclar,
+        'toplamlar': {bid: f"{t:.2f}" for bid, t in toplamlar.items()},
+    }
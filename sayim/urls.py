@@ -5,14 +5,14 @@ from .views import (
     SayimEmirleriListView, SayimEmriCreateView, PersonelLoginView,
     set_personel_session, DepoSecimView, SayimGirisView,
     RaporlamaView, PerformansAnaliziView, CanliFarkOzetiView, KonumAnaliziView,
-    stoklari_onayla_ve_kapat, yonetim_araclari, reset_sayim_data,
+    stoklari_onayla_ve_kapat, yonetim_araclari, reset_sayim_data, katalog_geri_al,
 
     # Excel Yükleme/Kurulum Fonksiyonları
-    upload_and_reload_stok_data,
+    upload_and_reload_stok_data, stok_yukleme_durum,
 
     # AJAX Fonksiyonları ve Export
-    ajax_akilli_stok_ara, ajax_sayim_kaydet,
-    gemini_ocr_analiz, export_excel, export_mutabakat_excel
+    ajax_akilli_stok_ara, ajax_depo_katalogu, ajax_konum_kumeleri, ajax_okut_ve_kaydet, ajax_rapor, ajax_sayim_kaydet, ajax_sayim_kaydet_toplu, sayim_olay_akisi,
+    gemini_ocr_analiz, ocr_durum, export_excel, export_mutabakat_excel
 )
 
 urlpatterns = [
@@ -33,9 +33,12 @@ urlpatterns = [
 
     # 3. RAPORLAMA VE ANALİZ (Tüm pk'lar sayim_emri_id ile değiştirildi)
     path('rapor/<int:sayim_emri_id>/', RaporlamaView.as_view(), name='raporlama_onay'),
+    path('ajax/rapor/<int:sayim_emri_id>/', ajax_rapor, name='ajax_rapor'),
+    path('olaylar/<int:sayim_emri_id>/', sayim_olay_akisi, name='sayim_olay_akisi'),
     path('analiz/performans/<int:sayim_emri_id>/', PerformansAnaliziView.as_view(), name='analiz_performans'),
     path('analiz/fark-ozeti/<int:sayim_emri_id>/', CanliFarkOzetiView.as_view(), name='canli_fark_ozeti'),
     path('analiz/konum/<int:sayim_emri_id>/', KonumAnaliziView.as_view(), name='analiz_konum'),
+    path('ajax/konum-kumeleri/<int:sayim_emri_id>/', ajax_konum_kumeleri, name='ajax_konum_kumeleri'),
 
     # 4. YÖNETİM VE VERİ İŞLEMLERİ
     path('stoklari-onayla/<int:sayim_emri_id>/', stoklari_onayla_ve_kapat, name='stoklari_onayla'),
@@ -44,16 +47,24 @@ urlpatterns = [
 
     # Excel Yükleme ve İndirme
     path('upload-stok-excel/', upload_and_reload_stok_data, name='upload_stok_excel'),
+    path('upload-stok-excel/durum/<int:is_id>/', stok_yukleme_durum, name='stok_yukleme_durum'),
+    path('katalog-geri-al/', katalog_geri_al, name='katalog_geri_al'),
     path('export/excel/<int:sayim_emri_id>/', export_excel, name='export_excel'),
     path('export/mutabakat-excel/<int:sayim_emri_id>/', export_mutabakat_excel, name='export_mutabakat_excel'),
 
     # 5. AJAX Endpoints
     path('ajax/akilli-stok-ara/', ajax_akilli_stok_ara, name='ajax_akilli_stok_ara'),
+    # Sayım ekranının yerel arama için indirdiği depo kataloğu (ETag / fark destekli)
+    path('ajax/depo-katalogu/<str:depo_kod>/', ajax_depo_katalogu, name='ajax_depo_katalogu'),
 
     # AJAX SAYIM KAYDETME (404 HATASI ÇÖZÜMÜ: Sonda / opsiyonel)
     # path yerine re_path kullanılarak sonda / işaretinin olup olmamasına bakılmaz.
     re_path(r'^ajax/sayim-kaydet/(?P<sayim_emri_id>[0-9]+)/?$', ajax_sayim_kaydet, name='ajax_sayim_kaydet'),
+    # Toplu kayıt (OCR onayı / el terminali tamponu): tek POST'ta çok satır
+    re_path(r'^ajax/sayim-kaydet-toplu/(?P<sayim_emri_id>[0-9]+)/?$', ajax_sayim_kaydet_toplu, name='ajax_sayim_kaydet_toplu'),
+    re_path(r'^ajax/okut-ve-kaydet/(?P<sayim_emri_id>[0-9]+)/?$', ajax_okut_ve_kaydet, name='ajax_okut_ve_kaydet'),
 
     path('ajax/ocr-analiz/', gemini_ocr_analiz, name='gemini_ocr_analiz'),
+    path('ajax/ocr-analiz/durum/<int:is_id>/', ocr_durum, name='ocr_durum'),
 ]
 
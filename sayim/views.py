@@ -1,8 +1,10 @@
 # -*- coding: utf-8 -*-
 
+import gzip
 import json
 import time
 import os
+import tempfile
 from datetime import datetime
 from io import BytesIO
 import base64
@@ -10,17 +12,18 @@ from io import BytesIO as IO_Bytes
 from decimal import Decimal 
 
 # Django Imports
+from django.conf import settings
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import HttpResponse, JsonResponse, Http404
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse, Http404, StreamingHttpResponse
 from django.views import View
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
 from django.views.generic import ListView, CreateView, DetailView, TemplateView
 # re_path import'unu django.urls'dan yapmalıyız
-from django.urls import reverse_lazy, re_path 
+from django.urls import reverse, reverse_lazy, re_path 
 from django.core.serializers.json import DjangoJSONEncoder
-from django.db import connection, transaction
-from django.db.models import Max, F, Sum, Q 
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Max, F, Q 
 from django.utils import timezone
 from django.utils.translation import gettext as _ 
 from django.core.management import call_command
@@ -34,38 +37,30 @@ from PIL import Image
 import pandas as pd
 from PIL import Image, ImageFile
 
-# Gemini (Google GenAI) Imports
-# Google GenAI kütüphanesi kurulu değilse: pip install google-generativeai
-try:
-    import google.generativeai as genai
-    # Import GenerationConfig and Schema for explicit JSON response
-    from google.generativeai.types import GenerationConfig, Schema, Type 
-    # Hata yakalama için google.api_core.exceptions kullanmak daha standart
-    from google.api_core import exceptions as google_exceptions
-
-except ImportError:
-    genai = None
-    google_exceptions = None
-    # Gerekli tipleri None olarak tanımla ki kod hata vermesin
-    GenerationConfig, Schema, Type = None, None, None 
-    print("UYARI: Google Generative AI kütüphanesi bulunamadı. OCR özelliği çalışmayacak.")
-except AttributeError: # google.generativeai.types import edilemezse
-     genai = None
-     google_exceptions = None
-     GenerationConfig, Schema, Type = None, None, None 
-     print("UYARI: Google Generative AI kütüphanesinin versiyonu uyumsuz olabilir.")
-
-
 # Local Imports
 # NOT: Bu importları kendi model isimlerinizle eşleştirin!
-from .models import SayimEmri, Malzeme, SayimDetay, standardize_id_part, generate_unique_id 
-from .forms import SayimGirisForm
+from .models import SayimEmri, Malzeme, SayimDetay, KatalogVersiyon, OcrIsi, StokYuklemeIsi, standardize_id_part, generate_unique_id, ondalik_yuvarla 
+from .forms import SayimEmriForm, SayimGirisForm
+from .arama_indeksi import aktif_katalog_anahtari, diger_depolar, malzeme_coz
+from .canli_ozet import olay_akisi
+from .depo_katalogu import depo_katalogu_govdesi, surum_etiketi
+from .isler import is_gonder
+from .katalog import KatalogVersiyonHatasi, onceki_versiyona_don, sayilan_stoklari_yaz
+from .konum import KonumParametreHatasi, gorus_alani_oku, konum_kumeleri, konum_ozeti
+from .ocr import AZAMI_RESIM_BOYUTU, OcrKapasiteHatasi, ocr_is_durumu, ocr_isi_gonder, ocr_kullanilabilir
+from .olay_yolu import sayim_olayi_yayinla
+from .performans import performans_analizi
+from .stok_import import yarim_kalan_yuklemeleri_kapat, yukleme_isi_durumu, yukleme_isini_calistir
+from .stok_okuyucu import DESTEKLENEN_UZANTILAR, dosya_uzantisi, yuklemeyi_diske_al
+from .rapor import RAPOR_ETIKETLERI, RAPOR_SAYFA_BOYUTU, RaporParametreHatasi, grup_ozeti, rapor_dondur, rapor_kaynagi, rapor_sayfasi
+from .toplamlar import sayilan_miktar, sayilan_miktarlar, son_sayim, toplami_artir
+from .toplu_sayim import TopluSayimHatasi, miktar_donustur, sayim_satirlarini_kaydet
 
 # --- SABİTLER ---
-# Ortam değişkeninden API anahtarını alıyoruz
-GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY")
-GEMINI_AVAILABLE = bool(GEMINI_API_KEY and genai) # genai import edilebildi mi kontrolü
 ImageFile.LOAD_TRUNCATED_IMAGES = True
+# Arka plan stok yükleme işleri
+STOK_YUKLEME_DIZINI = getattr(settings, 'STOK_YUKLEME_DIZINI', os.path.join(tempfile.gettempdir(), 'stok_yukleme'))
+STOK_YUKLEME_ISCI_SAYISI = getattr(settings, 'STOK_YUKLEME_ISCI_SAYISI', 1)
 
 # --- GÖRÜNÜMLER (VIEWS) ---
 
@@ -76,8 +71,9 @@ class SayimEmirleriListView(ListView):
     ordering = ['-tarih']
 
 class SayimEmriCreateView(CreateView):
+    # Kapsam seçilirse açılış stoğu ve tüm raporlar sadece o depo / grup / lokasyonları içerir
     model = SayimEmri
-    fields = ['ad', 'atanan_personel'] 
+    form_class = SayimEmriForm
     template_name = 'sayim/sayim_emri_olustur.html'
     success_url = reverse_lazy('sayim_emirleri')
 
@@ -139,8 +135,9 @@ class DepoSecimView(TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         sayim_emri_id = kwargs['sayim_emri_id']
-        # Depo kodlarını alırken boş veya None olanları filtrele ve standardize et
-        lokasyon_listesi = Malzeme.objects.exclude(lokasyon_kodu__isnull=True).exclude(lokasyon_kodu__exact='')\
+        sayim_emri = get_object_or_404(SayimEmri, pk=sayim_emri_id)
+        # Depo kodlarını alırken boş veya None olanları filtrele ve standardize et (sadece emrin kapsamındakiler)
+        lokasyon_listesi = Malzeme.objects.aktif().filter(sayim_emri.kapsam_kosulu()).exclude(lokasyon_kodu__isnull=True).exclude(lokasyon_kodu__exact='')\
                                          .values_list('lokasyon_kodu', flat=True).distinct()
         # Standardize edilmiş ve boş olmayanları al, sonra sırala
         context['lokasyonlar'] = sorted([std_loc for loc in lokasyon_listesi if (std_loc := standardize_id_part(loc)) and std_loc != 'YOK'])
@@ -179,7 +176,7 @@ class SayimGirisView(DetailView):
         # View içinde standardize edilmiş depo kodunu context'e aktar
         context['depo_kodu'] = self.standardized_depo_kodu 
         context['personel_adi'] = self.request.session.get('current_user', 'MISAFIR')
-        context['gemini_available'] = GEMINI_AVAILABLE
+        context['gemini_available'] = ocr_kullanilabilir()
         # SayimGirisForm tanımlıysa ve kullanılıyorsa:
         # from .forms import SayimGirisForm # import yukarıda olmalı
         context['form'] = SayimGirisForm() 
@@ -194,88 +191,13 @@ class RaporlamaView(DetailView):
     context_object_name = 'sayim_emri'
 
     def get_context_data(self, **kwargs):
+        # Satırlar sayfa sayfa ajax_rapor'dan yüklenir (bkz. rapor.py); burada sadece filtre seçenekleri hazırlanır
         context = super().get_context_data(**kwargs)
-        sayim_emri = self.object # DetailView objeyi self.object olarak sağlar
-        try:
-            # Sadece ilgili sayım emrine ait detayları çek
-            sayim_detaylari = SayimDetay.objects.filter(sayim_emri=sayim_emri).select_related('benzersiz_malzeme')
-            
-            # Tüm malzemeleri bir kere çekip, sayılanları map üzerinde toplamak daha verimli
-            # Sadece bu depodaki malzemeleri çekmek daha mantıklı olabilir? Yoksa tüm stok mu raporlanıyor?
-            # Şimdilik tümünü çekiyoruz.
-            tum_malzemeler_dict = {m.benzersiz_id: m for m in Malzeme.objects.all()}
-            sayilan_miktarlar = {}
-            for detay in sayim_detaylari:
-                 # Malzemenin varlığını ve ID'sinin sözlükte olup olmadığını kontrol et
-                 # benzersiz_malzeme None olabilir mi? Evetse kontrol ekle.
-                 if hasattr(detay, 'benzersiz_malzeme') and detay.benzersiz_malzeme and hasattr(detay.benzersiz_malzeme, 'benzersiz_id') and detay.benzersiz_malzeme.benzersiz_id in tum_malzemeler_dict:
-                     malzeme_id = detay.benzersiz_malzeme.benzersiz_id
-                     # Miktarların Decimal olduğundan emin ol
-                     sayilan_stok = detay.sayilan_stok if isinstance(detay.sayilan_stok, Decimal) else Decimal(str(detay.sayilan_stok or '0.0'))
-                     sayilan_miktarlar[malzeme_id] = sayilan_miktarlar.get(malzeme_id, Decimal('0.0')) + sayilan_stok
-                 else:
-                     # İlişkisiz veya hatalı detay kaydı varsa logla
-                     print(f"Uyarı: Raporlamada Sayım Detayı ID {detay.pk} geçersiz malzeme ilişkisine sahip.")
-
-            rapor_list = []
-            # Tüm malzemeler üzerinden dönerek raporu oluştur
-            for malzeme_id, malzeme in tum_malzemeler_dict.items():
-                sayilan_mik_dec = sayilan_miktarlar.get(malzeme_id, Decimal('0.0'))
-                # Veritabanından gelen değerlerin Decimal olduğundan emin ol
-                sistem_mik_dec = malzeme.sistem_stogu if isinstance(malzeme.sistem_stogu, Decimal) else Decimal(str(malzeme.sistem_stogu or '0.0'))
-                birim_fiyat_dec = malzeme.birim_fiyat if isinstance(malzeme.birim_fiyat, Decimal) else Decimal(str(malzeme.birim_fiyat or '0.0'))
-                
-                mik_fark_dec = sayilan_mik_dec - sistem_mik_dec
-                tutar_fark_dec = mik_fark_dec * birim_fiyat_dec
-                sistem_tutar_dec = sistem_mik_dec * birim_fiyat_dec
-                
-                fark_mutlak = abs(mik_fark_dec)
-
-                if fark_mutlak < Decimal('0.01'):
-                    tag = 'tamam'
-                # Hiç sayılmadı durumu: Sistemde var (>0.01), sayımda yok (<0.01)
-                elif sistem_mik_dec > Decimal('0.01') and sayilan_mik_dec < Decimal('0.01'):
-                    tag = 'hic_sayilmadi'
-                # Yeni sayıldı durumu: Sistemde yok (<0.01), sayımda var (>0.01)
-                elif sistem_mik_dec < Decimal('0.01') and sayilan_mik_dec > Decimal('0.01'):
-                    tag = 'yeni_sayildi' # Yeni durum eklendi
-                else: # Diğer tüm fark durumları
-                    tag = 'fark_var'
-                
-                # ZeroDivisionError kontrolü
-                mik_yuzde = (mik_fark_dec / sistem_mik_dec) * 100 if sistem_mik_dec > Decimal('0.0') else Decimal('0.0') # Sıfırdan büyükse
-                 # Eğer sistem 0 iken sayım yapıldıysa yüzdeyi sonsuz veya 100% gösterme?
-                if sistem_mik_dec < Decimal('0.01') and sayilan_mik_dec > Decimal('0.01'):
-                     mik_yuzde = Decimal('100.0') # Veya 'Yeni' gibi bir metin? Şimdilik 100%
-
-                
-                rapor_list.append({
-                    'kod': malzeme.malzeme_kodu, 'ad': malzeme.malzeme_adi, 'parti': malzeme.parti_no,
-                    'renk': malzeme.renk, 'birim': malzeme.olcu_birimi,
-                    # Depo bilgisini de ekleyelim
-                    'depo': malzeme.lokasyon_kodu, 
-                    'sistem_mik': f"{sistem_mik_dec:.2f}",
-                    'sayilan_mik': f"{sayilan_mik_dec:.2f}",
-                    'mik_fark': f"{mik_fark_dec:.2f}",
-                    'mik_yuzde': f"{mik_yuzde:.2f}%",
-                    'sistem_tutar': f"{sistem_tutar_dec:.2f}",
-                    'tutar_fark': f"{tutar_fark_dec:.2f}",
-                    'tag': tag
-                })
-            # Raporu önce fark durumuna, sonra depo koduna, sonra stok koduna göre sırala
-            context['rapor_data'] = sorted(rapor_list, key=lambda x: (
-                x['tag'] == 'fark_var' or x['tag'] == 'yeni_sayildi', # Önce farklar ve yeniler (True başa gelir)
-                x['tag'] == 'hic_sayilmadi', # Sonra hiç sayılmayanlar
-                x['depo'], 
-                x['kod'], 
-                x['parti'], 
-                x['renk']
-            ), reverse=True) # Farklı olanları en başa almak için reverse=True
-        except Exception as e:
-            error_type = type(e).__name__
-            print(f"Raporlama Hatası ({error_type}): {e}") # Debugging için
-            context['hata'] = f"Raporlama verisi çekilirken bir hata oluştu: {e}"
-            context['rapor_data'] = []
+        aktif = rapor_kaynagi(self.object).order_by()
+        context['depolar'] = aktif.values_list('lokasyon_kodu', flat=True).distinct().order_by('lokasyon_kodu')
+        context['gruplar'] = aktif.exclude(stok_grup__isnull=True).values_list('stok_grup', flat=True).distinct().order_by('stok_grup')
+        context['etiketler'] = RAPOR_ETIKETLERI
+        context['sayfa_boyutu'] = RAPOR_SAYFA_BOYUTU
         return context
 
 
@@ -289,74 +211,31 @@ class PerformansAnaliziView(DetailView):
         context = super().get_context_data(**kwargs)
         sayim_emri_id = self.object.pk
         try:
-            # Sadece güncelleme tarihi olanları ve personel adı olanları al
-            detaylar = SayimDetay.objects.filter(
-                sayim_emri_id=sayim_emri_id, 
-                guncellenme_tarihi__isnull=False,
-                personel_adi__isnull=False 
-            ).exclude(personel_adi__exact='')\
-             .order_by('personel_adi', 'guncellenme_tarihi')\
-             .values('personel_adi', 'guncellenme_tarihi')
-
-            if not detaylar.exists():
+            # Kayıtlar arası süreler SQL'de (LAG) hesaplanır; sadece personel başına toplamlar gelir (bkz. performans.py)
+            performans, seriler = performans_analizi(sayim_emri_id)
+            if not performans:
                 context['analiz_data'] = []
                 context['hata'] = f"Bu emre ait, performans analizi yapılabilecek geçerli sayım kaydı bulunamadı."
                 return context
 
-            # Veriyi personel bazında grupla
-            personel_verileri = {}
-            for d in detaylar:
-                personel = d['personel_adi']
-                tarih = d['guncellenme_tarihi']
-                # Tarih geçerli bir datetime objesi mi kontrol et (Django otomatik yapar ama garanti)
-                if isinstance(tarih, datetime):
-                    if personel not in personel_verileri:
-                        personel_verileri[personel] = []
-                    personel_verileri[personel].append(tarih)
-
             analiz_list = []
-            for personel, tarihler in personel_verileri.items():
-                toplam_kayit = len(tarihler)
-                ortalama_sure_sn = float('inf')
+            for p in performans:
+                ortalama_sure_sn = p['ortalama_sure_sn'] if p['ortalama_sure_sn'] is not None else float('inf')
                 etiket = 'Yetersiz Kayıt (N=1)'
-                toplam_saniye = 0
-
-                if toplam_kayit >= 2:
-                    farklar_sn = []
-                    for i in range(1, toplam_kayit):
-                        t1 = tarihler[i-1]
-                        t2 = tarihler[i]
-                        # Zaman dilimi farkı varsa veya naive ise UTC'ye çevirerek karşılaştır
-                        try:
-                             # Django'nun timezone ayarına göre aware yap
-                             if timezone.is_naive(t1): t1 = timezone.make_aware(t1)
-                             if timezone.is_naive(t2): t2 = timezone.make_aware(t2)
-                             fark = (t2 - t1).total_seconds() 
-                             
-                             # Makul farkları al (0sn < fark < 1 saat)
-                             if 0 < fark < 3600: 
-                                 farklar_sn.append(fark)
-                             # else: print(f"Aykırı fark atlandı: {fark} sn") 
-                        except Exception as time_err: 
-                             print(f"Uyarı: Zaman farkı hesaplama hatası - {t1} vs {t2} - Hata: {time_err}")
-                             continue 
-                         
-                    if farklar_sn: # Geçerli fark varsa hesapla
-                        toplam_saniye = sum(farklar_sn)
-                        ortalama_sure_sn = toplam_saniye / len(farklar_sn)
-                        dakika = int(ortalama_sure_sn // 60)
-                        saniye_kalan = int(ortalama_sure_sn % 60)
-                        etiket = f"{dakika:02d} dk {saniye_kalan:02d} sn" 
-                    elif toplam_kayit >=2 : # Kayıt var ama geçerli fark yoksa
-                        etiket = 'Aykırı Veri (>1 Saat)'
-
+                if p['aralik_sayisi']: # Geçerli (0sn < fark < 1 saat) aralık varsa
+                    dakika = int(ortalama_sure_sn // 60)
+                    saniye_kalan = int(ortalama_sure_sn % 60)
+                    etiket = f"{dakika:02d} dk {saniye_kalan:02d} sn"
+                elif p['toplam_kayit'] >= 2: # Kayıt var ama geçerli fark yoksa
+                    etiket = 'Aykırı Veri (>1 Saat)'
 
                 analiz_list.append({
-                    'personel': personel,
-                    'toplam_kayit': toplam_kayit,
-                    'toplam_sure_sn': f"{toplam_saniye:.2f}",
+                    'personel': p['personel'],
+                    'toplam_kayit': p['toplam_kayit'],
+                    'toplam_sure_sn': f"{p['toplam_sure_sn']:.2f}",
                     'ortalama_sure_formatli': etiket,
-                    'ortalama_sure_sn_raw': ortalama_sure_sn 
+                    'ortalama_sure_sn_raw': ortalama_sure_sn,
+                    'medyan_sure_sn': f"{p['medyan_sure_sn']:.2f} sn" if p['medyan_sure_sn'] is not None else 'N/A',
                 })
 
             analiz_list.sort(key=lambda x: x['ortalama_sure_sn_raw']) # Sonsuzlar en sona gider
@@ -369,6 +248,15 @@ class PerformansAnaliziView(DetailView):
                  del item['ortalama_sure_sn_raw'] 
 
             context['analiz_data'] = analiz_list
+            # Saatlik hız: saat satırları x personel sütunları (kaydı olmayan saat 0)
+            personeller = [item['personel'] for item in analiz_list if item['personel'] in seriler]
+            saatler = sorted({saat for seri in seriler.values() for saat, _ in seri})
+            adetler = {(personel, saat): adet for personel, seri in seriler.items() for saat, adet in seri}
+            context['saatlik_personeller'] = personeller
+            context['saatlik_hiz'] = [
+                {'saat': saat, 'adetler': [adetler.get((personel, saat), 0) for personel in personeller]}
+                for saat in saatler
+            ]
         except Exception as e:
             error_type = type(e).__name__
             print(f"Performans Analizi Hatası ({error_type}): {e}") # Debugging için
@@ -386,57 +274,8 @@ class CanliFarkOzetiView(DetailView):
         context = super().get_context_data(**kwargs)
         sayim_emri = self.object
         try:
-            # İlgili sayım emrine ait toplam sayılan miktarları malzeme bazında al
-            sayilan_toplamlar = SayimDetay.objects.filter(sayim_emri=sayim_emri, benzersiz_malzeme__isnull=False)\
-                 .values('benzersiz_malzeme__benzersiz_id')\
-                 .annotate(toplam_sayilan=Sum('sayilan_stok'))
-
-            # Dictionary: {malzeme_id: toplam_miktar}
-            sayilan_miktarlar_dict = {
-                 item['benzersiz_malzeme__benzersiz_id']: item['toplam_sayilan'] or Decimal('0.0')
-                 for item in sayilan_toplamlar 
-            }
-
-            # Tüm malzemeleri grup bilgisiyle birlikte çek
-            tum_malzemeler = Malzeme.objects.all().values(
-                 'benzersiz_id', 'stok_grup', 'sistem_stogu', 'birim_fiyat'
-            )
-
-            grup_ozet = {}
-            for malzeme in tum_malzemeler:
-                stok_grubu = malzeme['stok_grup'] or 'TANIMSIZ' 
-                sistem_mik = malzeme['sistem_stogu'] if isinstance(malzeme['sistem_stogu'], Decimal) else Decimal('0.0')
-                birim_fiyat = malzeme['birim_fiyat'] if isinstance(malzeme['birim_fiyat'], Decimal) else Decimal('0.0')
-                sayilan_stok = sayilan_miktarlar_dict.get(malzeme['benzersiz_id'], Decimal('0.0'))
-
-                mik_fark = sayilan_stok - sistem_mik
-                tutar_fark = mik_fark * birim_fiyat
-                sistem_tutar = sistem_mik * birim_fiyat
-
-                if stok_grubu not in grup_ozet:
-                    grup_ozet[stok_grubu] = {
-                        'sistem_mik_toplam': Decimal('0.0'), 'sistem_tutar_toplam': Decimal('0.0'),
-                        'sayilan_mik_toplam': Decimal('0.0'), 'tutar_fark_toplam': Decimal('0.0'), 
-                    }
-                grup_ozet[stok_grubu]['sistem_mik_toplam'] += sistem_mik
-                grup_ozet[stok_grubu]['sistem_tutar_toplam'] += sistem_tutar
-                grup_ozet[stok_grubu]['sayilan_mik_toplam'] += sayilan_stok
-                grup_ozet[stok_grubu]['tutar_fark_toplam'] += tutar_fark 
-
-            rapor_list = []
-            for grup, data in grup_ozet.items():
-                mik_fark_toplam = data['sayilan_mik_toplam'] - data['sistem_mik_toplam']
-                tutar_fark_toplam = data['tutar_fark_toplam']
-                rapor_list.append({
-                    'grup': grup,
-                    'sistem_mik': f"{data['sistem_mik_toplam']:.2f}",
-                    'sistem_tutar': f"{data['sistem_tutar_toplam']:.2f}",
-                    'fazla_mik': f"{mik_fark_toplam:.2f}" if mik_fark_toplam > 0 else "0.00",
-                    'eksik_mik': f"{-mik_fark_toplam:.2f}" if mik_fark_toplam < 0 else "0.00",
-                    'fazla_tutar': f"{tutar_fark_toplam:.2f}" if tutar_fark_toplam > 0 else "0.00",
-                    'eksik_tutar': f"{-tutar_fark_toplam:.2f}" if tutar_fark_toplam < 0 else "0.00"
-                })
-            context['analiz_data'] = sorted(rapor_list, key=lambda x: x['grup']) 
+            # Grup toplamları tek GROUP BY sorgusuyla hesaplanır ve toplamlar değişene kadar önbellekte kalır (bkz. rapor.py)
+            context['analiz_data'] = grup_ozeti(sayim_emri)
         except Exception as e:
             error_type = type(e).__name__
             print(f"Fark Özeti Hatası ({error_type}): {e}") 
@@ -453,48 +292,17 @@ class KonumAnaliziView(DetailView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         sayim_emri = self.object
-        
-        konum_data_qs = SayimDetay.objects.filter(
-            sayim_emri=sayim_emri, latitude__isnull=False, longitude__isnull=False,
-        ).exclude(latitude__in=['YOK', '']).exclude(longitude__in=['YOK', ''])\
-         .values('personel_adi', 'latitude', 'longitude', 'kayit_tarihi', 'sayilan_stok')\
-         .order_by('kayit_tarihi') 
-
-        markers = []
-        gecersiz_koordinat_sayisi = 0
-        for item in konum_data_qs:
-            try:
-                lat_str = str(item['latitude']).replace(',', '.').strip()
-                lng_str = str(item['longitude']).replace(',', '.').strip()
-                lat = float(lat_str) 
-                lng = float(lng_str)
-                if not (25 < lng < 45 and 35 < lat < 43): 
-                     print(f"Uyarı: Koordinatlar Türkiye sınırı dışında atlandı: Lat={lat}, Lng={lng}")
-                     gecersiz_koordinat_sayisi += 1
-                     continue
-                markers.append({
-                    'personel': item['personel_adi'], 'lat': lat, 'lng': lng,
-                    'tarih': item['kayit_tarihi'].strftime("%Y-%m-%d %H:%M:%S") if item['kayit_tarihi'] else 'Bilinmiyor',
-                    'stok': float(item['sayilan_stok'] if isinstance(item['sayilan_stok'], Decimal) else Decimal(str(item['sayilan_stok'] or '0.0'))) 
-                })
-            except (ValueError, TypeError) as coord_err:
-                 print(f"Geçersiz koordinat atlandı: Lat='{item['latitude']}', Lng='{item['longitude']}' - Hata: {coord_err}")
-                 gecersiz_koordinat_sayisi += 1
-                 continue
-
-        context['konum_json'] = json.dumps(markers, cls=DjangoJSONEncoder)
-        context['toplam_kayit'] = len(markers)
-        konum_almayan_db = SayimDetay.objects.filter(
-            Q(sayim_emri=sayim_emri) & 
-            (Q(latitude='YOK') | Q(longitude='YOK') | Q(latitude__exact='') | Q(longitude__exact='') | Q(latitude__isnull=True) | Q(longitude__isnull=True))
-        ).count()
-        context['konum_almayan_kayitlar'] = konum_almayan_db + gecersiz_koordinat_sayisi 
+        # Noktalar sayfaya gömülmez; harita görüş alanındaki kümeleri ajax_konum_kumeleri'nden alır (bkz. konum.py)
+        ozet = konum_ozeti(sayim_emri)
+        context['konum_sinirlari_json'] = json.dumps(ozet['sinirlar'])
+        context['toplam_kayit'] = ozet['gecerli']
+        context['konum_almayan_kayitlar'] = ozet['konumsuz'] + ozet['gecersiz']
         
         context['hata'] = None
-        if not markers:
+        if not ozet['gecerli']:
              context['hata'] = "Bu emre ait haritada gösterilebilir geçerli konum verisi (GPS) bulunamadı."
-        elif gecersiz_koordinat_sayisi > 0:
-             context['uyari'] = f"{gecersiz_koordinat_sayisi} kaydın koordinatları geçersiz veya Türkiye dışında."
+        elif ozet['gecersiz'] > 0:
+             context['uyari'] = f"{ozet['gecersiz']} kaydın koordinatları geçersiz veya Türkiye dışında."
         return context
 
 # Stok Onaylama
@@ -509,37 +317,18 @@ def stoklari_onayla_ve_kapat(request, sayim_emri_id):
 
     try:
         now = timezone.now()
-        sayilan_toplamlar = SayimDetay.objects.filter(sayim_emri=sayim_emri, benzersiz_malzeme__isnull=False)\
-             .values('benzersiz_malzeme__benzersiz_id')\
-             .annotate(toplam_sayilan=Sum('sayilan_stok'))
-        guncellenecek_stoklar = { i['benzersiz_malzeme__benzersiz_id']: i['toplam_sayilan'] or Decimal('0.0') for i in sayilan_toplamlar }
-        guncellenecek_ids = list(guncellenecek_stoklar.keys())
-        updated_count, skipped_count = 0, 0
-
         with transaction.atomic(): 
-            malzemeler_to_update = Malzeme.objects.filter(benzersiz_id__in=guncellenecek_ids)
-            for malzeme in malzemeler_to_update:
-                yeni_stok = guncellenecek_stoklar.get(malzeme.benzersiz_id)
-                if yeni_stok is None: skipped_count += 1; continue
-                try: 
-                    # Gelen değer zaten Decimal olmalı (Sum('sayilan_stok') DecimalField üzerinden)
-                    yeni_stok_dec = yeni_stok if isinstance(yeni_stok, Decimal) else Decimal(str(yeni_stok))
-                except: 
-                    skipped_count += 1; continue
-                
-                # Malzeme.sistem_stogu da artık Decimal, doğrudan karşılaştırılabilir
-                if malzeme.sistem_stogu != yeni_stok_dec:
-                    malzeme.sistem_stogu = yeni_stok_dec
-                    # birim_fiyat ve sistem_tutari artık models.py içindeki save() metodunda
-                    # otomatik hesaplanıyor.
-                    malzeme.save(update_fields=['sistem_stogu', 'sistem_tutari']) 
-                    updated_count +=1
-                else: 
-                    skipped_count +=1 
-                    
+            # Rapor onaydan önceki stoklarla dondurulur; kapalı emrin raporu bundan okunur (bkz. rapor.py)
+            rapor_dondur(sayim_emri)
+            # Toplamlar stoklara satır başına save() olmadan yazılır (bkz. katalog.py); hepsi bu işlemde
+            updated_count, skipped_count = sayilan_stoklari_yaz(sayim_emri)
+            # Süreç içi arama indeksleri güncel stokla yeniden kurulsun
+            if updated_count: KatalogVersiyon.objects.filter(durum__in=['Aktif', 'Yükleniyor']).update(revizyon=F('revizyon') + 1)
             sayim_emri.durum = 'Tamamlandı'
             sayim_emri.onay_tarihi = now
             sayim_emri.save(update_fields=['durum', 'onay_tarihi'])
+            # Sistem stokları değişti; açık canlı ekranlar özeti yeniden alsın
+            if updated_count: sayim_olayi_yayinla(sayim_emri.pk, {'tip': 'yenile'})
             
         messages.success(request, f"Sayım onaylandı. {updated_count} stok güncellendi, {skipped_count} aynı kaldı.")
         return redirect('sayim_emirleri')
@@ -551,7 +340,23 @@ def stoklari_onayla_ve_kapat(request, sayim_emri_id):
 
 
 # --- YÖNETİM ARAÇLARI ---
-def yonetim_araclari(request): return render(request, 'sayim/yonetim.html', {}) 
+def yonetim_araclari(request):
+    context = {
+        'aktif_katalog': KatalogVersiyon.objects.filter(durum='Aktif').first(),
+        'onceki_katalog': KatalogVersiyon.objects.filter(durum='Arşiv').order_by('-aktiflesme_tarihi', '-pk').first(),
+    }
+    return render(request, 'sayim/yonetim.html', context)
+
+@csrf_exempt
+def katalog_geri_al(request):
+    """Aktif katalog sürümünü iptal edip bir önceki (arşiv) sürüme döner."""
+    if request.method == 'POST':
+        try:
+            versiyon = onceki_versiyona_don()
+            return JsonResponse({'success': True, 'message': f'Katalog v{versiyon.pk} tekrar aktif ({versiyon.malzemeler.count()} malzeme).'})
+        except KatalogVersiyonHatasi as e: return JsonResponse({'success': False, 'message': str(e)}, status=409)
+        except Exception as e: print(f"Katalog Geri Alma Hatası: {e}"); return JsonResponse({'success': False, 'message': f'Kritik hata: {e}'}, status=500)
+    return JsonResponse({'success': False, 'message': 'Geçersiz metot.'}, status=400)
 
 @csrf_exempt
 @transaction.atomic
@@ -571,112 +376,96 @@ def upload_and_reload_stok_data(request):
     if request.method == 'POST':
         if 'excel_file' not in request.FILES: return JsonResponse({'success': False, 'message': 'Dosya bulunamadı.'}, status=400)
         excel_file = request.FILES['excel_file']
-        if not excel_file.name.endswith(('.xlsx', '.xls', '.csv')): return JsonResponse({'success': False, 'message': 'Sadece Excel/CSV desteklenir.'}, status=400)
+        uzanti = dosya_uzantisi(excel_file.name)
+        if uzanti not in DESTEKLENEN_UZANTILAR: return JsonResponse({'success': False, 'message': 'Sadece Excel/CSV desteklenir.'}, status=400)
+
+        # mod=fark: sadece yeni/değişen satırlar yazılır; eksikleri_isaretle: dosyada olmayanlar işaretlenir
+        sadece_degisenler = request.POST.get('mod') == 'fark'
+        eksikleri_isaretle = request.POST.get('eksikleri_isaretle') in ('1', 'true', 'on')
 
+        # Dosya, istek bittikten sonra da okunabilsin diye kalıcı yükleme dizinine kopyalanır.
+        # Ayrıştırma ve yazma arka plan işinde parça parça yapılır; istek hemen döner.
         try:
-            excel_io = IO_Bytes(excel_file.read())
-            if excel_file.name.endswith('.csv'):
-                 try: df = pd.read_csv(excel_io, sep=None, encoding='utf-8', engine='python', dtype=str, keep_default_na=False) 
-                 except: excel_io.seek(0); df = pd.read_csv(excel_io, sep=None, encoding='latin1', engine='python', dtype=str, keep_default_na=False)
-            else: df = pd.read_excel(excel_io, engine='openpyxl' if excel_file.name.endswith('.xlsx') else 'xlrd', dtype=str, keep_default_na=False)
-            
-            df.columns = df.columns.str.strip() 
-            
-            # ⭐ DÜZELTME 1: 'seri_no' (veya barkod) sütununu zorunlu alanlara ekle
-            # Excel'deki tam sütun adını yazdığınızdan emin olun
-            required_cols = ["Stok Kodu", "Depo Kodu", "Miktar", "Maliyet birim", "seri_no"]
-            missing_cols = [col for col in required_cols if col not in df.columns]
-            if missing_cols: 
-                # seri_no yoksa uyar ama devam et, barkod varsa onu kullan
-                if 'seri_no' in missing_cols and 'barkod' in df.columns:
-                    df['seri_no'] = df['barkod'] # barkod'u seri_no olarak kullan
-                    print("Uyarı: 'seri_no' sütunu yok, 'barkod' sütunu 'seri_no' olarak kullanılacak.")
-                    missing_cols.remove('seri_no') # Listeden çıkar
-                
-                # Hala eksik sütun varsa hata ver
-                if missing_cols:
-                    return JsonResponse({'success': False, 'message': f'Eksik sütunlar: {", ".join(missing_cols)}'}, status=400)
-
-            # ⭐ DÜZELTME 1.1: 'seri_no' için de bir default ekle
-            defaults = {
-                "Parti": 'YOK', "Renk": 'YOK', "Depo Kodu": 'MERKEZ', 
-                "Miktar": '0.0', "Maliyet birim": '0.0', "Grup": 'GENEL', 
-                "Stok Adı": '', "Birim": 'ADET', "seri_no": 'YOK' # Eklendi
-            }
-            for col, dv in defaults.items():
-                 if col not in df.columns: df[col] = dv
-            df = df.map(lambda x: x.strip() if isinstance(x, str) else x)
-            for col, dv in defaults.items():
-                 if col in df.columns: df[col] = df[col].replace('', dv)
-
-            processed_rows = [] 
-            for index, row in df.iterrows():
-                 rn = index + 2 
-                 try:
-                     sk, dk, m, c = row['Stok Kodu'], row['Depo Kodu'], row['Miktar'], row['Maliyet birim']
-                     if not sk or sk == 'YOK': raise ValueError(f"Stok Kodu boş.")
-                     if not dk or dk == 'YOK': raise ValueError(f"Depo Kodu boş.")
-                     ms, cs = str(m).replace(',', '.').strip() or '0.0', str(c).replace(',', '.').strip() or '0.0'
-                     md, cd = Decimal(ms), Decimal(cs) # models.py'de DecimalField'e geçildiği için bu doğru
-                     pr = {col: str(row[col]) for col in df.columns if col not in ['Miktar', 'Maliyet birim']}
-                     pr['Miktar'], pr['Maliyet birim'] = md, cd
-                     processed_rows.append(pr)
-                 except Exception as conv_err:
-                     msg = f'Satır {rn}: Veri hatası - "{conv_err}". Miktar="{m}", Maliyet="{c}".'
-                     print(msg); return JsonResponse({'success': False, 'message': msg}, status=400)
-            if not processed_rows: return JsonResponse({'success': False, 'message': 'Geçerli veri yok.'}, status=400)
-                 
-            created_count, updated_count, fail_count = 0, 0, 0
-            with transaction.atomic():
-                # ESKİ MALZEMELERİ SİLME (OPSİYONEL AMA TEMİZLİK İÇİN İYİ)
-                # Malzeme.objects.all().delete() 
-                # print("Eski tüm malzeme kayıtları silindi.")
-                
-                for index, rd in enumerate(processed_rows): 
-                    rn = index + 2
-                    try:
-                        sk, pn, rk, lk = map(standardize_id_part, [rd['Stok Kodu'], rd['Parti'], rd['Renk'], rd['Depo Kodu']])
-                        if sk == 'YOK' or lk == 'YOK': fail_count += 1; continue
-                        bid = generate_unique_id(sk, pn, lk, rk)
-                        sm, bf = rd['Miktar'], rd['Maliyet birim']
-                        sg, sa, birim = rd['Grup'] or 'GENEL', rd['Stok Adı'] or f"Stok {sk}", rd['Birim'] or 'ADET'
-                        
-                        # ⭐ DÜZELTME 1.2: 'seri_no'yu defaults'a ekle
-                        # Excel'den gelen 'seri_no' (veya 'barkod') değerini al
-                        seri_no_val = standardize_id_part(rd.get('seri_no', 'YOK')) 
-                        
-                        _, created = Malzeme.objects.update_or_create(
-                            benzersiz_id=bid, 
-                            defaults={
-                                'malzeme_kodu': sk, 
-                                'malzeme_adi': sa, 
-                                'parti_no': pn, 
-                                'renk': rk, 
-                                'lokasyon_kodu': lk, 
-                                'olcu_birimi': birim, 
-                                'stok_grup': sg, 
-                                'seri_no': seri_no_val, # EKLENDİ
-                                'sistem_stogu': sm, 
-                                'birim_fiyat': bf
-                                # sistem_tutari models.py'deki save() metodunda otomatik hesaplanıyor
-                            }
-                        )
-                        if created: created_count += 1
-                        else: updated_count +=1
-                    except Exception as e: print(f"Satır {rn} DB hatası: {e}"); fail_count += 1; continue 
-            msg = f"✅ Bitti: {created_count} yeni, {updated_count} güncellenen. Hata/Atlanan: {fail_count}."
-            return JsonResponse({'success': True, 'message': msg})
+            yarim_kalan_yuklemeleri_kapat()  # Ölmüş işin 'Yükleniyor' sürümü yenisinden önce iptal edilir
+            dosya_yolu, _gecici = yuklemeyi_diske_al(excel_file, dizin=STOK_YUKLEME_DIZINI, kopyala=True)
+            isi = StokYuklemeIsi.objects.create(
+                dosya_adi=excel_file.name, dosya_yolu=dosya_yolu,
+                sadece_degisenler=sadece_degisenler, eksikleri_isaretle=eksikleri_isaretle,
+            )
+            transaction.on_commit(lambda: is_gonder('stok_yukleme', yukleme_isini_calistir, isi.pk, isci_sayisi=STOK_YUKLEME_ISCI_SAYISI))
+            return JsonResponse({
+                'success': True, 'message': f"Yükleme kuyruğa alındı (İş ID: {isi.pk}).",
+                'is_id': isi.pk, 'durum_url': reverse('stok_yukleme_durum', kwargs={'is_id': isi.pk}),
+            }, status=202)
         except Exception as e: print(f"Excel Yükleme Hatası: {e}"); return JsonResponse({'success': False, 'message': f'Kritik hata: {e}'}, status=500)
     return JsonResponse({'success': False, 'message': 'Geçersiz metot.'}, status=400)
 
 
+def stok_yukleme_durum(request, is_id):
+    """Arka plan stok yükleme işinin ilerlemesi (yonetim.html periyodik olarak sorgular)."""
+    isi = yukleme_isi_durumu(get_object_or_404(StokYuklemeIsi, pk=is_id))
+    kalan = isi.tahmini_kalan_saniye()
+    return JsonResponse({
+        'success': isi.durum != 'Hata',
+        'is_id': isi.pk,
+        'durum': isi.durum,
+        'asama': isi.asama,
+        'bitti': isi.durum in ('Tamamlandı', 'Hata'),
+        'toplam_satir': isi.toplam_satir,
+        'okunan_satir': isi.okunan_satir,
+        'yazilan_satir': isi.yazilan_satir,
+        'hata_sayisi': isi.hata_sayisi,
+        'kalan_saniye': round(kalan) if kalan is not None else None,
+        'message': isi.mesaj,
+        'ozet': {k: v for k, v in (isi.ozet or {}).items() if k != 'hatalar'} or None,
+    })
+
+
 # --- AJAX FONKSİYONLARI ---
 def get_last_sayim_info(malzeme_nesnesi): 
     if not malzeme_nesnesi: return None
-    ls = SayimDetay.objects.filter(benzersiz_malzeme=malzeme_nesnesi).order_by('-kayit_tarihi').first() 
-    if ls: ts = ls.kayit_tarihi.strftime("%d %b %H:%M") if ls.kayit_tarihi else '?'; return { 'tarih': ts, 'personel': ls.personel_adi or '?'}
+    # Sayımlar malzemenin eski katalog sürümlerine bağlı olabilir; benzersiz_id ile eşleştirilir
+    ls = son_sayim(malzeme_nesnesi.benzersiz_id)
+    if ls: ts = ls.son_sayim_tarihi.strftime("%d %b %H:%M") if ls.son_sayim_tarihi else '?'; return { 'tarih': ts, 'personel': ls.son_personel or '?'}
     return None
 
+def _varyant_bilgisi(cozum, stok_kod):
+    """Çözüm birden çok malzemeye uyuyorsa arama yanıtının varyant alanları."""
+    vc = cozum.varyant_sayisi
+    # Aynı kod birden çok malzemeye aitse (örn. ortak barkod) adaylar da döner
+    if cozum.adaylar and len({a.malzeme_kodu for a in cozum.adaylar}) == 1: stok_kod = cozum.adaylar[0].malzeme_kodu
+    print(f">> Stok ({stok_kod}): {vc} varyant bulundu, varyant listesi döndürülüyor.")
+    return {
+        'urun_bilgi': f"Varyant Seç ({stok_kod} - {vc} adet)", 'stok_kod': stok_kod,
+        'parti_varyantlar': [p for p in cozum.partiler if p != 'YOK'],
+        'renk_varyantlar': [r for r in cozum.renkler if r != 'YOK'],
+        'adaylar': [{'benzersiz_id': a.benzersiz_id, 'urun_bilgi': f"{a.malzeme_adi} ({a.malzeme_kodu} / {a.parti_no} / {a.renk})"}
+                    for a in cozum.adaylar[:20]],
+    }
+
+def _bulunan_bilgisi(malzeme, sayilan, last_sayim, anahtar):
+    """Bulunan malzeme için arama yanıtının alanları (sayılan toplam ve farklı depo uyarısıyla)."""
+    dd = diger_depolar(malzeme, anahtar=anahtar)
+    fdu = f"⚠️ Başka depolarda: {', '.join(dd)}" if dd else ""
+    if fdu: print(f"   -> Farklı depo uyarısı var.")
+    # models.py'de DecimalField'e geçildi, .f2 formatlaması aynı kalabilir
+    return {
+        'found': True, 
+        'benzersiz_id': malzeme.benzersiz_id, 
+        'urun_bilgi': f"{malzeme.malzeme_adi} ({malzeme.malzeme_kodu}) P:{malzeme.parti_no} R:{malzeme.renk}", 
+        'stok_kod': malzeme.malzeme_kodu, 
+        'parti_no': malzeme.parti_no, 
+        'renk': malzeme.renk, 
+        'sistem_stok': f"{malzeme.sistem_stogu:.2f}", 
+        'sayilan_stok': f"{sayilan:.2f}", 
+        'last_sayim': last_sayim, 
+        'farkli_depo_uyarisi': fdu
+    }
+
+def _bulunamadi_mesaji(depo_kod, seri_no, stok_kod, parti_no):
+    aranan = seri_no if seri_no != 'YOK' else (parti_no if parti_no != 'YOK' else stok_kod)
+    return f"'{aranan}' bilgisi ile '{depo_kod}' deposunda bulunamadı."
+
 @csrf_exempt
 def ajax_akilli_stok_ara(request):
     # Standardize edilmiş değerleri al
@@ -692,48 +481,17 @@ def ajax_akilli_stok_ara(request):
     malzeme = None 
     if depo_kod == 'YOK': response_data['urun_bilgi'] = 'HATA: Depo Kodu Yok.'; print(">> HATA: Depo Kodu Yok."); return JsonResponse(response_data, status=400)
 
-    # ⭐ DÜZELTME 2: Seri No sorgusu güncellendi
-    # 1. Seri No / Barkod (benzersiz_id, malzeme_kodu VEYA seri_no)
-    if seri_no != 'YOK':
-        print(f">> 1: Seri ({seri_no})")
-        malzeme = Malzeme.objects.filter(
-            Q(benzersiz_id=seri_no) | 
-            Q(malzeme_kodu__iexact=seri_no) |
-            Q(seri_no__iexact=seri_no), # EKLENDİ
-            lokasyon_kodu__iexact=depo_kod
-        ).first()
-        print(f"   -> {'Bulundu: '+malzeme.benzersiz_id if malzeme else 'Bulunamadı'}")
-
-    # 2. Parti No (Stok Kodu varsa onunla, yoksa tek başına)
-    if not malzeme and parti_no != 'YOK':
-        print(f">> 2: Parti ({parti_no}), Stok ({stok_kod})")
-        q = {'parti_no__iexact': parti_no, 'lokasyon_kodu__iexact': depo_kod}
-        if stok_kod != 'YOK': q['malzeme_kodu__iexact'] = stok_kod
-        malzeme = Malzeme.objects.filter(**q).first() 
-        print(f"   -> {'Bulundu: '+malzeme.benzersiz_id if malzeme else 'Bulunamadı'}")
-
-    # 3. Stok Kodu + Parti + Renk (Tam eşleşme)
-    if not malzeme and stok_kod != 'YOK' and parti_no != 'YOK' and renk != 'YOK':
-        print(f">> 3: Stok ({stok_kod}), Parti ({parti_no}), Renk ({renk})")
-        malzeme = Malzeme.objects.filter(malzeme_kodu__iexact=stok_kod, parti_no__iexact=parti_no, renk__iexact=renk, lokasyon_kodu__iexact=depo_kod).first()
-        print(f"   -> {'Bulundu: '+malzeme.benzersiz_id if malzeme else 'Bulunamadı'}")
-
-    # 4. Sadece Stok Kodu (Varyantları listele)
-    if not malzeme and stok_kod != 'YOK':
-        print(f">> 4: Stok ({stok_kod}) Varyantları")
-        varyantlar = Malzeme.objects.filter(malzeme_kodu__iexact=stok_kod, lokasyon_kodu__iexact=depo_kod)
-        vc = varyantlar.count()
-        print(f"   -> {vc} varyant bulundu.")
-        if vc == 1: malzeme = varyantlar.first(); print(f"      -> Tek varyant seçildi: {malzeme.benzersiz_id}")
-        elif vc > 1:
-            response_data.update({'urun_bilgi': f"Varyant Seç ({stok_kod} - {vc} adet)", 'stok_kod': stok_kod})
-            partiler = sorted(list(varyantlar.values_list('parti_no', flat=True).distinct()))
-            renkler = sorted(list(varyantlar.values_list('renk', flat=True).distinct()))
-            response_data['parti_varyantlar'] = [p for p in partiler if p != 'YOK']
-            response_data['renk_varyantlar'] = [r for r in renkler if r != 'YOK']
-            print(f"      -> Varyant listesi döndürülüyor."); print(f"--- ARAMA BİTTİ (Varyant) ---")
-            return JsonResponse(response_data) 
-            
+    # Öncelik sırası: 1. Seri No / Barkod (benzersiz_id, malzeme_kodu VEYA seri_no),
+    # 2. Parti No (Stok Kodu varsa onunla), 3. Stok Kodu varyantları.
+    # Çözüm süreç içi depo indeksinden yapılır (bkz. arama_indeksi.py).
+    anahtar = aktif_katalog_anahtari()
+    cozum = malzeme_coz(depo_kod, seri_no, stok_kod, parti_no, renk, anahtar=anahtar)
+    malzeme = cozum.malzeme
+    if cozum.varyant_sayisi > 1:
+        response_data.update(_varyant_bilgisi(cozum, stok_kod))
+        print(f"--- ARAMA BİTTİ (Varyant) ---")
+        return JsonResponse(response_data)
+
     # Sonuç
     if malzeme:
         print(f">> SONUÇ: Bulundu: {malzeme.benzersiz_id}. Detaylar işleniyor...")
@@ -741,37 +499,41 @@ def ajax_akilli_stok_ara(request):
         seid_str = request.GET.get('sayim_emri_id') 
         if seid_str:
             try: 
-                # models.py'de DecimalField'e geçildiği için Sum sonucu zaten Decimal olacak
-                ts = SayimDetay.objects.filter(sayim_emri_id=int(seid_str), benzersiz_malzeme=malzeme).aggregate(t=Sum('sayilan_stok'))['t'] or Decimal('0.0')
+                ts = sayilan_miktar(int(seid_str), malzeme.benzersiz_id)
             except: pass 
         print(f"   -> Bu sayım toplamı: {ts:.2f}")
-        dd = Malzeme.objects.filter(malzeme_kodu__iexact=malzeme.malzeme_kodu).exclude(lokasyon_kodu__iexact=malzeme.lokasyon_kodu).values_list('lokasyon_kodu', flat=True).distinct()
-        fdu = f"⚠️ Başka depolarda: {', '.join(sorted([standardize_id_part(d) for d in dd]))}" if dd.exists() else ""
-        if fdu: print(f"   -> Farklı depo uyarısı var.")
-        
-        # models.py'de DecimalField'e geçildi, .f2 formatlaması aynı kalabilir
-        response_data.update({
-            'found': True, 
-            'benzersiz_id': malzeme.benzersiz_id, 
-            'urun_bilgi': f"{malzeme.malzeme_adi} ({malzeme.malzeme_kodu}) P:{malzeme.parti_no} R:{malzeme.renk}", 
-            'stok_kod': malzeme.malzeme_kodu, 
-            'parti_no': malzeme.parti_no, 
-            'renk': malzeme.renk, 
-            'sistem_stok': f"{malzeme.sistem_stogu:.2f}", 
-            'sayilan_stok': f"{ts:.2f}", 
-            'last_sayim': get_last_sayim_info(malzeme) or 'Yok', 
-            'farkli_depo_uyarisi': fdu
-        })
+        response_data.update(_bulunan_bilgisi(malzeme, ts, get_last_sayim_info(malzeme) or 'Yok', anahtar))
         print(f"--- ARAMA BİTTİ (Başarılı) ---")
         return JsonResponse(response_data)
         
     # Bulunamadı
-    aranan = seri_no if seri_no != 'YOK' else (parti_no if parti_no != 'YOK' else stok_kod)
-    response_data['urun_bilgi'] = f"'{aranan}' bilgisi ile '{depo_kod}' deposunda bulunamadı."
+    response_data['urun_bilgi'] = _bulunamadi_mesaji(depo_kod, seri_no, stok_kod, parti_no)
     print(f">> SONUÇ: Bulunamadı.")
     print(f"--- ARAMA BİTTİ (Başarısız) ---")
     return JsonResponse(response_data)
 
+def ajax_depo_katalogu(request, depo_kod):
+    """
+    Deponun katalog görüntüsü (gzip JSON, bkz. depo_katalogu.py). If-None-Match güncel
+    etiketi içeriyorsa 304; ?since=<etiket> ile sadece fark istenebilir.
+    """
+    depo_kod = standardize_id_part(depo_kod)
+    anahtar = aktif_katalog_anahtari()
+    if anahtar is None or depo_kod == 'YOK' or not Malzeme.objects.filter(versiyon_id=anahtar[0], lokasyon_kodu=depo_kod).exists():
+        return JsonResponse({'success': False, 'message': f"'{depo_kod}' deposu aktif katalogda yok."}, status=404)
+    etag = f'"{depo_kod}-{surum_etiketi(anahtar)}"'
+    if etag in [e.strip() for e in request.headers.get('If-None-Match', '').split(',')]:
+        cevap = HttpResponseNotModified()
+    else:
+        govde = depo_katalogu_govdesi(anahtar, depo_kod, taban=request.GET.get('since'))
+        sikistirilmis = 'gzip' in request.headers.get('Accept-Encoding', '')
+        cevap = HttpResponse(govde if sikistirilmis else gzip.decompress(govde), content_type='application/json')
+        if sikistirilmis: cevap['Content-Encoding'] = 'gzip'
+    cevap['ETag'] = etag
+    cevap['Cache-Control'] = 'private, no-cache'
+    cevap['Vary'] = 'Accept-Encoding'
+    return cevap
+
 @csrf_exempt
 @transaction.atomic 
 def ajax_sayim_kaydet(request, sayim_emri_id):
@@ -793,7 +555,7 @@ def ajax_sayim_kaydet(request, sayim_emri_id):
                 if not miktar_str:
                     miktar_str = '0.0'
                     
-                m = Decimal(miktar_str) # Şimdi Decimal'e çevir
+                m = ondalik_yuvarla(Decimal(miktar_str)) # Şimdi Decimal'e çevir (alan hassasiyetine yuvarlanır)
                 
                 if m <= Decimal('0.0'): 
                     # 0 veya eksi miktar gelirse hata ver
@@ -809,7 +571,7 @@ def ajax_sayim_kaydet(request, sayim_emri_id):
             pa = data.get('personel_adi', 'MISAFIR').strip().upper() or 'MISAFIR'
             lat, lon = str(data.get('lat', 'YOK')), str(data.get('lon', 'YOK'))
             
-            try: malzeme = get_object_or_404(Malzeme, benzersiz_id=bid) 
+            try: malzeme = get_object_or_404(Malzeme.objects.aktif(), benzersiz_id=bid) 
             except Http404: 
                 print(f">> HATA: Malzeme ID({bid}) bulunamadı.")
                 return JsonResponse({'success': False, 'message': f"HATA: ID '{bid}' bulunamadı."}, status=404)
@@ -818,20 +580,36 @@ def ajax_sayim_kaydet(request, sayim_emri_id):
             if se.durum != 'Açık': 
                 print(f">> HATA: Sayım Emri ({sayim_emri_id}) kapalı.")
                 return JsonResponse({'success': False, 'message': 'Sayım kapalı.'}, status=403) 
+            if not se.kapsamda_mi(malzeme):
+                print(f">> HATA: {bid} emrin kapsamı dışında.")
+                return JsonResponse({'success': False, 'kapsam_disi': True, 'message': se.kapsam_disi_mesaji(malzeme)}, status=422)
             
             print(f">> Detay Oluşturuluyor: Miktar={m}, Personel={pa}...")
             
-            SayimDetay.objects.create(
-                sayim_emri=se, 
-                benzersiz_malzeme=malzeme,
-                personel_adi=pa, 
-                sayilan_stok=m, # Decimal olarak kaydedilecek
-                latitude=lat, 
-                longitude=lon
-            )
+            # İstemci anahtarı verilmişse aynı kayıt tekrar gönderildiğinde ikinci kez yazılmaz
+            istemci_id = str(data['istemci_id'])[:64] if data.get('istemci_id') else None
+            try:
+                with transaction.atomic():
+                    detay = SayimDetay.objects.create(
+                        sayim_emri=se, 
+                        benzersiz_malzeme=malzeme,
+                        personel_adi=pa, 
+                        sayilan_stok=m, # Decimal olarak kaydedilecek
+                        latitude=lat, 
+                        longitude=lon,
+                        istemci_id=istemci_id,
+                    )
+                    # Toplam aynı işlemde artırılır (bkz. toplamlar.py)
+                    toplami_artir(se.pk, malzeme.benzersiz_id, m, pa, detay.kayit_tarihi)
+            except IntegrityError as e:
+                if not istemci_id or not SayimDetay.objects.filter(istemci_id=istemci_id).exists():
+                    print(f">> Çakışma HATASI: {e}")
+                    return JsonResponse({'success': False, 'message': "HATA: Kayıt çakışması, yazılmadı. Lütfen tekrar okutun."}, status=409)
+                print(f"   -> Tekrar gönderim ({istemci_id}), yazılmadı.")
+                return JsonResponse({'success': True, 'tekrar': True, 'message': "Bu kayıt daha önce alınmış.", 'yeni_miktar': f"{sayilan_miktar(se.pk, malzeme.benzersiz_id):.2f}"})
             print("   -> Oluşturuldu.")
             
-            ts = SayimDetay.objects.filter(sayim_emri=se, benzersiz_malzeme=malzeme).aggregate(t=Sum('sayilan_stok'))['t'] or Decimal('0.0')
+            ts = sayilan_miktar(se.pk, malzeme.benzersiz_id)
             print(f"   -> Yeni Toplam: {ts}")
             print(f"--- KAYIT BİTTİ (Başarılı) ---")
             
@@ -849,100 +627,163 @@ def ajax_sayim_kaydet(request, sayim_emri_id):
             return JsonResponse({'success': False, 'message': f"Sunucu hatası ({et})."}, status=500)
     
     return JsonResponse({'success': False, 'message': 'Geçersiz metot.'}, status=405)
- 
+
+def ajax_rapor(request, sayim_emri_id):
+    """
+    Mutabakat raporunun bir sayfası (bkz. rapor.py). Parametreler: depo, grup, tag (virgüllü),
+    sirala, sonraki (imleç), limit. İlk sayfada etiket sayıları ('ozet') da döner.
+    """
+    se = get_object_or_404(SayimEmri, pk=sayim_emri_id)
+    etiketler = [e for e in request.GET.get('tag', '').split(',') if e]
+    try:
+        sayfa = rapor_sayfasi(
+            se, depo=request.GET.get('depo'), etiketler=etiketler, grup=request.GET.get('grup'),
+            siralama=request.GET.get('sirala', 'oncelik'), imlec=request.GET.get('sonraki'),
+            limit=request.GET.get('limit', RAPOR_SAYFA_BOYUTU), ozet=not request.GET.get('sonraki'),
+        )
+    except (RaporParametreHatasi, ValueError) as e: return JsonResponse({'success': False, 'message': str(e)}, status=400)
+    return JsonResponse({'success': True, **sayfa})
+
+def ajax_konum_kumeleri(request, sayim_emri_id):
+    """
+    Konum haritasının kümeleri. Parametreler: zoom (harita yakınlaştırma seviyesi), bbox
+    ('güney,batı,kuzey,doğu'; verilmezse tüm kayıtlar). Küme sayısı KONUM_AZAMI_KUME ile sınırlıdır.
+    """
+    se = get_object_or_404(SayimEmri, pk=sayim_emri_id)
+    try:
+        hassasiyet, kumeler = konum_kumeleri(se, int(request.GET.get('zoom', 16)), gorus_alani_oku(request.GET.get('bbox')))
+    except (KonumParametreHatasi, ValueError) as e: return JsonResponse({'success': False, 'message': str(e)}, status=400)
+    return JsonResponse({'success': True, 'hassasiyet': hassasiyet, 'kumeler': kumeler})
+
+def sayim_olay_akisi(request, sayim_emri_id):
+    """
+    Emrin canlı olay akışı (text/event-stream, bkz. canli_ozet.py): fark özeti ve ilerleme
+    ekranları bununla yoklama yapmadan güncellenir.
+    """
+    se = get_object_or_404(SayimEmri, pk=sayim_emri_id)
+    son_olay_id = request.headers.get('Last-Event-ID', '')
+    response = StreamingHttpResponse(olay_akisi(se, int(son_olay_id) if son_olay_id.isdigit() else None), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # nginx arkasında olaylar bekletilmeden iletilsin
+    return response
 
 @csrf_exempt
 @require_POST
-def gemini_ocr_analiz(request):
-    if not GEMINI_AVAILABLE: return JsonResponse({'success': False, 'message': "Gemini aktif değil."}, status=501) 
-    if 'image_file' not in request.FILES: return JsonResponse({'success': False, 'message': "Dosya yüklenmedi."}, status=400)
+def ajax_okut_ve_kaydet(request, sayim_emri_id):
+    """
+    Okut-say modu: okutulan kod ajax_akilli_stok_ara ile aynı öncelik sırasıyla çözülür ve
+    tek malzemeye uyuyorsa aynı istekte sayım kaydı yazılır (miktar verilmezse 1).
+    Gövde: {'seri_no' | 'stok_kod'/'parti_no'/'renk', 'depo_kod', 'miktar', 'personel_adi',
+    'lat', 'lon', 'istemci_id'}. Yanıt arama yanıtının alanlarını ve 'yeni_miktar'ı içerir;
+    kod birden çok malzemeye uyuyorsa hiçbir şey yazılmaz, varyant listesi döner.
+    """
+    se = get_object_or_404(SayimEmri, pk=sayim_emri_id)
+    if se.durum != 'Açık': return JsonResponse({'success': False, 'message': 'Sayım kapalı.'}, status=403)
     try:
-        img_file = request.FILES['image_file']
-        if img_file.size > 5*1024*1024: return JsonResponse({'success': False, 'message': "Dosya > 5MB."}, status=413) 
-        try: img = Image.open(BytesIO(img_file.read()))
-        except Exception as img_err: print(f"OCR Resim Açma Hatası: {img_err}"); return JsonResponse({'success': False, 'message': f"Resim açılamadı: {img_err}"}, status=400)
-        
-        genai.configure(api_key=GEMINI_API_KEY) 
-        
-        # ⭐ DÜZELTME 3: Model adı 'gemini-2.0-flash' olarak güncellendi
-        model_name = 'gemini-2.0-flash' 
-        model = genai.GenerativeModel(model_name) 
-        
-        system_instruction = ("Extract 'stok_kod', 'parti_no', 'renk', 'miktar' from labels. Use 'YOK' if missing. Quantity ('miktar') as decimal (e.g., 1.0). Respond ONLY with JSON list.")
-        prompt = ("Analyze labels, create JSON list with 'stok_kod', 'parti_no', 'renk', 'miktar'. Quantity as decimal.")
-        
-        # --- Config'i tekrar ekledik ---
-        generation_config = GenerationConfig(
-            response_mime_type="application/json", 
-            response_schema=Schema(
-                type=Type.ARRAY, 
-                items=Schema(
-                    type=Type.OBJECT, 
-                    properties={
-                        'stok_kod': Schema(type=Type.STRING), 
-                        'parti_no': Schema(type=Type.STRING), 
-                        'renk': Schema(type=Type.STRING), 
-                        'miktar': Schema(type=Type.NUMBER)
-                    }, 
-                    required=['stok_kod']
-                )
+        data = json.loads(request.body)
+        m = miktar_donustur(data.get('miktar', '1'))
+    except json.JSONDecodeError: return JsonResponse({'success': False, 'message': "HATA: Geçersiz JSON."}, status=400)
+    except ValueError as e: return JsonResponse({'success': False, 'message': f"HATA: {e}"}, status=400)
+    seri_no, stok_kod, parti_no, renk, depo_kod = (standardize_id_part(data.get(alan, 'YOK')) for alan in ('seri_no', 'stok_kod', 'parti_no', 'renk', 'depo_kod'))
+    if depo_kod == 'YOK': return JsonResponse({'success': False, 'message': 'HATA: Depo Kodu Yok.'}, status=400)
+    print(f"\n--- OKUT-SAY --- S='{seri_no}', K='{stok_kod}', P='{parti_no}', R='{renk}', D='{depo_kod}', Miktar={m}")
+
+    anahtar = aktif_katalog_anahtari()
+    cozum = malzeme_coz(depo_kod, seri_no, stok_kod, parti_no, renk, anahtar=anahtar)
+    if cozum.varyant_sayisi > 1:
+        return JsonResponse({'success': False, 'found': False, 'message': 'Varyant seçilmeli, kayıt yapılmadı.', **_varyant_bilgisi(cozum, stok_kod)})
+    malzeme = cozum.malzeme
+    if malzeme is None:
+        return JsonResponse({'success': False, 'found': False, 'message': _bulunamadi_mesaji(depo_kod, seri_no, stok_kod, parti_no)}, status=404)
+    if not se.kapsamda_mi(malzeme):
+        return JsonResponse({'success': False, 'found': True, 'kapsam_disi': True, 'message': se.kapsam_disi_mesaji(malzeme)}, status=422)
+
+    pa = str(data.get('personel_adi') or '').strip().upper() or 'MISAFIR'
+    istemci_id = str(data['istemci_id'])[:64] if data.get('istemci_id') else None
+    tekrar = False
+    try:
+        with transaction.atomic():
+            detay = SayimDetay.objects.create(
+                sayim_emri=se, benzersiz_malzeme_id=malzeme.pk, personel_adi=pa, sayilan_stok=m,
+                latitude=str(data.get('lat', 'YOK')), longitude=str(data.get('lon', 'YOK')), istemci_id=istemci_id,
             )
+            toplami_artir(se.pk, malzeme.benzersiz_id, m, pa, detay.kayit_tarihi)
+    except IntegrityError as e:
+        if not istemci_id or not SayimDetay.objects.filter(istemci_id=istemci_id).exists():
+            print(f"OKUT-SAY Çakışma Hatası: {e}")
+            return JsonResponse({'success': False, 'message': "HATA: Kayıt çakışması, yazılmadı. Lütfen tekrar okutun."}, status=409)
+        print(f"   -> Tekrar gönderim ({istemci_id}), yazılmadı.")
+        tekrar = True
+    ts = sayilan_miktar(se.pk, malzeme.benzersiz_id)
+    # Son sayım bu kayıt olduğundan ayrıca sorgulanmaz
+    son = get_last_sayim_info(malzeme) if tekrar else {'tarih': detay.kayit_tarihi.strftime("%d %b %H:%M"), 'personel': pa}
+    print(f"--- OKUT-SAY BİTTİ --- {malzeme.benzersiz_id} toplam {ts:.2f}")
+    return JsonResponse({
+        'success': True, 'tekrar': tekrar, 'yeni_miktar': f"{ts:.2f}",
+        'message': "Bu kayıt daha önce alınmış." if tekrar else f"✅ {malzeme.malzeme_kodu} ({malzeme.parti_no}) {m:.2f} kayıt.",
+        **_bulunan_bilgisi(malzeme, ts, son or 'Yok', anahtar),
+    })
+
+@csrf_exempt
+@require_POST
+def ajax_sayim_kaydet_toplu(request, sayim_emri_id):
+    """
+    Çok satırlı sayım kaydı (bkz. toplu_sayim.py). Gövde: {'satirlar': [...], 'mod': 'kismi'|'hepsi',
+    'personel_adi', 'lat', 'lon', 'depo_kod'}. 'kismi' modda geçerli satırlar yazılır (200);
+    'hepsi' modda hatalı satır varsa hiçbiri yazılmaz (422). Her iki durumda satır sonuçları döner.
+    """
+    se = get_object_or_404(SayimEmri, pk=sayim_emri_id)
+    try:
+        data = json.loads(request.body)
+        mod = data.get('mod', 'kismi')
+        sonuc = sayim_satirlarini_kaydet(
+            se, data.get('satirlar'), personel_adi=data.get('personel_adi', 'MISAFIR'),
+            lat=data.get('lat', 'YOK'), lon=data.get('lon', 'YOK'), depo_kod=data.get('depo_kod', 'YOK'), mod=mod,
         )
-        
-        print(f"Gemini API Çağrısı: Model={model_name}")
-        response = model.generate_content([prompt, img], generation_config=generation_config) # Config ile çağır
-        print("Gemini Yanıtı Alındı.")
-        
-        try:
-            json_text = response.text 
-            json_results = json.loads(json_text.strip()) 
-            if not isinstance(json_results, list): raise json.JSONDecodeError("Liste bekleniyordu.", json_text, 0)
-            print(f"Gemini Yanıt Parse Edildi: {len(json_results)} sonuç.")
-        except Exception as json_err: print(f"Gemini JSON Hatası: {json_err}. Yanıt: '{response.text}'"); return JsonResponse({'success': False, 'message': f"YZ yanıtı işlenemedi."}, status=500)
-
-        processed = []
-        print("OCR Sonuçları İşleniyor...")
-        for i, item in enumerate(json_results):
-             if not isinstance(item, dict): print(f"   -> {i+1} atlandı (dict değil)."); continue 
-             try:
-                 mr = item.get('miktar', '0.0'); md = Decimal('0.0')
-                 if isinstance(mr, (int, float)): md = Decimal(mr)
-                 elif isinstance(mr, str): ms = mr.replace(',', '.').strip().upper(); md = Decimal(ms) if ms and ms != 'YOK' else Decimal('0.0')
-             except: print(f"   -> {i+1}: Miktar ('{mr}') geçersiz, 1.0 kullanıldı."); md = Decimal('1.0') 
-             sk = standardize_id_part(item.get('stok_kod', 'YOK'))
-             if sk == 'YOK': print(f"   -> {i+1} atlandı (Stok Kodu YOK)."); continue 
-             processed.append({'stok_kod': sk, 'parti_no': standardize_id_part(item.get('parti_no', 'YOK')), 'renk': standardize_id_part(item.get('renk', 'YOK')), 'miktar': f"{md:.2f}", 'barkod': sk })
-             print(f"   -> {i+1} işlendi: Stok={sk}, Miktar={md:.2f}")
-
-        c = len(processed)
-        if c == 0: print("OCR SONUÇ: Geçerli etiket yok."); return JsonResponse({'success': True, 'message': "Geçerli etiket bulunamadı.", 'count': 0, 'results': []})
-        print(f"OCR SONUÇ: {c} geçerli etiket."); return JsonResponse({'success': True, 'message': f"✅ {c} etiket okundu.", 'count': c, 'results': processed})
-
-    # --- SyntaxError Düzeltmesi UYGULANDI ---
-    # except bloğunu doğru şekilde ayır
-    except google_exceptions.GoogleAPICallError as e: # Önce spesifik Google hatasını yakala (google_exceptions import edildi)
-        print(f"Gemini API Hatası: {e}") 
-        error_detail = str(e)
-        # Kullanıcıya daha anlamlı mesajlar ver
-        user_message = f"Gemini API ile iletişim hatası oluştu. Lütfen API anahtarınızı, kotanızı veya model adını kontrol edin."
-        # Hata tiplerini daha doğru kontrol et (varsa)
-        if isinstance(e, google_exceptions.PermissionDenied) or "API key not valid" in error_detail:
-             user_message = "Gemini API anahtarı geçersiz veya yetki sorunu. Yönetici ile iletişime geçin."
-        elif isinstance(e, google_exceptions.ResourceExhausted) or "quota" in error_detail.lower():
-             user_message = "Gemini API kullanım kotası aşıldı."
-        elif isinstance(e, google_exceptions.NotFound) or ("model" in error_detail.lower() and ("not found" in error_detail.lower() or "is not supported" in error_detail.lower())):
-             user_message = f"Kullanılan Gemini modeli ('{model_name}') bulunamadı veya bu işlem için desteklenmiyor."
-        elif isinstance(e, google_exceptions.InvalidArgument):
-             user_message = f"Gemini API'ye geçersiz bir argüman gönderildi: {e}"
-        # Diğer 4xx/5xx hataları
-        elif hasattr(e, 'message'): # Genel Google API hatası
-             user_message = f"Gemini API Hatası: {e.message}"
-             
-        return JsonResponse({'success': False, 'message': user_message}, status=502) # Bad Gateway daha uygun
-    except Exception as e: # Sonra diğer genel hataları yakala
-        error_type = type(e).__name__
-        print(f"Kritik YZ Analiz Hatası ({error_type}): {e}") 
-        return JsonResponse({'success': False, 'message': f"Görsel analizi sırasında beklenmedik sunucu hatası ({error_type})."}, status=500)
+    except json.JSONDecodeError: return JsonResponse({'success': False, 'message': "HATA: Geçersiz JSON."}, status=400)
+    except TopluSayimHatasi as e:
+        return JsonResponse({'success': False, 'message': f"HATA: {e}"}, status=403 if se.durum != 'Açık' else 400)
+    except IntegrityError as e:
+        # Yeniden denemede de çakıştı: parça yazılmadı, istemci yeniden göndermek yerine bildirir
+        print(f"TOPLU KAYIT Çakışma Hatası: {e}")
+        return JsonResponse({'success': False, 'message': "HATA: Kayıt çakışması, yazılmadı. Lütfen tekrar okutun."}, status=409)
+    print(f"--- TOPLU KAYIT --- Emir {se.pk} ({mod}): {sonuc['kaydedilen']} kaydedildi, {sonuc['hatali']} hatalı.")
+    mesaj = f"✅ {sonuc['kaydedilen']} satır kaydedildi." + (f" ⚠️ {sonuc['hatali']} satır hatalı." if sonuc['hatali'] else "")
+    if sonuc['hatali'] and mod == 'hepsi': mesaj = f"HATA: {sonuc['hatali']} satır hatalı, hiçbir satır kaydedilmedi."
+    return JsonResponse({'success': not sonuc['hatali'], 'message': mesaj, 'mod': mod, **sonuc},
+                        status=422 if sonuc['hatali'] and mod == 'hepsi' else 200)
+
+
+@csrf_exempt
+@require_POST
+def gemini_ocr_analiz(request):
+    """
+    Etiket fotoğrafını okuma işi olarak sıraya alır ve hemen iş numarasını döndürür (202);
+    sonuç durum_url'den (ocr_durum) sorgulanır. Model çağrısı 'ocr' havuzunda yapılır (bkz. ocr.py).
+    """
+    if not ocr_kullanilabilir(): return JsonResponse({'success': False, 'message': "Gemini aktif değil."}, status=501) 
+    if 'image_file' not in request.FILES: return JsonResponse({'success': False, 'message': "Dosya yüklenmedi."}, status=400)
+    img_file = request.FILES['image_file']
+    if img_file.size > AZAMI_RESIM_BOYUTU: return JsonResponse({'success': False, 'message': "Dosya > 5MB."}, status=413) 
+    veri = img_file.read()
+    try: Image.open(BytesIO(veri))  # Sadece başlık okunur; görsel işte çözülür
+    except Exception as img_err: print(f"OCR Resim Açma Hatası: {img_err}"); return JsonResponse({'success': False, 'message': f"Resim açılamadı: {img_err}"}, status=400)
+    try:
+        isi = ocr_isi_gonder(veri)
+    except OcrKapasiteHatasi as e: return JsonResponse({'success': False, 'message': str(e)}, status=503)
+    return JsonResponse({
+        'success': True, 'message': "📸 Görsel sıraya alındı, analiz ediliyor...",
+        'is_id': isi.pk, 'durum_url': reverse('ocr_durum', kwargs={'is_id': isi.pk}),
+    }, status=202)
+
+def ocr_durum(request, is_id):
+    """OCR işinin durumu; bittiyse okunan etiketler (sayim_giris.html periyodik olarak sorgular)."""
+    isi = ocr_is_durumu(get_object_or_404(OcrIsi, pk=is_id))
+    sonuclar = isi.sonuclar or []
+    return JsonResponse({
+        'success': isi.durum != 'Hata', 'is_id': isi.pk, 'durum': isi.durum, 'bitti': isi.durum in ('Tamamlandı', 'Hata'),
+        'message': isi.mesaj, 'count': len(sonuclar), 'results': sonuclar,
+    })
 
 
 # --- EXCEL EXPORT --- (Placeholderlar)
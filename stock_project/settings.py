@@ -139,4 +139,47 @@ STATICFILES_STORAGE = 'django.contrib.staticfiles.storage.StaticFilesStorage'
 # 7. DİĞER AYARLAR
 # ----------------------------------------------------------------------
 
-DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
\ No newline at end of file
+DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# ----------------------------------------------------------------------
+# 8. ARKA PLAN İŞLERİ
+# ----------------------------------------------------------------------
+
+# 'thread': işler süreç içi thread havuzunda çalışır (harici broker gerekmez).
+# 'senkron': işler çağıran thread'de hemen çalışır (test / hata ayıklama).
+SAYIM_IS_YURUTUCU = os.environ.get('SAYIM_IS_YURUTUCU', 'thread')
+
+# Stok yükleme dosyalarının iş bitene kadar tutulduğu dizin ve eşzamanlı iş sayısı
+STOK_YUKLEME_DIZINI = os.path.join(BASE_DIR, 'stok_yukleme')
+STOK_YUKLEME_ISCI_SAYISI = 1
+# Bu kadar saniye ilerleme yazmayan yükleme işi yarıda kalmış sayılır, sürümü iptal edilir
+STOK_YUKLEME_IS_ZAMAN_ASIMI = 900
+
+# Yükleme sonrası geri dönüş için saklanan eski katalog sürümü sayısı
+KATALOG_ARSIV_SAYISI = 1
+
+# Süreç içi arama indeksi (ajax_akilli_stok_ara): açık/kapalı, worker başına
+# tutulan en fazla depo ve indekslenecek en büyük depo (satır)
+ARAMA_INDEKSI_AKTIF = True
+ARAMA_INDEKSI_AZAMI_DEPO = 16
+ARAMA_INDEKSI_AZAMI_SATIR = 200000
+
+# Canlı ekranların olay yolu: 'surec_ici' (tek süreç) veya aynı arayüzü sağlayan
+# paylaşımlı bir yol sınıfının yolu ('paket.modul.Sinif'; çok worker'lı kurulum).
+# Akış bağlantısı SAYIM_OLAY_AKISI_SURESI saniye sonra kapatılır, tarayıcı yeniden bağlanır.
+# Gunicorn --timeout bu süreden uzun tutulmalıdır (bkz. Procfile, render.yaml).
+# 'surec_ici' yol ve iş havuzları tek worker gerektirir (--workers 1); her açık akış bir
+# thread'i tutar, bu yüzden aynı anda açık akış SAYIM_OLAY_AKISI_AZAMI_BAGLANTI ile --threads
+# sayısının (16) epey altında sınırlanır. Sınır doluysa ekran 30 sn sonra yeniden dener.
+SAYIM_OLAY_YOLU = 'surec_ici'
+SAYIM_OLAY_AKISI_SURESI = 300
+SAYIM_OLAY_AKISI_AZAMI_BAGLANTI = 4
+
+# Etiket fotoğrafı okuma (OCR) işleri: arka uç 'gemini', 'sahte' (ağ çağrısı yok; test / yük
+# denemesi) veya 'paket.modul.Sinif'; süreç başına eşzamanlı model çağrısı, sıradaki en fazla
+# iş, model çağrısı zaman aşımı ve işin bitmesi beklenen en uzun süre (saniye)
+SAYIM_OCR_ARKA_UCU = os.environ.get('SAYIM_OCR_ARKA_UCU', 'gemini')
+SAYIM_OCR_ISCI_SAYISI = 2
+SAYIM_OCR_AZAMI_BEKLEYEN = 20
+SAYIM_OCR_ZAMAN_ASIMI = 60
+SAYIM_OCR_IS_ZAMAN_ASIMI = 300